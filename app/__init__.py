@@ -3,11 +3,19 @@
 from fastapi import FastAPI, Depends
 from app.logger import log
 from app.config import config, Config
-from app.api import monitoring_router, mail_router
+from app.api import (
+    monitoring_router,
+    mail_router,
+    template_router,
+    suppression_router,
+    event_router,
+    analytics_router,
+)
 from app.infra.handlers import attach_exception_handlers
 from app.infra.middleware import attach_middlewares
-from app.services.mail import SmtpServer
+from app.services.mail import AsyncSmtpServer
 from app.services.auth import get_current_auth
+from app.worker.publisher import get_publisher
 
 
 async def on_startup():
@@ -15,8 +23,6 @@ async def on_startup():
     on startup hook, we place startup code here that the application needs during runtime
     """
     log.info("Starting Up")
-    if config.mail_smtp_enabled:
-        SmtpServer().login(username=config.mail_username, password=config.mail_password)
 
 
 async def on_teardown():
@@ -24,8 +30,9 @@ async def on_teardown():
     Performs application cleanup if necessary
     """
     log.info("Shutting down")
+    get_publisher().stop(timeout=10)
     if config.mail_smtp_enabled:
-        SmtpServer().logout()
+        await AsyncSmtpServer().logout()
 
 
 app = FastAPI(
@@ -33,7 +40,7 @@ app = FastAPI(
     description=config.description,
     version="0.0.1",
     on_startup=[on_startup],
-    on_teardown=[on_teardown],
+    on_shutdown=[on_teardown],
     docs_url=None if config.docs_disabled else "/docs",
     redoc_url=None if config.docs_disabled else "/redoc",
 )
@@ -42,5 +49,25 @@ app.include_router(monitoring_router)
 app.include_router(
     mail_router, prefix=config.base_url, dependencies=[Depends(get_current_auth)]
 )
+app.include_router(
+    template_router,
+    prefix=config.base_url,
+    dependencies=[Depends(get_current_auth)],
+)
+app.include_router(
+    suppression_router,
+    prefix=config.base_url,
+    dependencies=[Depends(get_current_auth)],
+)
+app.include_router(
+    event_router,
+    prefix=config.base_url,
+    dependencies=[Depends(get_current_auth)],
+)
+app.include_router(
+    analytics_router,
+    prefix=config.base_url,
+    dependencies=[Depends(get_current_auth)],
+)
 attach_exception_handlers(app)
 attach_middlewares(app)
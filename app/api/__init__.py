@@ -3,3 +3,7 @@ API Routes
 """
 from app.api.monitoring.routes import router as monitoring_router
 from app.api.mailer.routes import router as mail_router
+from app.api.templates.routes import router as template_router
+from app.api.suppressions.routes import router as suppression_router
+from app.api.events.routes import router as event_router
+from app.api.analytics.routes import router as analytics_router
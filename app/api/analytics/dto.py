@@ -0,0 +1,37 @@
+"""
+DTO objects for analytics endpoints
+"""
+from datetime import datetime
+from typing import List
+
+# pylint: disable=no-name-in-module
+from pydantic import BaseModel, Field
+
+# providers do not report the sender of a bounce, so bounces are only counted per provider
+BOUNCED_DESCRIPTION = "Hard bounces reported by the provider, left out of sender series"
+
+
+# pylint: disable=too-few-public-methods
+class AnalyticsPointDto(BaseModel):
+    """
+    Outcomes of a minute
+    """
+
+    time: datetime = Field(description="Start of the minute")
+    sent: int
+    failed: int
+    bounced: int | None = Field(default=None, description=BOUNCED_DESCRIPTION)
+
+
+# pylint: disable=too-few-public-methods
+class AnalyticsSeriesDto(BaseModel):
+    """
+    Outcomes of a sender or provider over the requested period, in total & per minute. Minutes without any outcome are
+    left out
+    """
+
+    key: str
+    sent: int
+    failed: int
+    bounced: int | None = Field(default=None, description=BOUNCED_DESCRIPTION)
+    points: List[AnalyticsPointDto]
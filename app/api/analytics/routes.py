@@ -0,0 +1,99 @@
+"""
+Analytics Router
+"""
+from datetime import datetime, timedelta, timezone
+from typing import List
+from fastapi import APIRouter, Path, Query
+from fastapi.concurrency import run_in_threadpool
+from starlette import status
+from app.api.dto import ApiError, ApiResponse
+from app.config import get_config
+from app.services.analytics import OUTCOMES, get_analytics_store
+from .dto import AnalyticsPointDto, AnalyticsSeriesDto
+
+router = APIRouter(tags=["Analytics"])
+
+
+def _minute(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() // 60)
+
+
+@router.get(
+    path="/analytics/{dimension}",
+    summary="Get Analytics",
+    description="Gets the sent, failed & bounced emails per minute of each sender or provider. Senders count emails "
+    "once they were sent or every attempt failed, providers count every send attempt made through them & the hard "
+    "bounces they report. Bounces are not counted per sender. Counts reach the analytics a few seconds after the sends",
+    response_model=ApiResponse[List[AnalyticsSeriesDto]],
+)
+async def get_analytics(
+    dimension: str = Path(
+        description="sender or provider", regex="^(sender|provider)$"
+    ),
+    key: str
+    | None = Query(
+        default=None,
+        description="Sender address or provider name, all of them if not given",
+    ),
+    start: datetime
+    | None = Query(
+        default=None,
+        description="Start of the period, an hour before the end if not given. Times without a timezone are in UTC",
+    ),
+    end: datetime
+    | None = Query(default=None, description="End of the period, now if not given"),
+):
+    """
+    Get analytics API function
+    :return: JSON response to client
+    :rtype: dict
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(hours=1)
+    first, last = _minute(start), _minute(end)
+    if first >= last:
+        raise ApiError(
+            status=status.HTTP_400_BAD_REQUEST, message="start must be before end"
+        )
+    retention = get_config().analytics_retention
+    if (last - first) * 60 > retention:
+        raise ApiError(
+            status=status.HTTP_400_BAD_REQUEST,
+            message=f"period must not be longer than {retention} seconds",
+        )
+
+    # providers do not report the sender of a bounce, so senders have no bounce counts
+    outcomes = [
+        outcome
+        for outcome in OUTCOMES
+        if dimension == "provider" or outcome != "bounced"
+    ]
+    series = await run_in_threadpool(
+        get_analytics_store().series,
+        dimension,
+        first,
+        last,
+        key.lower() if key and dimension == "sender" else key,
+    )
+    return ApiResponse(
+        status=status.HTTP_200_OK,
+        data=[
+            AnalyticsSeriesDto(
+                key=series_key,
+                **{
+                    outcome: sum(point[outcome] for point in points)
+                    for outcome in outcomes
+                },
+                points=[
+                    AnalyticsPointDto(
+                        time=datetime.fromtimestamp(point["minute"] * 60, timezone.utc),
+                        **{outcome: point[outcome] for outcome in outcomes},
+                    )
+                    for point in points
+                ],
+            )
+            for series_key, points in series.items()
+        ],
+    )
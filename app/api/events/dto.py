@@ -0,0 +1,14 @@
+"""
+DTO objects for event endpoints
+"""
+# pylint: disable=no-name-in-module
+from pydantic import BaseModel
+
+
+# pylint: disable=too-few-public-methods
+class EventBatchDto(BaseModel):
+    """
+    Accepted Event Batch
+    """
+
+    accepted: int
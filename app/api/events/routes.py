@@ -0,0 +1,85 @@
+"""
+Event Router
+"""
+from fastapi import APIRouter, Path, Request
+from starlette import status
+from app.api.dto import ApiError, ApiResponse
+from app.config import get_config
+from app.logger import log as logger
+from app.services.events import PARSERS, EventPayloadException
+from app.tasks.mail_error_task import mail_error_callback_task
+from app.worker.exceptions import PublisherBusyException
+from app.worker.publisher import get_publisher
+from .dto import EventBatchDto
+
+router = APIRouter(tags=["Events"])
+
+PROVIDER_PATH = Path(
+    description="Provider posting the events, sendgrid or mailchimp",
+    regex=f"^({'|'.join(PARSERS)})$",
+)
+
+
+@router.post(
+    path="/events/{provider}",
+    summary="Receive Provider Events",
+    description="Event webhook for SendGrid & Mailchimp Transactional. Events are queued in batches & recorded in the "
+    "background, so the provider is answered right away. Bounces, spam complaints & unsubscribes suppress the address",
+    response_model=ApiResponse[EventBatchDto],
+)
+async def receive_events(request: Request, provider: str = PROVIDER_PATH):
+    """
+    Event webhook API function. Only the fields that are recorded are queued, in batches of at most
+    event_batch_max_size events
+    :return: JSON response to client
+    :rtype: dict
+    """
+    try:
+        if request.headers.get("content-type", "").startswith(
+            "application/x-www-form-urlencoded"
+        ):
+            payload = (await request.form()).get("mandrill_events")
+        else:
+            payload = await request.json()
+        events = PARSERS[provider](payload)
+    except (ValueError, EventPayloadException) as exc:
+        raise ApiError(
+            status=status.HTTP_400_BAD_REQUEST, message=f"Invalid events, {exc}"
+        ) from exc
+
+    batch_size = get_config().event_batch_max_size
+    try:
+        get_publisher().publish_many(
+            [
+                (
+                    mail_error_callback_task,
+                    dict(events=events[start : start + batch_size]),
+                )
+                for start in range(0, len(events), batch_size)
+            ]
+        )
+    except PublisherBusyException as exc:
+        # the providers retry batches that are not accepted
+        logger.warning(f"Refusing {len(events)} {provider} events, {exc}")
+        raise ApiError(
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            message="Too many messages are waiting to be published, please retry later",
+        ) from exc
+
+    return ApiResponse(
+        status=status.HTTP_200_OK,
+        message="Events accepted",
+        data=EventBatchDto(accepted=len(events)),
+    )
+
+
+@router.head(
+    path="/events/{provider}",
+    summary="Check Event Webhook",
+    description="Mailchimp Transactional checks that a webhook exists with a HEAD request before adding it",
+)
+async def check_events(provider: str = PROVIDER_PATH):
+    """
+    Event webhook check API function
+    """
+    return ApiResponse(status=status.HTTP_200_OK)
@@ -1,13 +1,17 @@
 """
 DTO objects for mail endpoint
 """
-from typing import List
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
 
 # pylint: disable=no-name-in-module
-from pydantic import BaseModel, validator, Field
+from pydantic import BaseModel, validator, root_validator, Field
+from pydantic.errors import MissingError
+from app.config import get_config
 from app.domain.entities.email_sender import EmailSender
 from app.domain.entities.email_recipient import EmailRecipient
 from app.domain.entities.email_attachment import EmailAttachment
+from app.domain.entities.email_priority import EmailPriority
 
 
 # pylint: disable=too-few-public-methods
@@ -24,6 +28,8 @@ class EmailRecipientDto(EmailRecipient):
 class EmailAttachmentDto(EmailAttachment):
     """Email Attachment Payload"""
 
+    content: str
+
 
 # pylint: disable=too-few-public-methods
 class EmailRequestDto(BaseModel):
@@ -35,29 +41,111 @@ class EmailRequestDto(BaseModel):
     to: List[EmailRecipientDto]
     cc: List[EmailRecipientDto] | None
     bcc: List[EmailRecipientDto] | None
-    subject: str
-    message: str
+    template_id: str | None = Field(
+        default=None,
+        description="Id of a stored template to render the subject & message from, instead of giving them",
+    )
+    variables: Dict[str, Any] | None = Field(
+        default=None,
+        description="Template variables, recipients can override them with variables of their own",
+    )
+    subject: str | None
+    message: str | None
     attachments: List[EmailAttachmentDto] | None
+    fanout: bool = Field(
+        default=False,
+        description="Send a separate copy of the message to each recipient, recipients do not see each other",
+    )
+    priority: EmailPriority = Field(
+        default=EmailPriority.TRANSACTIONAL,
+        description="Transactional emails are sent ahead of bulk emails, use bulk for newsletters & other campaigns",
+    )
+    send_at: datetime | None = Field(
+        default=None,
+        description="Time to send the email at, it is sent right away if this is not set or is in the past. Times "
+        "without a timezone are in UTC",
+    )
 
-    @validator("subject")
+    @validator("subject", always=True)
     # pylint: disable=no-self-argument
-    def subject_must_be_valid(cls, sub):
+    def subject_must_be_valid(cls, sub, values):
         """
-        Validates subject
+        Validates subject, which is rendered from the template when a template is used
         """
-        if len(sub) == 0:
-            raise ValueError("must not be empty")
-        return sub
+        return _content_must_be_valid(sub, values)
 
-    @validator("message")
+    @validator("message", always=True)
     # pylint: disable=no-self-argument
-    def message_must_be_valid(cls, mes):
+    def message_must_be_valid(cls, mes, values):
         """
-        Validates message
+        Validates message, which is rendered from the template when a template is used
         """
-        if len(mes) == 0:
-            raise ValueError("must not be empty")
-        return mes
+        return _content_must_be_valid(mes, values)
+
+    @root_validator(skip_on_failure=True)
+    # pylint: disable=no-self-argument
+    def recipient_variables_must_not_be_shared(cls, values):
+        """
+        Validates that recipients only have variables of their own if they each receive a separate copy
+        """
+        if (
+            not values.get("fanout")
+            and len(values.get("to")) > 1
+            and any(recipient.variables for recipient in values.get("to"))
+        ):
+            raise ValueError("recipient variables are only supported with fanout")
+        return values
+
+    @root_validator(skip_on_failure=True)
+    # pylint: disable=no-self-argument
+    def fanout_must_not_copy(cls, values):
+        """
+        Validates that fan-out messages have no carbon copies, which would otherwise receive one copy per recipient
+        """
+        if values.get("fanout") and (values.get("cc") or values.get("bcc")):
+            raise ValueError("cc and bcc are not supported with fanout")
+        return values
+
+    @root_validator(skip_on_failure=True)
+    # pylint: disable=no-self-argument
+    def send_at_must_be_valid(cls, values):
+        """
+        Validates that scheduled emails are sent within the scheduling horizon. Times without a timezone are in UTC
+        """
+        send_at = values.get("send_at")
+        if send_at is not None:
+            if send_at.tzinfo is None:
+                values["send_at"] = send_at = send_at.replace(tzinfo=timezone.utc)
+            check_send_at(send_at, bool(values.get("attachments")))
+        return values
+
+
+def _content_must_be_valid(content: str | None, values: Dict[str, Any]) -> str | None:
+    if values.get("template_id") is not None:
+        if content is not None:
+            raise ValueError("must not be given with a template")
+        return content
+    if content is None:
+        raise MissingError()
+    if len(content) == 0:
+        raise ValueError("must not be empty")
+    return content
+
+
+def check_send_at(send_at: datetime, has_attachments: bool):
+    """
+    Checks that an email is scheduled within the scheduling horizon. Attachments are only kept for the attachment store
+    ttl, so emails with attachments must leave an hour for them to be sent & retried before then
+    """
+    if send_at.tzinfo is None:
+        send_at = send_at.replace(tzinfo=timezone.utc)
+
+    config = get_config()
+    max_delay = config.schedule_max_delay
+    if has_attachments:
+        max_delay = min(max_delay, config.attachment_store_ttl - 3600)
+    if send_at > datetime.now(timezone.utc) + timedelta(seconds=max_delay):
+        raise ValueError(f"must not be more than {max_delay} seconds from now")
 
 
 # pylint: disable=too-few-public-methods
@@ -68,3 +156,50 @@ class EmailResponseDto(BaseModel):
 
     status: int
     message: str
+
+
+# pylint: disable=too-few-public-methods
+class EmailBatchRequestDto(BaseModel):
+    """
+    Batch Email Request Payload. Messages are validated one by one so that an invalid message does not reject the
+    whole batch
+    """
+
+    messages: List[Dict[str, Any]]
+
+    @validator("messages")
+    # pylint: disable=no-self-argument
+    def messages_must_be_valid(cls, messages):
+        """
+        Validates number of messages
+        """
+        if len(messages) == 0:
+            raise ValueError("must not be empty")
+        max_size = get_config().mail_batch_max_size
+        if len(messages) > max_size:
+            raise ValueError(f"must not contain more than {max_size} messages")
+        return messages
+
+
+# pylint: disable=too-few-public-methods
+class EmailBatchItemResultDto(BaseModel):
+    """
+    Outcome of a single message in a Batch Email Request
+    """
+
+    index: int
+    accepted: bool
+    errors: Dict[str, List[str]] | None
+
+
+# pylint: disable=too-few-public-methods
+class EmailBatchResponseDto(BaseModel):
+    """
+    Batch Email Response Payload
+    """
+
+    status: int
+    message: str
+    accepted: int
+    rejected: int
+    results: List[EmailBatchItemResultDto]
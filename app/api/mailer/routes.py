@@ -1,16 +1,206 @@
 """
 Mail Router
 """
-from fastapi import APIRouter, BackgroundTasks
+from typing import Awaitable, Callable, List
+from fastapi import APIRouter, File, Form, Header, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from pydantic.error_wrappers import ErrorWrapper
 from starlette import status
+from app.config import config
 from app.logger import log as logger
-from app.api.dto import ApiResponse, BadRequest
+from app.metrics import VALIDATION_DURATION
+from app.api.dto import ApiError, ApiResponse, BadRequest
 from app.exceptions import AppException
-from app.domain.send_email import send_email, EmailRequest
-from .dto import EmailRequestDto, EmailResponseDto
+from app.worker.exceptions import PublisherBusyException
+from app.infra.handlers import format_validation_errors
+from app.domain.send_email import send_email, send_emails, EmailRequest
+from app.domain.entities.email_attachment import EmailAttachment
+from app.services.attachments import get_attachment_store, store_attachments
+from app.services.templates import (
+    TemplateNotFoundException,
+    TemplateRenderingException,
+    get_template_engine,
+    get_template_store,
+)
+from app.services.idempotency import (
+    IdempotencyConflictException,
+    IdempotencyKeyReusedException,
+    fingerprint,
+    get_idempotency_cache,
+)
+from .dto import (
+    EmailRequestDto,
+    EmailResponseDto,
+    EmailBatchRequestDto,
+    EmailBatchItemResultDto,
+    EmailBatchResponseDto,
+    check_send_at,
+)
 
 router = APIRouter(tags=["Email"])
 
+IDEMPOTENCY_KEY_HEADER = Header(
+    default=None,
+    description="Repeats of a request with the same key get the original response back instead of the email being "
+    "sent again",
+)
+
+
+def _to_email_request(
+    payload: EmailRequestDto, uploads: List[EmailAttachment] | None = None
+) -> EmailRequest:
+    # the payload was validated as it was parsed, which covers every rule of the email request, so it is not validated
+    # a second time
+    attachments = [*(payload.attachments or []), *(uploads or [])]
+    return EmailRequest.construct(
+        sender=payload.from_,
+        recipients=payload.to,
+        ccs=payload.cc,
+        template_id=payload.template_id,
+        variables=payload.variables,
+        subject=payload.subject,
+        bccs=payload.bcc,
+        message=payload.message,
+        attachments=attachments or None,
+        fanout=payload.fanout,
+        priority=payload.priority,
+        send_at=payload.send_at,
+    )
+
+
+def _store_attachments(email_requests: List[EmailRequest]):
+    """
+    Moves the contents of inline attachments into the attachment store, so that only references to them are queued
+    """
+    for email_request in email_requests:
+        if email_request.attachments:
+            email_request.attachments = [
+                EmailAttachment(**attachment)
+                for attachment in store_attachments(
+                    [attachment.dict() for attachment in email_request.attachments]
+                )
+            ]
+
+
+def _template_error(email_request: EmailRequest) -> str | None:
+    """
+    Renders the template of an email for its first recipient, so that unknown templates & missing variables are refused
+    here rather than failing at the worker. Returns what is wrong with the template, if anything. Templates are read
+    from the store & compiled, so this is called in the threadpool
+    """
+    if not get_template_store().exists(email_request.template_id):
+        return f"Template {email_request.template_id} not found"
+
+    variables = {
+        **(email_request.variables or {}),
+        **(email_request.recipients[0].variables or {}),
+    }
+    try:
+        get_template_engine().render(email_request.template_id, variables)
+    except (TemplateNotFoundException, TemplateRenderingException) as exc:
+        return str(exc)
+    return None
+
+
+async def _template_errors(email_requests: List[EmailRequest]) -> List[str | None]:
+    """
+    Checks the templates of emails, in a single trip to the threadpool for emails that use a template
+    """
+    if not any(email_request.template_id for email_request in email_requests):
+        return [None] * len(email_requests)
+    return await run_in_threadpool(
+        lambda: [
+            _template_error(email_request) if email_request.template_id else None
+            for email_request in email_requests
+        ]
+    )
+
+
+def _has_inline_attachments(email_request: EmailRequest) -> bool:
+    return any(
+        attachment.content is not None for attachment in email_request.attachments or []
+    )
+
+
+def _idempotency_key(
+    endpoint: str, idempotency_key: str | None, request_fingerprint: str
+) -> str | None:
+    if idempotency_key:
+        return f"{endpoint}:{idempotency_key}"
+    if config.idempotency_content_hash:
+        return f"{endpoint}:{request_fingerprint}"
+    return None
+
+
+async def _idempotent(
+    key: str | None,
+    request_fingerprint: str,
+    response: Response,
+    handle: Callable[[], Awaitable[ApiResponse]],
+):
+    """
+    Handles a request at most once per idempotency key. Repeats get the original response back, which is only kept if
+    the request succeeded so that failed requests can be retried
+    """
+    if key is None:
+        return await handle()
+
+    cache = get_idempotency_cache()
+    try:
+        replay = await run_in_threadpool(cache.begin, key, request_fingerprint)
+    except IdempotencyConflictException as exc:
+        raise ApiError(status=status.HTTP_409_CONFLICT, message=str(exc)) from exc
+    except IdempotencyKeyReusedException as exc:
+        raise ApiError(
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY, message=str(exc)
+        ) from exc
+    if replay is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+        return replay
+
+    try:
+        result = await handle()
+    except BaseException:
+        await run_in_threadpool(cache.release, key)
+        raise
+
+    if result.status == status.HTTP_200_OK:
+        await run_in_threadpool(
+            cache.complete, key, request_fingerprint, jsonable_encoder(result)
+        )
+    else:
+        await run_in_threadpool(cache.release, key)
+    return result
+
+
+async def _enqueue(email_request: EmailRequest) -> ApiResponse:
+    try:
+        # recipients are checked against the suppression list & scheduled emails are written to the schedule, both of
+        # which block
+        await run_in_threadpool(send_email, email_request)
+
+        return ApiResponse(
+            status=status.HTTP_200_OK, message="Email sent out successfully"
+        )
+    except PublisherBusyException as exc:
+        logger.bind(recipients=email_request.recipients).warning(
+            f"Refusing email, {exc}"
+        )
+        raise ApiError(
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            message="Too many emails are waiting to be sent, please retry later",
+        ) from exc
+    except AppException as exc:
+        logger.error(
+            f"Failed to send email to {email_request.recipients} with error {exc}"
+        )
+        return ApiResponse(
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR, message="Failed to send email"
+        )
+
 
 @logger.catch
 @router.post(
@@ -19,7 +209,12 @@ router = APIRouter(tags=["Email"])
     description="Sends an email",
     response_model=EmailResponseDto,
 )
-async def send_plain_email(payload: EmailRequestDto, background_tasks: BackgroundTasks):
+async def send_plain_email(
+    payload: EmailRequestDto,
+    request: Request,
+    response: Response,
+    idempotency_key: str | None = IDEMPOTENCY_KEY_HEADER,
+):
     """
     Send email API function. This is a POST REST endpoint that accepts requests that meet the criteria defined by the
     schema validation before sending a plain text email
@@ -30,26 +225,190 @@ async def send_plain_email(payload: EmailRequestDto, background_tasks: Backgroun
     if not payload:
         return BadRequest(message="No data provided")
 
+    # the body is parsed & validated by FastAPI before the route is called, so validation is not timed for /sendmail
+    async def handle():
+        email_request = _to_email_request(payload)
+        [template_error] = await _template_errors([email_request])
+        if template_error:
+            raise ApiError(status=status.HTTP_400_BAD_REQUEST, message=template_error)
+        if _has_inline_attachments(email_request):
+            await run_in_threadpool(_store_attachments, [email_request])
+
+        return await _enqueue(email_request)
+
+    request_fingerprint = fingerprint(await request.body())
+    return await _idempotent(
+        _idempotency_key("sendmail", idempotency_key, request_fingerprint),
+        request_fingerprint,
+        response,
+        handle,
+    )
+
+
+@logger.catch
+@router.post(
+    path="/sendmail/multipart",
+    summary="Send Email with uploaded attachments",
+    description="Sends an email whose attachments are uploaded as multipart/form-data files instead of being base64 "
+    "encoded in the JSON body",
+    response_model=EmailResponseDto,
+)
+async def send_multipart_email(
+    response: Response,
+    payload: str = Form(
+        description="JSON encoded email as accepted by /sendmail, attachments are optional"
+    ),
+    attachments: List[UploadFile] = File(default=[]),
+    idempotency_key: str | None = IDEMPOTENCY_KEY_HEADER,
+):
+    """
+    Send email API function for multipart/form-data requests. Uploaded files are streamed to the attachment store and
+    only their digests are queued, so neither request memory nor the queued message grow with attachment size
+    :return: JSON response to client
+    :rtype: dict
+    """
     try:
-        data = dict(
-            sender=payload.from_,
-            recipients=payload.to,
-            ccs=payload.cc,
-            subject=payload.subject,
-            bccs=payload.bcc,
-            message=payload.message,
-            attachments=payload.attachments,
+        with VALIDATION_DURATION.labels(endpoint="sendmail_multipart").time():
+            email_request_dto = EmailRequestDto.parse_raw(payload)
+    except ValidationError as exc:
+        raise RequestValidationError(exc.raw_errors) from exc
+    if attachments and email_request_dto.send_at is not None:
+        try:
+            check_send_at(email_request_dto.send_at, has_attachments=True)
+        except ValueError as exc:
+            raise RequestValidationError([ErrorWrapper(exc, loc=("send_at",))]) from exc
+
+    store = get_attachment_store()
+    uploads = []
+    for upload in attachments:
+        reference = await run_in_threadpool(store.put, upload.file)
+        uploads.append(
+            EmailAttachment(
+                reference=reference,
+                filename=upload.filename,
+                type=upload.content_type or "application/octet-stream",
+            )
         )
 
-        email_request = EmailRequest(**data)
+    async def handle():
+        email_request = _to_email_request(email_request_dto, uploads)
+        [template_error] = await _template_errors([email_request])
+        if template_error:
+            raise ApiError(status=status.HTTP_400_BAD_REQUEST, message=template_error)
+        if _has_inline_attachments(email_request):
+            await run_in_threadpool(_store_attachments, [email_request])
 
-        background_tasks.add_task(send_email, email_request)
+        return await _enqueue(email_request)
 
-        return ApiResponse(
-            status=status.HTTP_200_OK, message="Email sent out successfully"
-        )
+    # the store is content addressed, so uploads are fingerprinted by their references
+    request_fingerprint = fingerprint(
+        payload,
+        *(f"{upload.reference}:{upload.filename}:{upload.type}" for upload in uploads),
+    )
+    return await _idempotent(
+        _idempotency_key("sendmail_multipart", idempotency_key, request_fingerprint),
+        request_fingerprint,
+        response,
+        handle,
+    )
+
+
+@logger.catch
+@router.post(
+    path="/sendmail/batch",
+    summary="Send Email Batch",
+    description="Sends many emails in a single request. Each message is validated on its own and the outcome of each "
+    "message is reported back",
+    response_model=EmailBatchResponseDto,
+)
+async def send_batch_email(
+    payload: EmailBatchRequestDto,
+    request: Request,
+    response: Response,
+    idempotency_key: str | None = IDEMPOTENCY_KEY_HEADER,
+):
+    """
+    Batch send email API function. Valid messages are enqueued together in a single broker round trip, invalid ones are
+    reported back with their validation errors
+    :return: JSON response to client
+    :rtype: dict
+    """
+    request_fingerprint = fingerprint(await request.body())
+    return await _idempotent(
+        _idempotency_key("sendmail_batch", idempotency_key, request_fingerprint),
+        request_fingerprint,
+        response,
+        lambda: _send_batch(payload),
+    )
+
+
+async def _send_batch(payload: EmailBatchRequestDto) -> EmailBatchResponseDto:
+    results = []
+    valid = []
+
+    for index, message in enumerate(payload.messages):
+        try:
+            with VALIDATION_DURATION.labels(endpoint="sendmail_batch").time():
+                valid.append(
+                    (index, _to_email_request(EmailRequestDto.parse_obj(message)))
+                )
+        except ValidationError as exc:
+            results.append(
+                EmailBatchItemResultDto(
+                    index=index,
+                    accepted=False,
+                    errors=format_validation_errors(exc.errors()),
+                )
+            )
+
+    email_requests = []
+    template_errors = await _template_errors([request for _, request in valid])
+    for (index, email_request), template_error in zip(valid, template_errors):
+        if template_error:
+            results.append(
+                EmailBatchItemResultDto(
+                    index=index,
+                    accepted=False,
+                    errors=dict(template_id=[template_error]),
+                )
+            )
+        else:
+            email_requests.append(email_request)
+            results.append(EmailBatchItemResultDto(index=index, accepted=True))
+    results.sort(key=lambda result: result.index)
+
+    accepted = len(email_requests)
+    rejected = len(results) - accepted
+
+    try:
+        if any(_has_inline_attachments(request) for request in email_requests):
+            await run_in_threadpool(_store_attachments, email_requests)
+        if email_requests:
+            await run_in_threadpool(send_emails, email_requests)
     except AppException as exc:
-        logger.error(f"Failed to send email to {payload.to} with error {exc}")
-        return ApiResponse(
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR, message="Failed to send email"
+        logger.error(f"Failed to send email batch of {accepted} with error {exc}")
+        busy = isinstance(exc, PublisherBusyException)
+        return EmailBatchResponseDto(
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+            if busy
+            else status.HTTP_500_INTERNAL_SERVER_ERROR,
+            message="Too many emails are waiting to be sent, please retry later"
+            if busy
+            else "Failed to send email batch",
+            accepted=0,
+            rejected=len(results),
+            results=[
+                EmailBatchItemResultDto(index=result.index, accepted=False)
+                if result.accepted
+                else result
+                for result in results
+            ],
         )
+
+    return EmailBatchResponseDto(
+        status=status.HTTP_200_OK,
+        message=f"{accepted} of {len(results)} emails sent out successfully",
+        accepted=accepted,
+        rejected=rejected,
+        results=results,
+    )
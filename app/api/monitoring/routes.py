@@ -2,8 +2,10 @@
 Monitoring routs
 """
 from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from starlette.status import HTTP_200_OK
+from app.metrics import get_registry
 
 router = APIRouter()
 
@@ -14,3 +16,13 @@ def healthz():
     Router to check health of application
     """
     return JSONResponse(status_code=HTTP_200_OK, content={"message": "Healthy!"})
+
+
+@router.get("/metrics", tags=["monitoring"])
+def metrics():
+    """
+    Router to expose application metrics to Prometheus
+    """
+    return Response(
+        content=generate_latest(get_registry()), media_type=CONTENT_TYPE_LATEST
+    )
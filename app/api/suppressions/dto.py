@@ -0,0 +1,61 @@
+"""
+DTO objects for suppression endpoints
+"""
+from datetime import datetime
+from typing import List
+
+# pylint: disable=no-name-in-module
+from pydantic import BaseModel, Field, validator
+from app.config import get_config
+from app.domain.entities import EmailAddress, SuppressionReason
+
+
+# pylint: disable=too-few-public-methods
+class SuppressionDto(BaseModel):
+    """
+    Suppressed Address
+    """
+
+    email: EmailAddress
+    reason: SuppressionReason = SuppressionReason.MANUAL
+
+
+# pylint: disable=too-few-public-methods
+class SuppressionBatchDto(BaseModel):
+    """
+    Suppression Payload
+    """
+
+    suppressions: List[SuppressionDto]
+
+    @validator("suppressions")
+    # pylint: disable=no-self-argument
+    def suppressions_must_be_valid(cls, suppressions):
+        """
+        Validates number of addresses
+        """
+        if len(suppressions) == 0:
+            raise ValueError("must not be empty")
+        max_size = get_config().suppression_batch_max_size
+        if len(suppressions) > max_size:
+            raise ValueError(f"must not contain more than {max_size} addresses")
+        return suppressions
+
+
+# pylint: disable=too-few-public-methods
+class SuppressionDetailDto(SuppressionDto):
+    """
+    Suppression of an address
+    """
+
+    created: datetime = Field(description="Time the address was first suppressed")
+
+
+# pylint: disable=too-few-public-methods
+class SuppressionImportDto(BaseModel):
+    """
+    Outcome of a Suppression Import
+    """
+
+    added: int
+    rejected: int = Field(description="Lines without a valid address & reason")
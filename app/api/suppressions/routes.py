@@ -0,0 +1,145 @@
+"""
+Suppression Router
+"""
+import codecs
+import csv
+from datetime import datetime, timezone
+from typing import BinaryIO, Tuple
+from fastapi import APIRouter, File, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from starlette import status
+from app.api.dto import ApiError, ApiResponse
+from app.config import get_config
+from app.domain.entities import EmailAddress, SuppressionReason
+from app.services.suppression import (
+    SuppressionNotFoundException,
+    get_suppression_list,
+)
+from .dto import SuppressionBatchDto, SuppressionDetailDto, SuppressionImportDto
+
+router = APIRouter(tags=["Suppressions"])
+
+
+def _import(file: BinaryIO) -> Tuple[int, int]:
+    # lines are read as they are added, so the upload is never held in memory whole
+    suppression_list = get_suppression_list()
+    batch_size = get_config().suppression_batch_max_size
+    added, rejected, batch = 0, 0, []
+    for row in csv.reader(codecs.iterdecode(file, "utf-8-sig")):
+        if not row or not row[0].strip() or row[0].strip().lower() == "email":
+            continue
+        try:
+            email = EmailAddress.validate(row[0].strip())
+            reason = SuppressionReason(
+                row[1].strip().lower() if len(row) > 1 and row[1].strip() else "manual"
+            )
+        except ValueError:
+            rejected += 1
+            continue
+        batch.append((email, reason.value))
+        if len(batch) == batch_size:
+            added += suppression_list.add(batch)
+            batch = []
+    if batch:
+        added += suppression_list.add(batch)
+    return added, rejected
+
+
+@router.post(
+    path="/suppressions",
+    summary="Suppress Addresses",
+    description="Adds addresses to the suppression list, emails are no longer sent to them. Addresses already on the "
+    "list have their reason updated",
+    response_model=ApiResponse,
+)
+async def add_suppressions(payload: SuppressionBatchDto):
+    """
+    Suppress addresses API function
+    :return: JSON response to client
+    :rtype: dict
+    """
+    added = await run_in_threadpool(
+        get_suppression_list().add,
+        [
+            (suppression.email, suppression.reason.value)
+            for suppression in payload.suppressions
+        ],
+    )
+    return ApiResponse(
+        status=status.HTTP_200_OK, message=f"{added} addresses suppressed"
+    )
+
+
+@router.post(
+    path="/suppressions/import",
+    summary="Import Suppressions",
+    description="Adds the addresses of an uploaded CSV file to the suppression list. Each line holds an address & "
+    "optionally a reason out of bounce, complaint, unsubscribe & manual, which is the default. A header line is "
+    "skipped",
+    response_model=ApiResponse[SuppressionImportDto],
+)
+async def import_suppressions(file: UploadFile = File()):
+    """
+    Import suppressions API function. Lines that are not valid are counted & skipped
+    :return: JSON response to client
+    :rtype: dict
+    """
+    try:
+        added, rejected = await run_in_threadpool(_import, file.file)
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise ApiError(
+            status=status.HTTP_400_BAD_REQUEST, message=f"Invalid CSV file, {exc}"
+        ) from exc
+
+    return ApiResponse(
+        status=status.HTTP_200_OK,
+        message="Suppressions imported",
+        data=SuppressionImportDto(added=added, rejected=rejected),
+    )
+
+
+@router.get(
+    path="/suppressions/{email}",
+    summary="Get Suppression",
+    description="Gets the suppression of an address",
+    response_model=ApiResponse[SuppressionDetailDto],
+)
+async def get_suppression(email: str):
+    """
+    Get suppression API function
+    :return: JSON response to client
+    :rtype: dict
+    """
+    try:
+        suppression = await run_in_threadpool(get_suppression_list().get, email)
+    except SuppressionNotFoundException as exc:
+        raise ApiError(status=status.HTTP_404_NOT_FOUND, message=str(exc)) from exc
+
+    return ApiResponse(
+        status=status.HTTP_200_OK,
+        data=SuppressionDetailDto(
+            email=suppression["email"],
+            reason=suppression["reason"],
+            created=datetime.fromtimestamp(suppression["created"], timezone.utc),
+        ),
+    )
+
+
+@router.delete(
+    path="/suppressions/{email}",
+    summary="Remove Suppression",
+    description="Removes an address from the suppression list, emails are sent to it again",
+    response_model=ApiResponse,
+)
+async def remove_suppression(email: str):
+    """
+    Remove suppression API function
+    :return: JSON response to client
+    :rtype: dict
+    """
+    try:
+        await run_in_threadpool(get_suppression_list().remove, email)
+    except SuppressionNotFoundException as exc:
+        raise ApiError(status=status.HTTP_404_NOT_FOUND, message=str(exc)) from exc
+
+    return ApiResponse(status=status.HTTP_200_OK, message="Suppression removed")
@@ -0,0 +1,36 @@
+"""
+DTO objects for template endpoints
+"""
+# pylint: disable=no-name-in-module
+from pydantic import BaseModel, Field, validator
+
+
+# pylint: disable=too-few-public-methods
+class TemplateDto(BaseModel):
+    """
+    Template Payload
+    """
+
+    subject: str = Field(description="Jinja2 template of the subject")
+    message: str = Field(
+        description="Jinja2 template of the message, variables are escaped in HTML documents"
+    )
+
+    @validator("subject", "message")
+    # pylint: disable=no-self-argument
+    def must_not_be_empty(cls, value):
+        """
+        Validates subject & message
+        """
+        if len(value) == 0:
+            raise ValueError("must not be empty")
+        return value
+
+
+# pylint: disable=too-few-public-methods
+class TemplateIdDto(BaseModel):
+    """
+    Registered Template
+    """
+
+    template_id: str
@@ -0,0 +1,85 @@
+"""
+Template Router
+"""
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from starlette import status
+from app.api.dto import ApiError, ApiResponse
+from app.services.templates import (
+    TemplateInvalidException,
+    TemplateNotFoundException,
+    get_template_engine,
+    get_template_store,
+)
+from .dto import TemplateDto, TemplateIdDto
+
+router = APIRouter(tags=["Templates"])
+
+
+@router.post(
+    path="/templates",
+    summary="Register Template",
+    description="Stores a template that emails can be rendered from by passing its id as template_id. Registering the "
+    "same template again returns the same id",
+    response_model=ApiResponse[TemplateIdDto],
+)
+async def register_template(payload: TemplateDto):
+    """
+    Register template API function. The template is compiled to check it before it is stored
+    :return: JSON response to client
+    :rtype: dict
+    """
+    try:
+        get_template_engine().check(payload.subject, payload.message)
+    except TemplateInvalidException as exc:
+        raise ApiError(status=status.HTTP_400_BAD_REQUEST, message=str(exc)) from exc
+
+    template_id = await run_in_threadpool(
+        get_template_store().put, payload.subject, payload.message
+    )
+    return ApiResponse(
+        status=status.HTTP_200_OK,
+        message="Template registered",
+        data=TemplateIdDto(template_id=template_id),
+    )
+
+
+@router.get(
+    path="/templates/{template_id}",
+    summary="Get Template",
+    description="Gets a stored template",
+    response_model=ApiResponse[TemplateDto],
+)
+async def get_template(template_id: str):
+    """
+    Get template API function
+    :return: JSON response to client
+    :rtype: dict
+    """
+    try:
+        template = await run_in_threadpool(get_template_store().get, template_id)
+    except TemplateNotFoundException as exc:
+        raise ApiError(status=status.HTTP_404_NOT_FOUND, message=str(exc)) from exc
+
+    return ApiResponse(status=status.HTTP_200_OK, data=TemplateDto(**template))
+
+
+@router.delete(
+    path="/templates/{template_id}",
+    summary="Delete Template",
+    description="Deletes a stored template. Emails already queued with the template fail & are passed to the error "
+    "queue, unless the worker sending them still has the template cached",
+    response_model=ApiResponse,
+)
+async def delete_template(template_id: str):
+    """
+    Delete template API function
+    :return: JSON response to client
+    :rtype: dict
+    """
+    try:
+        await run_in_threadpool(get_template_store().delete, template_id)
+    except TemplateNotFoundException as exc:
+        raise ApiError(status=status.HTTP_404_NOT_FOUND, message=str(exc)) from exc
+
+    return ApiResponse(status=status.HTTP_200_OK, message="Template deleted")
@@ -3,7 +3,7 @@ Configurations for application. These are global variables that the app will use
 lifetime
 """
 from functools import lru_cache
-from typing import Optional, AnyStr
+from typing import List, Optional, AnyStr
 from pydantic import BaseSettings
 
 from dotenv import load_dotenv
@@ -37,6 +37,12 @@ class Config(BaseSettings):
     base_url: str = "/api/v1/baruapepe"
     environment: str = "development"
     docs_disabled: bool = False
+    # email addresses whose validation outcome is kept by each process
+    email_validation_cache_size: int = 65536
+    # maximum number of messages accepted by a single batch send request
+    mail_batch_max_size: int = 1000
+    # maximum number of recipients a single fan-out message is sent to, larger recipient lists are split
+    mail_fanout_max_recipients: int = 1000
 
     # smtp settings
     mail_smtp_enabled: bool = True
@@ -47,12 +53,138 @@ class Config(BaseSettings):
     mail_username: str = "baruapepe"
     mail_password: str = "password"
 
-    # mail api settings
+    # smtp connection pool settings
+    mail_pool_min_size: int = 1
+    mail_pool_max_size: int = 10
+    mail_pool_idle_timeout: float = 300.0
+    mail_pool_max_messages: int = 100
+    mail_pool_checkout_timeout: float = 30.0
+    # connections the relay has not answered on for this many seconds are probed with a NOOP before being reused
+    mail_pool_probe_interval: float = 30.0
+    # maximum number of concurrent relay conversations for the asyncio SMTP client used by the API process
+    mail_async_max_connections: int = 100
+
+    # email providers, out of smtp, sendgrid & mailchimp. Traffic is spread over the primary providers by latency, the
+    # fallback providers are only used once every primary provider failed or has its circuit open
+    mail_providers: List[str] = ["smtp"]
+    mail_fallback_providers: List[str] = ["sendgrid"]
+    # a provider's circuit opens once circuit_breaker_failure_rate of at least circuit_breaker_min_calls sends over the
+    # last circuit_breaker_window seconds failed, & a probe send is let through circuit_breaker_open_timeout seconds
+    # later
+    circuit_breaker_failure_rate: float = 0.5
+    circuit_breaker_window: float = 60.0
+    circuit_breaker_min_calls: int = 5
+    circuit_breaker_open_timeout: float = 30.0
+
+    # mail api settings, the provider's own API is used when mail_api_url is empty
     mail_api_token: str = ""
     mail_api_url: str = ""
 
+    # directory attachments are stored in, shared by the API & the workers
+    attachment_store_path: str = "/tmp/barua-pepe/attachments"
+    # seconds an attachment is kept after it was last stored
+    attachment_store_ttl: int = 86400
+
+    # directory templates are stored in, shared by the API & the workers
+    template_store_path: str = "/tmp/barua-pepe/templates"
+    # compiled templates kept by each process
+    template_cache_size: int = 256
+
+    # provider rate limits, shared by every API & worker process. Limits are kept in Redis when rate_limit_redis_url
+    # is set & in files under rate_limit_path otherwise, which only coordinates processes on the same host
+    rate_limit_redis_url: str = ""
+    rate_limit_path: str = "/tmp/barua-pepe/ratelimit"
+    # seconds a send waits for the provider's limits before giving up
+    rate_limit_timeout: float = 30.0
+    # seconds after which a concurrency slot held by a crashed process is reclaimed
+    rate_limit_lease_ttl: float = 300.0
+    # sends per second (0 disables the limit), sends allowed at once after a quiet period & maximum concurrent sends
+    # (0 disables the limit) for each provider
+    smtp_rate_limit: float = 0
+    smtp_rate_burst: int = 10
+    smtp_max_concurrency: int = 0
+    sendgrid_rate_limit: float = 0
+    sendgrid_rate_burst: int = 10
+    sendgrid_max_concurrency: int = 0
+    mailchimp_rate_limit: float = 0
+    mailchimp_rate_burst: int = 10
+    mailchimp_max_concurrency: int = 0
+
+    # responses to requests made with an Idempotency-Key header are replayed for idempotency_ttl seconds instead of the
+    # email being sent again. With idempotency_content_hash identical requests are also recognised without a key.
+    # Responses are shared through Redis when idempotency_redis_url is set & files under idempotency_path otherwise,
+    # with the idempotency_cache_size most recent ones also kept in each process
+    idempotency_ttl: int = 86400
+    # seconds a request holds its key while it is handled, repeats are refused in the meantime
+    idempotency_pending_ttl: int = 60
+    idempotency_cache_size: int = 10000
+    idempotency_content_hash: bool = False
+    idempotency_redis_url: str = ""
+    idempotency_path: str = "/tmp/barua-pepe/idempotency"
+
+    # emails sent with a send_at time are held in a schedule indexed by due time until they are due. The schedule is
+    # kept in Redis when schedule_redis_url is set & in a SQLite database at schedule_path otherwise, which only works
+    # if Celery beat & the API share a host
+    schedule_redis_url: str = ""
+    schedule_path: str = "/tmp/barua-pepe/schedule.db"
+    # sends released to the workers at a time
+    schedule_batch_size: int = 1000
+    # seconds after which sends whose release failed come due again
+    schedule_lease: int = 300
+    # seconds ahead an email can be scheduled
+    schedule_max_delay: int = 604800
+
+    # addresses that bounced, complained or unsubscribed are kept in a SQLite database at suppression_path, which the
+    # API & workers must share, & left out of emails before they are queued. Each process checks recipients against a
+    # Bloom filter of suppression_capacity addresses, grown as needed, that catches up on changes every
+    # suppression_refresh_interval seconds
+    suppression_path: str = "/tmp/barua-pepe/suppressions.db"
+    suppression_refresh_interval: float = 5.0
+    suppression_capacity: int = 100000
+    suppression_false_positive_rate: float = 0.001
+    # addresses added in a single request
+    suppression_batch_max_size: int = 10000
+
+    # provider events posted to the event webhook are queued event_batch_max_size at a time & summed up per message in a
+    # SQLite database at event_store_path, which the workers handling the events must share
+    event_store_path: str = "/tmp/barua-pepe/events.db"
+    event_batch_max_size: int = 1000
+    # seconds the ids of recorded events are kept, events posted again within them are only counted once
+    event_dedup_window: int = 259200
+
+    # send outcomes are counted per minute by sender & provider in each worker process, in a ring of
+    # analytics_buffer_minutes minutes, & handed to the analytics task every analytics_flush_interval seconds. The
+    # counts are kept in a SQLite database at analytics_store_path for analytics_retention seconds
+    analytics_store_path: str = "/tmp/barua-pepe/analytics.db"
+    analytics_buffer_minutes: int = 10
+    analytics_flush_interval: float = 10.0
+    analytics_retention: int = 2592000
+
     result_backend: Optional[str] = "rpc://"
 
+    # port celery workers serve their metrics on, 0 disables it. Workers sharing PROMETHEUS_MULTIPROC_DIR with the API
+    # are also included in the API's /metrics
+    worker_metrics_port: int = 0
+
+    # batch consumer settings, messages are taken off the queue batch_consumer_size at a time or as many as arrived
+    # within batch_consumer_timeout seconds. Emails the providers failed to send are retried batch_consumer_retry_delay
+    # seconds later, doubled with each retry
+    batch_consumer_size: int = 100
+    batch_consumer_timeout: float = 0.5
+    batch_consumer_retry_delay: float = 30.0
+
+    # task payloads of at least this many bytes are compressed with zstd, 0 disables compression
+    task_compression_threshold: int = 4096
+
+    # task publisher settings
+    publisher_max_pending: int = 10000
+    publisher_batch_size: int = 100
+    # seconds before messages the broker did not accept are published again, doubled after every failure
+    publisher_retry_delay: float = 0.1
+    publisher_max_retry_delay: float = 30.0
+    # attempts at publishing a message before it is dropped
+    publisher_max_attempts: int = 10
+
     # sentry settings
     sentry_dsn: str = ""
     sentry_enabled: bool = False
@@ -2,3 +2,7 @@
 Email Entities
 """
 from .email_request import EmailRequest
+from .email_priority import EmailPriority
+from .email_address import EmailAddress
+from .suppression_reason import SuppressionReason
+from .mail_event_type import MailEventType
@@ -0,0 +1,30 @@
+"""
+Email Address
+"""
+from functools import lru_cache
+
+# pylint: disable=no-name-in-module
+from pydantic import EmailStr
+from pydantic.networks import validate_email
+
+from app.config import get_config
+
+
+@lru_cache(maxsize=get_config().email_validation_cache_size)
+def _validate(value: str) -> str:
+    # invalid addresses raise & are therefore not cached
+    return validate_email(value)[1]
+
+
+class EmailAddress(EmailStr):
+    """
+    Email address, validated as EmailStr is. Validating an address takes a while, so the outcome for the most recently
+    seen addresses is cached, which pays off for the senders & recipients that come up request after request
+    """
+
+    @classmethod
+    def validate(cls, value: str) -> str:
+        """
+        Validates an email address, returning the normalized address
+        """
+        return _validate(value)
@@ -2,16 +2,18 @@
 Email Attachment
 """
 # pylint: disable=no-name-in-module
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, validator, root_validator
 
 
 # pylint: disable=too-few-public-methods
 class EmailAttachment(BaseModel):
     """
-    Represents an Email Attachment
+    Represents an Email Attachment. The base64 encoded content is either carried inline or the attachment refers to an
+    upload kept in the attachment store
     """
 
-    content: str
+    content: str | None
+    reference: str | None
     filename: str
     # Mimetype of the attachment document
     type: str
@@ -22,7 +24,7 @@ class EmailAttachment(BaseModel):
         """
         Validates content
         """
-        if len(cont) == 0:
+        if cont is not None and len(cont) == 0:
             raise ValueError("must not be empty")
         return cont
 
@@ -35,3 +37,13 @@ class EmailAttachment(BaseModel):
         if len(file) == 0:
             raise ValueError("must not be empty")
         return file
+
+    @root_validator(skip_on_failure=True)
+    # pylint: disable=no-self-argument
+    def content_or_reference_must_be_provided(cls, values):
+        """
+        Validates that the attachment has content or refers to a stored upload
+        """
+        if values.get("content") is None and values.get("reference") is None:
+            raise ValueError("either content or reference must be provided")
+        return values
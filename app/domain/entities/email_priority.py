@@ -0,0 +1,14 @@
+"""
+Email Priority
+"""
+from enum import Enum
+
+
+class EmailPriority(str, Enum):
+    """
+    Lane an email is sent through. Transactional emails, such as password resets, are sent through their own queue &
+    workers so that they are never held up behind bulk sends, such as newsletters
+    """
+
+    TRANSACTIONAL = "transactional"
+    BULK = "bulk"
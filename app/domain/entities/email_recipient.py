@@ -1,8 +1,11 @@
 """
 Email Participant
 """
+from typing import Any, Dict
+
 # pylint: disable=no-name-in-module
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel
+from .email_address import EmailAddress
 
 
 # pylint: disable=too-few-public-methods
@@ -11,5 +14,7 @@ class EmailRecipient(BaseModel):
     Represents an email Recipient
     """
 
-    email: EmailStr
+    email: EmailAddress
     name: str | None
+    # template variables for this recipient only, overriding the variables of the email
+    variables: Dict[str, Any] | None
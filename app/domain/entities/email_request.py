@@ -1,13 +1,16 @@
 """
 Email Request
 """
-from typing import List
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
 
 # pylint: disable=no-name-in-module
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, validator, root_validator
 from .email_sender import EmailSender
 from .email_attachment import EmailAttachment
 from .email_recipient import EmailRecipient
+from .email_priority import EmailPriority
 
 
 # pylint: disable=too-few-public-methods
@@ -20,15 +23,23 @@ class EmailRequest(BaseModel):
     recipients: List[EmailRecipient]
     ccs: List[EmailRecipient] | None
     bccs: List[EmailRecipient] | None
-    subject: str
-    message: str
+    # subject & message are rendered from the template at the worker when a template is used
+    template_id: str | None
+    variables: Dict[str, Any] | None
+    subject: str | None
+    message: str | None
     attachments: List[EmailAttachment] | None
+    # each recipient receives a separate copy of the message & does not see the other recipients
+    fanout: bool = False
+    priority: EmailPriority = EmailPriority.TRANSACTIONAL
+    # the message is held back until this time, times without a timezone are in UTC
+    send_at: datetime | None = None
 
     @validator("subject")
     # pylint: disable=no-self-argument
     def subject_must_be_valid(cls, sub):
         """Validates subject"""
-        if len(sub) == 0:
+        if sub is not None and len(sub) == 0:
             raise ValueError("subject must not be empty")
         return sub
 
@@ -36,6 +47,29 @@ class EmailRequest(BaseModel):
     # pylint: disable=no-self-argument
     def message_must_be_valid(cls, mes):
         """Validates message"""
-        if len(mes) == 0:
+        if mes is not None and len(mes) == 0:
             raise ValueError("message must not be empty")
         return mes
+
+    @root_validator(skip_on_failure=True)
+    # pylint: disable=no-self-argument
+    def content_must_be_given(cls, values):
+        """Validates that there is a template or a subject & message"""
+        if values.get("template_id") is None and (
+            values.get("subject") is None or values.get("message") is None
+        ):
+            raise ValueError("subject and message are required without a template")
+        return values
+
+    @validator("send_at")
+    # pylint: disable=no-self-argument
+    def send_at_must_have_timezone(cls, send_at):
+        """Assumes UTC for times without a timezone"""
+        if send_at is not None and send_at.tzinfo is None:
+            return send_at.replace(tzinfo=timezone.utc)
+        return send_at
+
+    @property
+    def is_scheduled(self) -> bool:
+        """Whether the message is to be sent at a later time"""
+        return self.send_at is not None and self.send_at.timestamp() > time.time()
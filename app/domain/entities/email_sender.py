@@ -2,7 +2,8 @@
 Email Sender
 """
 # pylint: disable=no-name-in-module
-from pydantic import BaseModel, validator, EmailStr
+from pydantic import BaseModel, validator
+from .email_address import EmailAddress
 
 
 # pylint: disable=too-few-public-methods
@@ -11,7 +12,7 @@ class EmailSender(BaseModel):
     Represents an Email Sender
     """
 
-    email: EmailStr
+    email: EmailAddress
     name: str
 
     @validator("name")
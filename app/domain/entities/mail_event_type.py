@@ -0,0 +1,21 @@
+"""
+Mail Event Type
+"""
+from enum import Enum
+
+
+class MailEventType(str, Enum):
+    """
+    Outcome of a sent email as reported by the provider. Providers name their events differently, so their events are
+    mapped onto these
+    """
+
+    DELIVERED = "delivered"
+    DEFERRED = "deferred"
+    SOFT_BOUNCED = "soft_bounced"
+    BOUNCED = "bounced"
+    DROPPED = "dropped"
+    COMPLAINED = "complained"
+    UNSUBSCRIBED = "unsubscribed"
+    OPENED = "opened"
+    CLICKED = "clicked"
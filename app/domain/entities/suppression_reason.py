@@ -0,0 +1,16 @@
+"""
+Suppression Reason
+"""
+from enum import Enum
+
+
+class SuppressionReason(str, Enum):
+    """
+    Reason an address is no longer sent to. Hard bounces & spam complaints come from the providers, unsubscribes &
+    manual suppressions are added through the API
+    """
+
+    BOUNCE = "bounce"
+    COMPLAINT = "complaint"
+    UNSUBSCRIBE = "unsubscribe"
+    MANUAL = "manual"
@@ -0,0 +1,94 @@
+"""
+Recipient fan-out. Groups messages that share the same content into fan-out messages, which providers deliver as a
+separate copy per recipient in a handful of API calls, and splits recipient lists that are too large for a single call
+"""
+import json
+from typing import Dict, Hashable, List, Tuple
+from app.config import get_config
+from app.domain.entities import EmailRequest
+
+
+def _content_key(email_request: EmailRequest) -> Hashable:
+    attachments = tuple(
+        (attachment.reference, attachment.content, attachment.filename, attachment.type)
+        for attachment in email_request.attachments or []
+    )
+    sender = (email_request.sender.email, email_request.sender.name)
+    return (
+        sender,
+        email_request.template_id,
+        json.dumps(email_request.variables, sort_keys=True, default=str),
+        email_request.subject,
+        email_request.message,
+        attachments,
+        email_request.priority,
+        email_request.send_at,
+    )
+
+
+def _can_fan_out(email_request: EmailRequest) -> bool:
+    # recipients of a message addressed to several people see each other, so it is only merged if it opted into fan-out
+    if email_request.ccs or email_request.bccs:
+        return False
+    return email_request.fanout or len(email_request.recipients) == 1
+
+
+def split_recipients(
+    email_request: EmailRequest, max_recipients: int | None = None
+) -> List[EmailRequest]:
+    """
+    Splits a fan-out message into messages of at most max_recipients recipients each
+    """
+    max_recipients = max_recipients or get_config().mail_fanout_max_recipients
+    recipients = email_request.recipients
+    if not email_request.fanout or len(recipients) <= max_recipients:
+        return [email_request]
+
+    return [
+        email_request.copy(
+            update=dict(recipients=recipients[start : start + max_recipients])
+        )
+        for start in range(0, len(recipients), max_recipients)
+    ]
+
+
+def group_recipients(
+    email_requests: List[EmailRequest], max_recipients: int | None = None
+) -> List[EmailRequest]:
+    """
+    Merges messages with identical sender, content, attachments, priority & send time into fan-out messages of at most
+    max_recipients recipients. Messages with carbon copies, or addressed to several recipients without opting into
+    fan-out, are passed through as they are. The order of first appearance is preserved
+    """
+    groups: Dict[Hashable, Tuple[EmailRequest, List]] = {}
+    grouped = []
+
+    for email_request in email_requests:
+        if not _can_fan_out(email_request):
+            grouped.append(email_request)
+            continue
+
+        key = _content_key(email_request)
+        if key not in groups:
+            groups[key] = (email_request, [])
+            grouped.append(key)
+        groups[key][1].extend(email_request.recipients)
+
+    merged = []
+    for item in grouped:
+        if isinstance(item, EmailRequest):
+            merged.append(item)
+            continue
+
+        email_request, recipients = groups[item]
+        if len(recipients) == len(email_request.recipients):
+            # nothing was merged into this message
+            merged.extend(split_recipients(email_request, max_recipients))
+            continue
+        merged.extend(
+            split_recipients(
+                email_request.copy(update=dict(recipients=recipients, fanout=True)),
+                max_recipients,
+            )
+        )
+    return merged
@@ -0,0 +1,46 @@
+"""
+Use case to record provider events
+"""
+from collections import Counter
+from typing import List
+from app.domain.entities import MailEventType, SuppressionReason
+from app.logger import log
+from app.metrics import MAIL_EVENTS
+from app.services.analytics import get_minute_series
+from app.services.events import MailEvent, get_event_store
+from app.services.suppression import get_suppression_list
+
+# events after which an address is no longer sent to
+SUPPRESSING_EVENTS = {
+    MailEventType.BOUNCED.value: SuppressionReason.BOUNCE,
+    MailEventType.COMPLAINED.value: SuppressionReason.COMPLAINT,
+    MailEventType.UNSUBSCRIBED.value: SuppressionReason.UNSUBSCRIBE,
+}
+
+
+def record_events(events: List[MailEvent]):
+    """
+    Command to record a batch of provider events. Events are summed up per message in the event store, addresses that
+    bounced, complained or unsubscribed are suppressed & events are counted per provider & type. Hard bounces are also
+    counted in the provider's analytics, providers do not report the sender so they are not counted per sender. Events
+    that were recorded before, by a retry of the batch or because the provider posted them again, are only suppressed
+    """
+    added = get_event_store().record(events)
+
+    suppressions = {}
+    for event in events:
+        reason = SUPPRESSING_EVENTS.get(event["event"])
+        if reason is not None:
+            suppressions[event["email"].lower()] = reason.value
+    if suppressions:
+        get_suppression_list().add(suppressions.items())
+
+    counts = Counter((event["provider"], event["event"]) for event in added)
+    series = get_minute_series()
+    for (provider, event_type), count in counts.items():
+        MAIL_EVENTS.labels(provider=provider, event=event_type).inc(count)
+        if event_type == MailEventType.BOUNCED.value:
+            series.record("provider", provider, "bounced", count)
+    log.info(
+        f"Recorded {len(added)} of {len(events)} events, suppressed {len(suppressions)} addresses"
+    )
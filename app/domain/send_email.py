@@ -1,12 +1,61 @@
 """
 Use case to send out emails
 """
+from typing import List
 from app.tasks.mail_sending_task import mail_sending_task
+from app.worker.publisher import get_publisher
+from app.metrics import ENQUEUE_DURATION
 from app.domain.entities import EmailRequest
+from app.domain.fanout import group_recipients, split_recipients
+from app.domain.suppression import drop_suppressed
+from app.services.scheduler import get_send_scheduler
 
 
 def send_email(data: EmailRequest):
     """
-    Command to send out emails
+    Command to send out emails. The message is handed to the task publisher, which publishes it in the background, or
+    scheduled if it is to be sent later. Fields that are not set are left out of the task payload. Fan-out messages with
+    more recipients than a provider call takes are split into several messages. Suppressed recipients are left out & the
+    message is dropped if none are left
     """
-    mail_sending_task.apply_async(kwargs=dict(data=data.dict()))
+    email_requests = drop_suppressed([data])
+    if not email_requests:
+        return
+    data = email_requests[0]
+    email_requests = split_recipients(data)
+    if len(email_requests) > 1:
+        send_emails(email_requests)
+        return
+    if data.is_scheduled:
+        with ENQUEUE_DURATION.labels(operation="schedule").time():
+            get_send_scheduler().schedule([data])
+        return
+    with ENQUEUE_DURATION.labels(operation="single").time():
+        get_publisher().publish(
+            mail_sending_task, kwargs=dict(data=data.dict(exclude_none=True))
+        )
+
+
+def send_emails(data: List[EmailRequest]):
+    """
+    Command to send out many emails at once. Messages sharing the same content are grouped into fan-out messages.
+    Messages to be sent later are scheduled, then either all of the other messages are handed to the task publisher or
+    none are. Suppressed recipients are left out first
+    """
+    scheduled, immediate = [], []
+    for email_request in group_recipients(drop_suppressed(data)):
+        (scheduled if email_request.is_scheduled else immediate).append(email_request)
+
+    if scheduled:
+        with ENQUEUE_DURATION.labels(operation="schedule").time():
+            get_send_scheduler().schedule(scheduled)
+    if not immediate:
+        return
+
+    with ENQUEUE_DURATION.labels(operation="batch").time():
+        get_publisher().publish_many(
+            [
+                (mail_sending_task, dict(data=email_request.dict(exclude_none=True)))
+                for email_request in immediate
+            ]
+        )
@@ -0,0 +1,89 @@
+"""
+Recipient suppression. Leaves addresses on the suppression list out of emails before they are queued, & drops emails
+left without a recipient. The recipients of a whole batch are checked in a single lookup
+"""
+from typing import Any, Dict, List
+from app.domain.entities import EmailRequest
+from app.logger import log
+from app.metrics import SUPPRESSED_RECIPIENTS
+from app.services.suppression import get_suppression_list
+from app.services.suppression.suppression_store import normalize
+
+_FIELDS = ("recipients", "ccs", "bccs")
+
+
+def drop_suppressed(email_requests: List[EmailRequest]) -> List[EmailRequest]:
+    """
+    Removes suppressed addresses from the recipients, ccs & bccs of email requests. Requests left without recipients are
+    dropped
+    """
+    suppressed = get_suppression_list().suppressed(
+        recipient.email
+        for email_request in email_requests
+        for field in _FIELDS
+        for recipient in getattr(email_request, field) or []
+    )
+    if not suppressed:
+        return email_requests
+
+    kept, dropped = [], 0
+    for email_request in email_requests:
+        update = {}
+        for field in _FIELDS:
+            recipients = getattr(email_request, field)
+            if not recipients:
+                continue
+            allowed = [
+                recipient
+                for recipient in recipients
+                if normalize(recipient.email) not in suppressed
+            ]
+            if len(allowed) < len(recipients):
+                dropped += len(recipients) - len(allowed)
+                update[field] = allowed or None
+        if not update:
+            kept.append(email_request)
+        elif update.get("recipients", email_request.recipients):
+            kept.append(email_request.copy(update=update))
+    _record(dropped, len(email_requests) - len(kept))
+    return kept
+
+
+def drop_suppressed_payloads(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Removes suppressed addresses from email request payloads, as drop_suppressed does for email requests
+    """
+    suppressed = get_suppression_list().suppressed(
+        recipient["email"]
+        for payload in payloads
+        for field in _FIELDS
+        for recipient in payload.get(field) or []
+    )
+    if not suppressed:
+        return payloads
+
+    kept, dropped = [], 0
+    for payload in payloads:
+        payload = dict(payload)
+        for field in _FIELDS:
+            recipients = payload.get(field)
+            if not recipients:
+                continue
+            allowed = [
+                recipient
+                for recipient in recipients
+                if normalize(recipient["email"]) not in suppressed
+            ]
+            dropped += len(recipients) - len(allowed)
+            payload[field] = allowed or None
+        if payload.get("recipients"):
+            kept.append(payload)
+    _record(dropped, len(payloads) - len(kept))
+    return kept
+
+
+def _record(recipients: int, emails: int):
+    SUPPRESSED_RECIPIENTS.inc(recipients)
+    log.info(
+        f"Left {recipients} suppressed recipients out, {emails} emails had no recipients left"
+    )
@@ -1,4 +1,4 @@
 """
 App Handlers
 """
-from .exception_handlers import attach_exception_handlers
+from .exception_handlers import attach_exception_handlers, format_validation_errors
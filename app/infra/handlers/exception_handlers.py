@@ -1,6 +1,7 @@
 """
 Application exception handlers
 """
+from typing import Any, Dict, List
 from fastapi import Request, FastAPI
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
@@ -19,6 +20,16 @@ def _rewrite_error(err):
     return field, message
 
 
+def format_validation_errors(errors: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Groups pydantic validation errors into error messages per field
+    """
+    formatted = {}
+    for field, message in (_rewrite_error(e) for e in errors):
+        formatted.setdefault(field, []).append(message)
+    return formatted
+
+
 def attach_exception_handlers(app: FastAPI):
     """
     Attaches exception handlers to application
@@ -62,10 +73,7 @@ def attach_exception_handlers(app: FastAPI):
     async def validation_exception_handler(
         request: Request, exc: RequestValidationError
     ):
-        error_list = [_rewrite_error(e) for e in exc.errors()]
-        errors = {}
-        for error in error_list:
-            errors.setdefault(error[0], []).append(error[1])
+        errors = format_validation_errors(exc.errors())
 
         return JSONResponse(
             status_code=400,
@@ -1,4 +1,4 @@
 """
 Application Middleware
 """
-from .middleware import attach_middlewares
+from .middleware import attach_middlewares, RequestMiddleware
@@ -2,11 +2,66 @@
 This attaches middleware to the Application
 """
 import time
-from fastapi import Request, FastAPI
+from fastapi import FastAPI
 import sentry_sdk
 from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.logger import log
 from app.config import config
+from app.metrics import REQUEST_DURATION
+
+
+class RequestMiddleware:
+    """
+    Pure ASGI middleware that adds security headers to every response and records how long each request took.
+
+    Headers are injected into the http.response.start message as it passes through, so the response body is streamed
+    straight through without being wrapped or buffered, and no extra task is spawned per request as with middleware
+    registered through app.middleware("http")
+    """
+
+    def __init__(self, app: ASGIApp, server_name: str = config.server_name):
+        self.app = app
+        self.headers = [
+            (b"x-frame-options", b"DENY"),
+            (b"x-content-type-options", b"nosniff"),
+            (b"x-xss-protection", b"1; mode=block"),
+            (b"server", server_name.encode("latin-1")),
+        ]
+        self.header_names = {name for name, _ in self.headers}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_headers(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # ASGI header names are lowercase, headers set by the endpoint are replaced by ours
+                message["headers"] = [
+                    header
+                    for header in message.get("headers", [])
+                    if header[0] not in self.header_names
+                ] + self.headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            process_time = time.perf_counter() - start_time
+            log.bind(path=scope["path"], duration=process_time).debug("Request handled")
+            # label by route template rather than path, so path parameters do not each get their own series
+            route = scope.get("route")
+            REQUEST_DURATION.labels(
+                method=scope["method"],
+                route=route.path if route else "unmatched",
+                status=status_code,
+            ).observe(process_time)
 
 
 def attach_middlewares(app: FastAPI):
@@ -24,24 +79,4 @@ def attach_middlewares(app: FastAPI):
         asgi_app = SentryAsgiMiddleware(app=app)
         log.debug(f"Sentry Configured: {asgi_app.app}")
 
-    @app.middleware("http")
-    async def log_request_time(request: Request, call_next):
-        start_time = time.time()
-        response = await call_next(request)
-        process_time = time.time() - start_time
-        log.info(f"Request: {request.url} took {process_time}")
-        return response
-
-    @app.middleware("http")
-    async def after_request(request: Request, call_next):
-        """
-        Is handled after each request and can be used to add headers to the response or handle further processing
-        :param request: Request object that is received from client
-        :param call_next: receives request as parameters and passes it to the next execution
-        """
-        response = await call_next(request)
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["server"] = config.server_name
-        return response
+    app.add_middleware(RequestMiddleware)
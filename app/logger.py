@@ -1,11 +1,20 @@
 """
 Logger configurations, this uses loguru to handle logs
 Reference: https://github.com/Delgan/loguru
+
+Logs go to a single sink as one JSON object per line, the sink's level does all level routing. Structured fields are
+passed with log.bind and are redacted in the calling thread before the record is queued: fields that carry message
+bodies, attachment contents or credentials are elided & other long strings are capped, so neither the queue nor the
+log grows with the size of an email. Debug & trace logs can be sampled with LOG_DEBUG_SAMPLE_RATE, or per call by
+binding a sample_rate
 """
 
+import json
 import os
+import random
 import sys
 import logging
+from typing import Any, Dict
 from loguru import logger as log
 import uvicorn.logging
 
@@ -17,16 +26,36 @@ root = logging.getLogger()
 for handler in root.handlers:
     handler.setFormatter(console_formatter)
 
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# longest string rendered for a structured field, longer strings are cut short
+LOG_MAX_FIELD_LENGTH = int(os.environ.get("LOG_MAX_FIELD_LENGTH", "256"))
+# longest list rendered for a structured field, e.g. a list of recipients
+LOG_MAX_FIELD_ITEMS = int(os.environ.get("LOG_MAX_FIELD_ITEMS", "10"))
+# share of debug & trace logs that are kept
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+
+# fields whose values are never logged, only their size
+ELIDED_FIELDS = frozenset(
+    [
+        "message",
+        "content",
+        "variables",
+        "password",
+        "token",
+        "mail_api_token",
+        "authorization",
+    ]
+)
+
+_sampled_levels = log.level("DEBUG").no
+
 
-def configure_log_sink(log_type: str):
+def configure_log_sink():
     """
-    Configures log sing based on the log type and the enrironment
-    @param log_type log type could be either info, error, warn, debug, etc
+    Configures log sink based on the enrironment
     @returns the log sink to use
     """
-    return (
-        f"logs/{log_type}.log" if os.environ.get("ENV") == "development" else sys.stdout
-    )
+    return "logs/app.log" if os.environ.get("ENV") == "development" else sys.stdout
 
 
 def backtrace() -> bool:
@@ -34,68 +63,108 @@ def backtrace() -> bool:
     return os.environ.get("ENV", "development") == "development"
 
 
-# info log configurations
-log.add(
-    sink=configure_log_sink("info"),
-    backtrace=backtrace(),
-    colorize=True,
-    format="<green>{time}</green> <level>{message}</level>",
-    # format="{time:YYYY-MM-DD at HH:mm:ss} | {level} | {message}",
-    enqueue=True,
-    level="INFO",
-)
+def redact(value: Any, depth: int = 0) -> Any:
+    """
+    Renders a structured field for logging, eliding sensitive & bulky fields and capping the size of strings & lists
+    """
+    if isinstance(value, str):
+        if len(value) > LOG_MAX_FIELD_LENGTH:
+            return f"{value[:LOG_MAX_FIELD_LENGTH]}...<{len(value)} chars>"
+        return value
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if depth > 4:
+        return f"<{type(value).__name__}>"
+    if hasattr(value, "dict"):
+        # pydantic models, such as an EmailRequest
+        value = value.dict()
+    if isinstance(value, dict):
+        return {
+            key: _elide(item)
+            if key in ELIDED_FIELDS and item is not None
+            else redact(item, depth + 1)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple, set)):
+        items = value if isinstance(value, (list, tuple)) else list(value)
+        rendered = [redact(item, depth + 1) for item in items[:LOG_MAX_FIELD_ITEMS]]
+        if len(items) > LOG_MAX_FIELD_ITEMS:
+            rendered.append(f"...<{len(items)} items>")
+        return rendered
+    return redact(str(value), depth)
 
-# error logs
-log.add(
-    sink=configure_log_sink("error"),
-    backtrace=backtrace(),
-    colorize=True,
-    format="<green>{time}</green> <level>{message}</level>",
-    # format="{time:YYYY-MM-DD at HH:mm:ss} | {level} | {message}",
-    enqueue=True,
-    level="ERROR",
-)
 
-# debug logs
-log.add(
-    sink=configure_log_sink("debug"),
-    backtrace=backtrace(),
-    colorize=True,
-    format="<green>{time}</green> <level>{message}</level>",
-    # format="{time:YYYY-MM-DD at HH:mm:ss} | {level} | {message}",
-    enqueue=True,
-    level="DEBUG",
-)
+def _elide(value: Any) -> str:
+    if isinstance(value, str):
+        return f"<elided {len(value)} chars>"
+    if hasattr(value, "__len__"):
+        return f"<elided {len(value)} items>"
+    return "<elided>"
 
-# warning logs
-log.add(
-    sink=configure_log_sink("warn"),
-    backtrace=backtrace(),
-    colorize=True,
-    format="<green>{time}</green> <level>{message}</level>",
-    # format="{time:YYYY-MM-DD at HH:mm:ss} | {level} | {message}",
-    enqueue=True,
-    level="WARNING",
-)
 
-# critical logs
-log.add(
-    sink=configure_log_sink("critical"),
-    backtrace=backtrace(),
-    colorize=True,
-    format="<green>{time}</green> <level>{message}</level>",
-    # format="{time:YYYY-MM-DD at HH:mm:ss} | {level} | {message}",
-    enqueue=True,
-    level="CRITICAL",
-)
+def _patch(record: Dict[str, Any]):
+    if record["extra"]:
+        record["extra"] = redact(record["extra"])
+
+
+def _sample(record: Dict[str, Any]) -> bool:
+    if record["level"].no > _sampled_levels:
+        return True
+    rate = record["extra"].get("sample_rate", LOG_DEBUG_SAMPLE_RATE)
+    return rate >= 1 or random.random() < rate
+
+
+def _serialize(record: Dict[str, Any], traceback: str) -> str:
+    entry = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+    }
+    if record["extra"]:
+        entry["extra"] = record["extra"]
+    if traceback:
+        entry["traceback"] = traceback
+    return json.dumps(entry, default=str)
+
+
+# pylint: disable=unused-argument
+def _format(record: Dict[str, Any]) -> str:
+    # only the traceback is formatted here, loguru appends it to string formats but not to format functions
+    return "{exception}"
+
+
+class JsonSink:
+    """
+    Writes each record as a single JSON line. This runs in loguru's queue worker, so records are serialized off the
+    calling thread
+    """
+
+    def __init__(self, sink):
+        if isinstance(sink, str):
+            os.makedirs(os.path.dirname(sink), exist_ok=True)
+            # pylint: disable=consider-using-with
+            sink = open(sink, "a", encoding="utf-8")
+        self.stream = sink
+
+    def write(self, message):
+        """
+        Writes a record. The message is formatted as the record's traceback only, which is empty without an exception
+        """
+        self.stream.write(_serialize(message.record, message.strip()) + "\n")
+        self.stream.flush()
+
 
-# trace logs
+log.remove()
+log.configure(patcher=_patch)
 log.add(
-    sink=configure_log_sink("trace"),
+    sink=JsonSink(configure_log_sink()).write,
+    level=LOG_LEVEL,
+    format=_format,
+    filter=_sample,
     backtrace=backtrace(),
-    colorize=True,
-    format="<green>{time}</green> <level>{message}</level>",
-    # format="{time:YYYY-MM-DD at HH:mm:ss} | {level} | {message}",
+    colorize=False,
     enqueue=True,
-    level="TRACE",
 )
@@ -0,0 +1,103 @@
+"""
+Prometheus metrics. Reference: https://github.com/prometheus/client_python
+
+When PROMETHEUS_MULTIPROC_DIR is set, every API & worker process writes its samples to files in that directory and
+they are summed up when scraped, so a single scrape covers all gunicorn/uvicorn & celery processes of a host. The
+directory must be set in the environment before the processes start & be emptied between runs. Only counters &
+histograms are used, as these aggregate across processes without any cleanup when a process exits
+"""
+import os
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    multiprocess,
+)
+
+# buckets for in-process work that takes well under a millisecond to tens of milliseconds
+FAST_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    1.0,
+)
+# buckets for calls to providers, which can take up to their connect & request timeouts
+SEND_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REQUEST_DURATION = Histogram(
+    "barua_http_request_duration_seconds",
+    "Time taken to handle HTTP requests",
+    ["method", "route", "status"],
+)
+VALIDATION_DURATION = Histogram(
+    "barua_validation_duration_seconds",
+    "Time taken to validate email requests parsed by the routes themselves, /sendmail bodies are validated by FastAPI",
+    ["endpoint"],
+    buckets=FAST_BUCKETS,
+)
+ENQUEUE_DURATION = Histogram(
+    "barua_enqueue_duration_seconds",
+    "Time taken to hand email requests to the task publisher",
+    ["operation"],
+    buckets=FAST_BUCKETS,
+)
+PROVIDER_SEND_DURATION = Histogram(
+    "barua_provider_send_duration_seconds",
+    "Time taken to send emails through a provider",
+    ["provider", "outcome"],
+    buckets=SEND_BUCKETS,
+)
+PROVIDER_SEND_ERRORS = Counter(
+    "barua_provider_send_errors_total",
+    "Sends through a provider that failed, by whether the provider or the message was at fault",
+    ["provider", "cause"],
+)
+PROVIDER_CIRCUIT_OPEN = Counter(
+    "barua_provider_circuit_open_total",
+    "Sends that skipped a provider because its circuit was open",
+    ["provider"],
+)
+SUPPRESSED_RECIPIENTS = Counter(
+    "barua_suppressed_recipients_total",
+    "Recipients left out of emails because they are on the suppression list",
+)
+MAIL_EVENTS = Counter(
+    "barua_mail_events_total",
+    "Delivery events reported by providers",
+    ["provider", "event"],
+)
+TASK_DURATION = Histogram(
+    "barua_task_duration_seconds",
+    "Time taken to run Celery tasks",
+    ["task", "state"],
+    buckets=SEND_BUCKETS,
+)
+TASK_RETRIES = Counter(
+    "barua_task_retries_total",
+    "Celery task retries",
+    ["task"],
+)
+
+
+def get_registry() -> CollectorRegistry:
+    """
+    Gets the registry to expose. In multiprocess mode this collects the samples written by every process
+    """
+    if (
+        "PROMETHEUS_MULTIPROC_DIR" in os.environ
+        or "prometheus_multiproc_dir" in os.environ
+    ):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
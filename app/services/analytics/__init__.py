@@ -0,0 +1,5 @@
+"""
+Analytics services
+"""
+from .time_series import OUTCOMES, MinuteSeries, get_minute_series
+from .analytics_store import AnalyticsStore, get_analytics_store
@@ -0,0 +1,99 @@
+"""
+Analytics store. Keeps per minute counts of send outcomes by sender & provider in a SQLite database, summed up from
+the counts each worker process drains from its minute series, so that dashboards read a handful of rows per series
+instead of scanning logs
+"""
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from app.config import get_config
+from .time_series import OUTCOMES, Row
+
+
+class AnalyticsStore:
+    """
+    Per minute outcome counts in a SQLite database shared by the workers & the API of a host. Minutes older than
+    retention seconds are removed as counts are added
+    """
+
+    def __init__(
+        self,
+        path: str = get_config().analytics_store_path,
+        retention: int = get_config().analytics_retention,
+    ):
+        self.path = path
+        self.retention = retention
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        counts = ", ".join(f"{name} INTEGER NOT NULL DEFAULT 0" for name in OUTCOMES)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS analytics (dimension TEXT NOT NULL, key TEXT NOT NULL, "
+                f"minute INTEGER NOT NULL, {counts}, PRIMARY KEY (dimension, minute, key))"
+            )
+        self._upsert = (
+            f"INSERT INTO analytics (dimension, key, minute, {', '.join(OUTCOMES)}) "
+            f"VALUES ({', '.join('?' * (3 + len(OUTCOMES)))}) "
+            "ON CONFLICT (dimension, minute, key) DO UPDATE SET "
+            + ", ".join(f"{name} = {name} + excluded.{name}" for name in OUTCOMES)
+        )
+
+    def add(self, rows: List[Row], now: float | None = None):
+        """
+        Adds per minute counts to the series in a single transaction & removes the minutes past retention
+        """
+        now = now or time.time()
+        with self._connection() as connection:
+            connection.executemany(self._upsert, rows)
+            connection.execute(
+                "DELETE FROM analytics WHERE minute < ?",
+                (int((now - self.retention) // 60),),
+            )
+
+    def series(
+        self, dimension: str, start: int, end: int, key: str | None = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Gets the counts of the minutes from start up to but excluding end, minutes since the epoch, of the series of a
+        dimension, or of a single series if key is given. Minutes without sends are left out
+        """
+        query = (
+            f"SELECT key, minute, {', '.join(OUTCOMES)} FROM analytics "
+            "WHERE dimension = ? AND minute >= ? AND minute < ?"
+        )
+        parameters = [dimension, start, end]
+        if key is not None:
+            query += " AND key = ?"
+            parameters.append(key)
+
+        series: Dict[str, List[Dict[str, Any]]] = {}
+        for row in self._connection().execute(
+            query + " ORDER BY key, minute", parameters
+        ):
+            series.setdefault(row[0], []).append(
+                dict(minute=row[1], **dict(zip(OUTCOMES, row[2:])))
+            )
+        return series
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite connections must not be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+
+@lru_cache()
+def get_analytics_store() -> AnalyticsStore:
+    """
+    Gets the analytics store
+    """
+    return AnalyticsStore()
@@ -0,0 +1,113 @@
+"""
+Minute time series. Counts send outcomes per minute in memory, in a ring of slots per series, so that recording an
+outcome costs a dictionary lookup & an increment and the counts of a process take a fixed amount of memory however many
+outcomes it records
+"""
+import threading
+import time
+from array import array
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from app.config import get_config
+from app.logger import log
+
+OUTCOMES = ("sent", "failed", "bounced")
+_OUTCOME_INDEX = {outcome: index for index, outcome in enumerate(OUTCOMES)}
+
+# a series, by dimension & key
+SeriesKey = Tuple[str, str]
+# the counts of a minute of a series, the dimension, key, minute since the epoch & one count per outcome
+Row = Tuple[str, str, int, int, int, int]
+
+
+class _Ring:
+    __slots__ = ("minutes", "counts", "last")
+
+    def __init__(self, slots: int):
+        self.minutes = array("q", [-1] * slots)
+        self.counts = array("L", [0] * (slots * len(OUTCOMES)))
+        # the latest minute anything was recorded in
+        self.last = -1
+
+
+class MinuteSeries:
+    """
+    Per minute counts of send outcomes by series. Each series keeps a ring of the last slots minutes, which are drained
+    well before the ring comes back round to them. Counts of a minute whose slot is taken over before being drained are
+    lost, which only happens if draining stalled for longer than the ring
+    """
+
+    def __init__(self, slots: int = get_config().analytics_buffer_minutes):
+        self.slots = slots
+        self._rings: Dict[SeriesKey, _Ring] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        dimension: str,
+        key: str,
+        outcome: str,
+        count: int = 1,
+        timestamp: float | None = None,
+    ):
+        """
+        Adds count to the outcome of the current minute, or the minute of timestamp, of a series
+        """
+        minute = int((time.time() if timestamp is None else timestamp) // 60)
+        slot = minute % self.slots
+        offset = slot * len(OUTCOMES) + _OUTCOME_INDEX[outcome]
+        with self._lock:
+            ring = self._rings.get((dimension, key))
+            if ring is None:
+                ring = self._rings[(dimension, key)] = _Ring(self.slots)
+            if ring.minutes[slot] != minute:
+                if ring.minutes[slot] > minute:
+                    # the minute already left the ring
+                    return
+                self._reset(ring, slot, dimension, key)
+                ring.minutes[slot] = minute
+            ring.counts[offset] += count
+            ring.last = max(ring.last, minute)
+
+    def drain(self, now: float | None = None) -> List[Row]:
+        """
+        Takes the counts recorded since the last drain. Series with nothing recorded over a whole ring, as of now or
+        the current time, are forgotten
+        """
+        minute = int((time.time() if now is None else now) // 60)
+        rows: List[Row] = []
+        with self._lock:
+            idle = []
+            for (dimension, key), ring in self._rings.items():
+                for slot in range(self.slots):
+                    if ring.minutes[slot] < 0:
+                        continue
+                    start = slot * len(OUTCOMES)
+                    counts = ring.counts[start : start + len(OUTCOMES)]
+                    if any(counts):
+                        rows.append((dimension, key, ring.minutes[slot], *counts))
+                        for index in range(start, start + len(OUTCOMES)):
+                            ring.counts[index] = 0
+                if minute - ring.last >= self.slots:
+                    idle.append((dimension, key))
+            for series in idle:
+                del self._rings[series]
+        return rows
+
+    def _reset(self, ring: _Ring, slot: int, dimension: str, key: str):
+        start = slot * len(OUTCOMES)
+        if any(ring.counts[start : start + len(OUTCOMES)]):
+            log.warning(
+                f"Dropping analytics of {dimension} {key} for minute {ring.minutes[slot]}, they were not drained"
+            )
+        for index in range(start, start + len(OUTCOMES)):
+            ring.counts[index] = 0
+
+
+@lru_cache()
+def get_minute_series() -> MinuteSeries:
+    """
+    Gets the minute series of this process
+    """
+    return MinuteSeries()
@@ -0,0 +1,10 @@
+"""
+Attachment storage services
+"""
+from .attachment_store import (
+    AttachmentStore,
+    get_attachment_store,
+    load_attachments,
+    store_attachments,
+)
+from .exceptions import AttachmentNotFoundException
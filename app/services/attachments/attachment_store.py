@@ -0,0 +1,194 @@
+"""
+Attachment store. Attachments are kept on disk & only a reference to them travels through the queue, so neither request
+memory nor broker payloads grow with the size of an attachment, and retries re-publish references rather than contents.
+The directory must be shared between the API & the workers, for example through a mounted volume
+"""
+import base64
+import binascii
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import BinaryIO, Dict, Iterator, List
+
+from app.config import get_config
+from app.logger import log
+from .exceptions import AttachmentNotFoundException
+
+CHUNK_SIZE = 64 * 1024
+PARTIAL_SUFFIX = ".part"
+
+_digest_pattern = re.compile(r"[0-9a-f]{64}")
+
+
+class AttachmentStore:
+    """
+    Content addressed attachment store on the local filesystem.
+
+    Attachments are keyed by the SHA-256 digest of their contents, so the same file sent to thousands of recipients is
+    stored once. Storing an attachment again refreshes it, and attachments that have not been stored for longer than
+    ttl seconds are removed by collect_garbage. Reads are memory mapped so workers only page in what they use.
+    """
+
+    def __init__(
+        self,
+        path: str = get_config().attachment_store_path,
+        ttl: int = get_config().attachment_store_ttl,
+    ):
+        self.path = path
+        self.ttl = ttl
+        os.makedirs(self.path, exist_ok=True)
+
+    def put(self, file: BinaryIO) -> str:
+        """
+        Copies the contents of a file into the store in chunks & returns the digest of the stored attachment
+        """
+        digest = hashlib.sha256()
+        descriptor, partial = tempfile.mkstemp(dir=self.path, suffix=PARTIAL_SUFFIX)
+        with os.fdopen(descriptor, "wb") as spooled:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                spooled.write(chunk)
+        return self._commit(partial, digest.hexdigest())
+
+    def put_bytes(self, data: bytes) -> str:
+        """
+        Stores the given contents & returns the digest of the stored attachment
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if self._refresh(digest):
+            return digest
+
+        descriptor, partial = tempfile.mkstemp(dir=self.path, suffix=PARTIAL_SUFFIX)
+        with os.fdopen(descriptor, "wb") as spooled:
+            spooled.write(data)
+        return self._commit(partial, digest)
+
+    @contextmanager
+    def open(self, reference: str) -> Iterator[memoryview]:
+        """
+        Memory maps a stored attachment for reading
+        """
+        try:
+            file = open(self._path_of(reference), "rb")
+        except FileNotFoundError as err:
+            raise AttachmentNotFoundException(
+                f"Attachment {reference} not found"
+            ) from err
+
+        with file:
+            if os.fstat(file.fileno()).st_size == 0:
+                yield memoryview(b"")
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    yield view
+
+    def read(self, reference: str) -> bytes:
+        """
+        Reads the contents of a stored attachment
+        """
+        with self.open(reference) as contents:
+            return bytes(contents)
+
+    def collect_garbage(self) -> int:
+        """
+        Removes attachments that have not been stored for longer than the ttl, along with abandoned partial writes.
+        Returns the number of files removed
+        """
+        expiry = time.time() - self.ttl
+        removed = 0
+        for directory, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    if os.stat(path).st_mtime < expiry:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
+
+    def _commit(self, partial: str, digest: str) -> str:
+        if self._refresh(digest):
+            os.remove(partial)
+            return digest
+
+        path = self._path_of(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(partial, path)
+        return digest
+
+    def _refresh(self, digest: str) -> bool:
+        """
+        Marks an already stored attachment as recently stored. Returns whether it was found
+        """
+        try:
+            os.utime(self._path_of(digest))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _path_of(self, reference: str) -> str:
+        if not _digest_pattern.fullmatch(reference or ""):
+            raise AttachmentNotFoundException(
+                f"Invalid attachment reference {reference}"
+            )
+        return os.path.join(self.path, reference[:2], reference)
+
+
+@lru_cache()
+def get_attachment_store() -> AttachmentStore:
+    """
+    Gets the attachment store
+    """
+    return AttachmentStore()
+
+
+def store_attachments(
+    attachments: List[Dict[str, str]], store: AttachmentStore | None = None
+) -> List[Dict[str, str]]:
+    """
+    Moves the base64 encoded content of inline attachments into the attachment store, replacing it with a reference
+    """
+    store = store or get_attachment_store()
+    stored = []
+    for attachment in attachments:
+        content = attachment.get("content")
+        if content is None:
+            stored.append(attachment)
+            continue
+
+        try:
+            data = base64.b64decode(content, validate=True)
+        except binascii.Error:
+            log.warning(
+                f"Attachment {attachment.get('filename')} is not base64 encoded, storing it as is"
+            )
+            data = content.encode("utf-8")
+
+        stored.append(dict(attachment, content=None, reference=store.put_bytes(data)))
+    return stored
+
+
+def load_attachments(
+    attachments: List[Dict[str, str]], store: AttachmentStore | None = None
+) -> List[Dict[str, str]]:
+    """
+    Fills in the base64 encoded content of attachments that refer to the attachment store
+    """
+    store = store or get_attachment_store()
+    loaded = []
+    for attachment in attachments:
+        if attachment.get("content") is not None:
+            loaded.append(attachment)
+            continue
+
+        with store.open(attachment.get("reference")) as contents:
+            content = base64.b64encode(contents).decode("ascii")
+        loaded.append(dict(attachment, content=content))
+    return loaded
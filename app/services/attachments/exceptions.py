@@ -0,0 +1,11 @@
+"""
+Exceptions for Attachment Services
+"""
+from app.exceptions import AppException
+
+
+class AttachmentNotFoundException(AppException):
+    """Exception raised when a referenced attachment is not in the attachment store"""
+
+    def __init__(self, message=None):
+        super().__init__(message or "Attachment not found")
@@ -0,0 +1,11 @@
+"""
+Event services
+"""
+from .providers import (
+    MailEvent,
+    PARSERS,
+    parse_mailchimp_events,
+    parse_sendgrid_events,
+)
+from .event_store import EventStore, get_event_store
+from .exceptions import EventPayloadException
@@ -0,0 +1,155 @@
+"""
+Event store. Keeps a summary of the provider events of each sent message in a SQLite database, the latest event & how
+many times each event type was reported. A batch of events is folded into one row per message before it is written, so
+the opens & clicks that make up most of the events cost a single upsert per message & batch. The ids of recorded events
+are kept for a while, so that events posted again by a provider or recorded again by a retried task are counted once
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from app.config import get_config
+from app.domain.entities import MailEventType
+from .providers import MailEvent
+
+_COUNTS = [event_type.value for event_type in MailEventType]
+
+
+def event_id(event: MailEvent) -> str:
+    """
+    Gets the id of an event, the provider's event id or, for providers that do not give one, a digest of the event
+    """
+    if event.get("event_id"):
+        return event["event_id"]
+    key = f"{event['message_id']}:{event['email'].lower()}:{event['event']}:{event['timestamp']}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class EventStore:
+    """
+    Per message event summaries in a SQLite database shared by the workers of a host
+    """
+
+    def __init__(
+        self,
+        path: str = get_config().event_store_path,
+        dedup_window: int = get_config().event_dedup_window,
+    ):
+        self.path = path
+        self.dedup_window = dedup_window
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        counts = ", ".join(f"{name} INTEGER NOT NULL DEFAULT 0" for name in _COUNTS)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS message_events (message_id TEXT NOT NULL, provider TEXT NOT NULL, "
+                "email TEXT NOT NULL, event TEXT NOT NULL, updated REAL NOT NULL, "
+                f"{counts}, PRIMARY KEY (provider, message_id, email))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS recorded_events (provider TEXT NOT NULL, event_id TEXT NOT NULL, "
+                "recorded REAL NOT NULL, PRIMARY KEY (provider, event_id))"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS recorded_events_recorded ON recorded_events (recorded)"
+            )
+        self._upsert = (
+            f"INSERT INTO message_events (message_id, provider, email, event, updated, {', '.join(_COUNTS)}) "
+            f"VALUES ({', '.join('?' * (5 + len(_COUNTS)))}) "
+            "ON CONFLICT (provider, message_id, email) DO UPDATE SET "
+            "event = CASE WHEN excluded.updated >= updated THEN excluded.event ELSE event END, "
+            "updated = MAX(updated, excluded.updated), "
+            + ", ".join(f"{name} = {name} + excluded.{name}" for name in _COUNTS)
+        )
+
+    def record(
+        self, events: List[MailEvent], now: float | None = None
+    ) -> List[MailEvent]:
+        """
+        Adds events to the summaries of their messages in a single transaction, leaving out the events recorded within
+        the last dedup_window seconds. Returns the events that were added
+        """
+        now = now or time.time()
+        with self._connection() as connection:
+            connection.execute(
+                "DELETE FROM recorded_events WHERE recorded < ?",
+                (now - self.dedup_window,),
+            )
+            added = [
+                event
+                for event in events
+                if connection.execute(
+                    "INSERT OR IGNORE INTO recorded_events (provider, event_id, recorded) VALUES (?, ?, ?)",
+                    (event["provider"], event_id(event), now),
+                ).rowcount
+            ]
+            connection.executemany(self._upsert, self._summarize(added))
+        return added
+
+    @staticmethod
+    def _summarize(events: List[MailEvent]) -> List[tuple]:
+        summaries: Dict[tuple, Dict[str, Any]] = {}
+        for event in events:
+            key = (event["provider"], event["message_id"], event["email"].lower())
+            summary = summaries.get(key)
+            if summary is None:
+                summary = summaries[key] = dict(
+                    event=event["event"], updated=event["timestamp"]
+                )
+            elif event["timestamp"] >= summary["updated"]:
+                summary.update(event=event["event"], updated=event["timestamp"])
+            summary[event["event"]] = summary.get(event["event"], 0) + 1
+
+        return [
+            (
+                message_id,
+                provider,
+                email,
+                summary["event"],
+                summary["updated"],
+                *(summary.get(name, 0) for name in _COUNTS),
+            )
+            for (provider, message_id, email), summary in summaries.items()
+        ]
+
+    def get(self, provider: str, message_id: str) -> List[Dict[str, Any]]:
+        """
+        Gets the event summaries of a message, one per recipient
+        """
+        cursor = self._connection().execute(
+            f"SELECT email, event, updated, {', '.join(_COUNTS)} FROM message_events "
+            "WHERE provider = ? AND message_id = ? ORDER BY email",
+            (provider, message_id),
+        )
+        return [
+            dict(
+                email=row[0],
+                event=row[1],
+                updated=row[2],
+                counts=dict(zip(_COUNTS, row[3:])),
+            )
+            for row in cursor
+        ]
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite connections must not be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+
+@lru_cache()
+def get_event_store() -> EventStore:
+    """
+    Gets the event store
+    """
+    return EventStore()
@@ -0,0 +1,11 @@
+"""
+Exceptions for Event Services
+"""
+from app.exceptions import AppException
+
+
+class EventPayloadException(AppException):
+    """Exception raised when a provider posts an event batch that can not be read"""
+
+    def __init__(self, message=None):
+        super().__init__(message or "Invalid event payload")
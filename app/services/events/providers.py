@@ -0,0 +1,122 @@
+"""
+Provider event parsers. Turn the event batches providers post to the webhook into events of a single shape, leaving out
+the events & fields that are not recorded, so only what is needed travels through the queue
+"""
+import json
+from typing import Any, Callable, Dict, List
+
+from app.domain.entities import MailEventType
+from .exceptions import EventPayloadException
+
+# an event as recorded, with the provider, the provider's message id, the recipient, the event type, its unix time &
+# the provider's event id, for providers that give one
+MailEvent = Dict[str, Any]
+
+_SENDGRID_EVENTS = {
+    "delivered": MailEventType.DELIVERED,
+    "deferred": MailEventType.DEFERRED,
+    "bounce": MailEventType.BOUNCED,
+    "dropped": MailEventType.DROPPED,
+    "spamreport": MailEventType.COMPLAINED,
+    "unsubscribe": MailEventType.UNSUBSCRIBED,
+    "group_unsubscribe": MailEventType.UNSUBSCRIBED,
+    "open": MailEventType.OPENED,
+    "click": MailEventType.CLICKED,
+}
+
+_MAILCHIMP_EVENTS = {
+    "delivered": MailEventType.DELIVERED,
+    "deferral": MailEventType.DEFERRED,
+    "soft_bounce": MailEventType.SOFT_BOUNCED,
+    "hard_bounce": MailEventType.BOUNCED,
+    "reject": MailEventType.DROPPED,
+    "spam": MailEventType.COMPLAINED,
+    "unsub": MailEventType.UNSUBSCRIBED,
+    "open": MailEventType.OPENED,
+    "click": MailEventType.CLICKED,
+}
+
+
+def _event(
+    provider: str, message_id, email, event_type, timestamp, event_id=None
+) -> MailEvent:
+    event = dict(
+        provider=provider,
+        message_id=str(message_id or ""),
+        email=email,
+        event=event_type.value,
+        timestamp=float(timestamp or 0),
+    )
+    if event_id:
+        event.update(event_id=str(event_id))
+    return event
+
+
+def parse_sendgrid_events(payload: Any) -> List[MailEvent]:
+    """
+    Parses a SendGrid event webhook batch, a JSON list of events. Blocked messages are reported as bounces by SendGrid
+    but are soft bounces. Message ids are cut down to the id SendGrid returned when the message was sent, events keep
+    their SendGrid event id
+    """
+    if not isinstance(payload, list):
+        raise EventPayloadException("Expected a list of events")
+
+    events = []
+    for item in payload:
+        if not isinstance(item, dict) or not item.get("email"):
+            continue
+        event_type = _SENDGRID_EVENTS.get(item.get("event"))
+        if event_type is None:
+            continue
+        if event_type is MailEventType.BOUNCED and item.get("type") == "blocked":
+            event_type = MailEventType.SOFT_BOUNCED
+        message_id = (item.get("sg_message_id") or "").split(".", 1)[0]
+        events.append(
+            _event(
+                "sendgrid",
+                message_id,
+                item["email"],
+                event_type,
+                item.get("timestamp"),
+                item.get("sg_event_id"),
+            )
+        )
+    return events
+
+
+def parse_mailchimp_events(payload: Any) -> List[MailEvent]:
+    """
+    Parses a Mailchimp Transactional event webhook batch, a JSON list of events posted as the mandrill_events form field
+    """
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError as exc:
+            raise EventPayloadException("Invalid JSON in mandrill_events") from exc
+    if not isinstance(payload, list):
+        raise EventPayloadException("Expected a list of events")
+
+    events = []
+    for item in payload:
+        if not isinstance(item, dict):
+            continue
+        message = item.get("msg") or {}
+        event_type = _MAILCHIMP_EVENTS.get(item.get("event"))
+        if event_type is None or not message.get("email"):
+            continue
+        events.append(
+            _event(
+                "mailchimp",
+                message.get("_id") or item.get("_id"),
+                message["email"],
+                event_type,
+                item.get("ts"),
+            )
+        )
+    return events
+
+
+PARSERS: Dict[str, Callable[[Any], List[MailEvent]]] = {
+    "sendgrid": parse_sendgrid_events,
+    "mailchimp": parse_mailchimp_events,
+}
@@ -0,0 +1,13 @@
+"""
+Idempotency services
+"""
+from .backends import (
+    IdempotencyBackend,
+    LocalIdempotencyBackend,
+    RedisIdempotencyBackend,
+)
+from .idempotency_cache import IdempotencyCache, fingerprint, get_idempotency_cache
+from .exceptions import (
+    IdempotencyConflictException,
+    IdempotencyKeyReusedException,
+)
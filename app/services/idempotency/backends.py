@@ -0,0 +1,179 @@
+"""
+Idempotency backends. A backend holds the responses to idempotent requests where every API process can see them, so a
+retried request is recognised whichever node it lands on
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict
+
+import redis
+
+from app.logger import log
+
+Record = Dict[str, Any]
+
+
+class IdempotencyBackend(ABC):
+    """
+    Shared store of idempotency records. A record holds the fingerprint of the request & its response, which is None
+    while the request is still being handled
+    """
+
+    @abstractmethod
+    def claim(self, key: str, fingerprint: str, ttl: int) -> Record | None:
+        """
+        Claims a key for a request that is about to be handled, for at most ttl seconds. Returns None if the key was
+        claimed, otherwise the record already held for it
+        """
+        raise NotImplementedError("claim not yet implemented")
+
+    @abstractmethod
+    def complete(self, key: str, fingerprint: str, response: Any, ttl: int):
+        """
+        Stores the response to a request for ttl seconds
+        """
+        raise NotImplementedError("complete not yet implemented")
+
+    @abstractmethod
+    def release(self, key: str):
+        """
+        Drops the claim on a key, so that the request can be retried
+        """
+        raise NotImplementedError("release not yet implemented")
+
+
+class RedisIdempotencyBackend(IdempotencyBackend):
+    """
+    Keeps idempotency records in Redis, shared by API processes across hosts
+    """
+
+    def __init__(self, url: str, prefix: str = "barua-pepe:idempotency"):
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def claim(self, key: str, fingerprint: str, ttl: int) -> Record | None:
+        name = f"{self.prefix}:{key}"
+        pending = json.dumps(dict(fingerprint=fingerprint, response=None))
+        # the record may expire between a failed claim and reading it, in which case it is claimed again
+        for _ in range(2):
+            if self.client.set(name, pending, nx=True, ex=ttl):
+                return None
+            record = self.client.get(name)
+            if record is not None:
+                return json.loads(record)
+        return None
+
+    def complete(self, key: str, fingerprint: str, response: Any, ttl: int):
+        self.client.set(
+            f"{self.prefix}:{key}",
+            json.dumps(dict(fingerprint=fingerprint, response=response)),
+            ex=ttl,
+        )
+
+    def release(self, key: str):
+        self.client.delete(f"{self.prefix}:{key}")
+
+
+class LocalIdempotencyBackend(IdempotencyBackend):
+    """
+    Keeps idempotency records in files, shared by the API processes of a single host. A key is claimed by exclusively
+    creating its file. Expired records are removed when they are next looked up, and by a sweep over all records that
+    runs at most every gc_interval seconds
+    """
+
+    def __init__(self, path: str, gc_interval: float = 300.0):
+        self.root = path
+        self.gc_interval = gc_interval
+        self._last_gc = time.monotonic()
+        os.makedirs(self.root, exist_ok=True)
+
+    def claim(self, key: str, fingerprint: str, ttl: int) -> Record | None:
+        self._maybe_collect_garbage()
+        path = self._path_of(key)
+        pending = dict(
+            fingerprint=fingerprint, response=None, expires=time.time() + ttl
+        )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        for _ in range(2):
+            try:
+                descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            except FileExistsError:
+                record = self._read(path)
+                if record is not None:
+                    return record
+                continue
+            with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+                json.dump(pending, file)
+            return None
+        return None
+
+    def complete(self, key: str, fingerprint: str, response: Any, ttl: int):
+        path = self._path_of(key)
+        record = dict(
+            fingerprint=fingerprint, response=response, expires=time.time() + ttl
+        )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, partial = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+            json.dump(record, file)
+        os.replace(partial, path)
+
+    def release(self, key: str):
+        try:
+            os.unlink(self._path_of(key))
+        except FileNotFoundError:
+            pass
+
+    def collect_garbage(self) -> int:
+        """
+        Removes expired records. Returns the number of records removed
+        """
+        removed = 0
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                if self._read(path) is None and not os.path.exists(path):
+                    removed += 1
+        return removed
+
+    def _read(self, path: str) -> Record | None:
+        """
+        Reads a record, removing it if it has expired. A record that is being written reads as pending
+        """
+        try:
+            with open(path, encoding="utf-8") as file:
+                contents = file.read()
+        except FileNotFoundError:
+            return None
+        try:
+            record = json.loads(contents)
+        except ValueError:
+            # left behind by a process that died while writing it, unless it is being written right now
+            record = dict(
+                fingerprint=None, response=None, expires=os.path.getmtime(path) + 60
+            )
+
+        if record.get("expires", 0) < time.time():
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            return None
+        return record
+
+    def _maybe_collect_garbage(self):
+        if time.monotonic() - self._last_gc < self.gc_interval:
+            return
+        self._last_gc = time.monotonic()
+        removed = self.collect_garbage()
+        if removed:
+            log.info(f"Removed {removed} expired idempotency records")
+
+    def _path_of(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], digest)
@@ -0,0 +1,22 @@
+"""
+Exceptions for Idempotency Services
+"""
+from app.exceptions import AppException
+
+
+class IdempotencyConflictException(AppException):
+    """Exception raised when a request with the same idempotency key is still being handled"""
+
+    def __init__(self, message=None):
+        super().__init__(
+            message or "A request with this idempotency key is still being processed"
+        )
+
+
+class IdempotencyKeyReusedException(AppException):
+    """Exception raised when an idempotency key is reused for a different request"""
+
+    def __init__(self, message=None):
+        super().__init__(
+            message or "This idempotency key was already used for a different request"
+        )
@@ -0,0 +1,150 @@
+"""
+Idempotency cache. Remembers the responses to requests made with an idempotency key, so that a producer retrying a
+request it timed out on gets the original response back instead of the email being queued & sent a second time
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Tuple
+
+from app.config import get_config
+from app.logger import log
+from .backends import (
+    IdempotencyBackend,
+    LocalIdempotencyBackend,
+    RedisIdempotencyBackend,
+)
+from .exceptions import IdempotencyConflictException, IdempotencyKeyReusedException
+
+
+def fingerprint(*parts: bytes | str) -> str:
+    """
+    Fingerprints a request from its contents
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8") if isinstance(part, str) else part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class IdempotencyCache:
+    """
+    Two level cache of idempotent responses.
+
+    Completed responses are kept in an in-process LRU of at most max_entries entries in front of the shared backend, so
+    repeats landing on the same process never leave it. A key is claimed in the backend while its request is handled,
+    for at most pending_ttl seconds, so concurrent repeats are refused rather than handled twice. Responses are kept
+    for ttl seconds. Should the backend be unreachable, requests are handled as if they had no key
+    """
+
+    def __init__(
+        self,
+        backend: IdempotencyBackend,
+        ttl: int = 86400,
+        pending_ttl: int = 60,
+        max_entries: int = 10000,
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, Tuple[float, str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def begin(self, key: str, request_fingerprint: str) -> Any | None:
+        """
+        Starts handling a request. Returns the response to an earlier request with the same key, or None if the
+        request should be handled, in which case it must be completed or released. Raises IdempotencyConflictException
+        if the earlier request is still being handled & IdempotencyKeyReusedException if the key was used for a
+        different request
+        """
+        entry = self._get(key)
+        if entry is not None:
+            return self._replay(entry[0], entry[1], request_fingerprint)
+
+        try:
+            record = self.backend.claim(key, request_fingerprint, self.pending_ttl)
+        # pylint: disable=broad-except
+        except Exception as err:
+            log.warning(f"Idempotency cache is unavailable {err}")
+            return None
+
+        if record is None:
+            return None
+        if record.get("response") is None:
+            raise IdempotencyConflictException()
+        self._put(key, record["fingerprint"], record["response"])
+        return self._replay(
+            record["fingerprint"], record["response"], request_fingerprint
+        )
+
+    def complete(self, key: str, request_fingerprint: str, response: Any):
+        """
+        Stores the response to a request, which is returned for any later request with the same key
+        """
+        self._put(key, request_fingerprint, response)
+        try:
+            self.backend.complete(key, request_fingerprint, response, self.ttl)
+        # pylint: disable=broad-except
+        except Exception as err:
+            log.warning(f"Failed to store idempotent response {err}")
+
+    def release(self, key: str):
+        """
+        Gives up on a request without storing its response, so that it can be retried
+        """
+        try:
+            self.backend.release(key)
+        # pylint: disable=broad-except
+        except Exception as err:
+            log.warning(f"Failed to release idempotency key {err}")
+
+    @staticmethod
+    def _replay(stored_fingerprint: str, response: Any, request_fingerprint: str):
+        if stored_fingerprint != request_fingerprint:
+            raise IdempotencyKeyReusedException()
+        return response
+
+    def _get(self, key: str) -> Tuple[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, stored_fingerprint, response = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return stored_fingerprint, response
+
+    def _put(self, key: str, request_fingerprint: str, response: Any):
+        with self._lock:
+            self._entries[key] = (
+                time.monotonic() + self.ttl,
+                request_fingerprint,
+                response,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+@lru_cache()
+def get_idempotency_cache() -> IdempotencyCache:
+    """
+    Gets the idempotency cache, configured from the idempotency settings
+    """
+    config = get_config()
+    if config.idempotency_redis_url:
+        backend = RedisIdempotencyBackend(config.idempotency_redis_url)
+    else:
+        backend = LocalIdempotencyBackend(config.idempotency_path)
+    return IdempotencyCache(
+        backend=backend,
+        ttl=config.idempotency_ttl,
+        pending_ttl=config.idempotency_pending_ttl,
+        max_entries=config.idempotency_cache_size,
+    )
@@ -4,5 +4,14 @@ Mail services
 from .email_service import EmailService
 from .sendgrid_email_service import SendGridEmailService
 from .mailchimp_email_service import MailChimpEmailService
+from .async_email_service import AsyncEmailService
 from .smtp_proxy import SmtpServer
-from .mailer import send_plain_mail
+from .async_smtp_proxy import AsyncSmtpServer
+from .circuit_breaker import CircuitBreaker
+from .provider_router import ProviderRouter, get_provider_router
+from .mailer import (
+    send_plain_mail,
+    send_plain_mails,
+    async_send_plain_mail,
+    unsent_request,
+)
@@ -0,0 +1,157 @@
+"""
+Asyncio SMTP Proxy service. This wraps functionality around aiosmtplib so that relay conversations run on the event loop
+instead of tying up a thread each
+"""
+import asyncio
+import ssl
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+
+import aiosmtplib
+
+from app.config import config
+from app.logger import log
+from app.utils import singleton
+from .async_email_service import AsyncEmailService
+from .exceptions import ServiceIntegrationException
+from .message import envelope_recipients
+from .mime_stream import stream_message
+
+
+@singleton
+class AsyncSmtpServer(AsyncEmailService):
+    """
+    Asyncio SMTP Server. Keeps up to max_connections relay connections open, each carrying one conversation at a time
+    """
+
+    def __init__(
+        self,
+        host: str | None = config.mail_server,
+        port: int | None = config.mail_port,
+        max_connections: int = config.mail_async_max_connections,
+    ):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.context = ssl.create_default_context()
+        self.username = config.mail_username
+        self.password = config.mail_password
+        self.max_connections = max_connections
+        self._idle: List[aiosmtplib.SMTP] = []
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def login(self, username: str, password: str):
+        """
+        Sets the credentials used to authenticate connections & opens a first connection to the SMTP server
+        """
+        log.info(f"Logging into SMTP {self.host}")
+        self.username = username
+        self.password = password
+        try:
+            self._idle.append(await self._connect())
+        # pylint: disable=broad-except
+        except Exception as err:
+            log.error(f"Failed to login {err}")
+
+    async def logout(self):
+        """
+        Logs out of SMTP server, closing all idle connections
+        """
+        log.info(f"Logging out of SMTP {self.host}")
+        clients, self._idle = self._idle, []
+        for client in clients:
+            await self._close(client)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        """
+        Opens a new authenticated connection to the SMTP server, with the same TLS semantics as SmtpServer
+        """
+        client = aiosmtplib.SMTP(
+            hostname=self.host,
+            port=self.port,
+            use_tls=config.mail_use_ssl,
+            start_tls=config.mail_use_tls,
+            tls_context=self.context,
+        )
+        await client.connect()
+        try:
+            if config.mail_use_tls or config.mail_use_ssl:
+                await client.login(self.username, self.password)
+        except Exception:
+            await self._close(client)
+            raise
+        return client
+
+    @staticmethod
+    async def _close(client: aiosmtplib.SMTP):
+        try:
+            await client.quit()
+        # pylint: disable=broad-except
+        except Exception:
+            client.close()
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[aiosmtplib.SMTP]:
+        """
+        Borrows a connection for a single conversation, waiting if max_connections are already in use. A connection
+        that raised while in use is closed rather than reused
+        """
+        async with self._slots:
+            client = None
+            while self._idle and client is None:
+                client = self._idle.pop()
+                if not client.is_connected:
+                    client = None
+            if client is None:
+                client = await self._connect()
+
+            try:
+                yield client
+            except Exception:
+                await self._close(client)
+                raise
+            self._idle.append(client)
+
+    # pylint: disable=too-many-arguments
+    async def send_email(
+        self,
+        sender: Dict[str, str],
+        recipients: List[Dict[str, str]],
+        ccs: List[Dict[str, str]] | None,
+        bcc: List[Dict[str, str]] | None,
+        subject: str,
+        message: str,
+        attachments: List[Dict[str, str]] | None,
+    ):
+        # the message is built as SmtpServer streams it, off the loop as attachments may be read from the store
+        text = await asyncio.to_thread(
+            lambda: b"".join(
+                stream_message(
+                    sender=sender,
+                    recipients=recipients,
+                    subject=subject,
+                    message=message,
+                    ccs=ccs,
+                    attachments=attachments,
+                )
+            )
+        )
+
+        try:
+            async with self.connection() as client:
+                # pylint: disable=duplicate-code
+                await client.sendmail(
+                    sender.get("email"),
+                    envelope_recipients(recipients, ccs, bcc),
+                    text,
+                )
+            return dict(
+                success=True,
+                message=f"Message from {sender} successfully sent to {recipients}",
+            )
+        # pylint: disable=broad-except
+        except Exception as err:
+            log.error(f"Failed to send email {err}")
+            raise ServiceIntegrationException(
+                f"Sending email from {sender} to {recipients} failed"
+            ) from err
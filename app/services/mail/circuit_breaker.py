@@ -0,0 +1,134 @@
+"""
+Circuit breaker. Tracks the health of an email provider so that, once the provider is failing, messages skip it straight
+away instead of each paying the full connect or request timeout before failing over
+"""
+import threading
+import time
+from collections import deque
+from typing import Deque, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+# pylint: disable=too-many-instance-attributes
+class CircuitBreaker:
+    """
+    Failure rate circuit breaker with half-open probes.
+
+    The breaker is closed while the share of failed calls over the last window seconds stays below failure_rate. Once
+    at least min_calls calls were made in the window and the failure rate is reached, the breaker opens and calls are
+    refused for open_timeout seconds. After that a single probe call is let through: if it succeeds the breaker closes,
+    otherwise it opens again. The breaker also keeps an exponentially weighted average of call latency, which is used
+    to weigh healthy providers against each other
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        window: float = 60.0,
+        min_calls: int = 5,
+        open_timeout: float = 30.0,
+        latency_smoothing: float = 0.2,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.open_timeout = open_timeout
+        self.latency_smoothing = latency_smoothing
+        self.latency: float | None = None
+
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._calls: Deque[Tuple[float, bool]] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """
+        State of the breaker, one of closed, open or half_open
+        """
+        with self._lock:
+            if (
+                self._state == OPEN
+                and time.monotonic() - self._opened_at >= self.open_timeout
+            ):
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        Whether a call may be made. Once the open timeout has passed this lets through a single probe call, whose
+        outcome must then be recorded
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if (
+                self._state == OPEN
+                and time.monotonic() - self._opened_at >= self.open_timeout
+            ):
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self, latency: float):
+        """
+        Records a successful call that took latency seconds
+        """
+        with self._lock:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += self.latency_smoothing * (latency - self.latency)
+
+            if self._state == HALF_OPEN:
+                self._close()
+                return
+            self._record(True)
+
+    def record_failure(self):
+        """
+        Records a failed call, opening the breaker if the failure rate has been reached
+        """
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+
+            self._record(False)
+            calls = len(self._calls)
+            failures = sum(1 for _, success in self._calls if not success)
+            if calls >= self.min_calls and failures >= self.failure_rate * calls:
+                self._open()
+
+    def release(self):
+        """
+        Records a call whose outcome says nothing about the health of the provider, freeing up the probe if it was one
+        """
+        with self._lock:
+            self._probing = False
+
+    def _record(self, success: bool):
+        now = time.monotonic()
+        self._calls.append((now, success))
+        while self._calls and now - self._calls[0][0] > self.window:
+            self._calls.popleft()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+        self._calls.clear()
+
+    def _close(self):
+        self._state = CLOSED
+        self._probing = False
+        self._calls.clear()
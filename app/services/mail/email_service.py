@@ -3,6 +3,7 @@ Abstract Email Service
 """
 from abc import ABC, abstractmethod
 from typing import Dict, List
+from .exceptions import FanoutPartiallySentException
 
 
 # pylint: disable=too-few-public-methods
@@ -30,3 +31,40 @@ class EmailService(ABC):
         Sends emails
         """
         raise NotImplementedError("send_email not yet implemented")
+
+    # pylint: disable=too-many-arguments
+    def send_fanout(
+        self,
+        sender: Dict[str, str],
+        recipients: List[Dict[str, str]],
+        subject: str,
+        message: str,
+        attachments: List[Dict[str, str]] | None,
+    ):
+        """
+        Sends a separate copy of the same message to each recipient. Providers that can address many recipients
+        individually in a single call override this, by default one email is sent per recipient. Raises
+        FanoutPartiallySentException with the recipients already sent to if an email fails after the first
+        """
+        for index, recipient in enumerate(recipients):
+            try:
+                self.send_email(
+                    sender=sender,
+                    recipients=[recipient],
+                    ccs=None,
+                    bcc=None,
+                    subject=subject,
+                    message=message,
+                    attachments=attachments,
+                )
+            except Exception as err:
+                if index:
+                    raise FanoutPartiallySentException(
+                        recipients[:index],
+                        f"Sending email from {sender} failed after {index} recipients",
+                    ) from err
+                raise
+        return dict(
+            success=True,
+            message=f"Message from {sender} successfully sent to {len(recipients)} recipients",
+        )
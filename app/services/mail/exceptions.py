@@ -1,14 +1,19 @@
 """
 Exceptions for Mail Services
 """
+from typing import Dict, List
 from app.exceptions import AppException
 
 
 class EmailSendingException(AppException):
-    """Exception representing failure to send email"""
+    """
+    Exception representing failure to send email. sent holds the recipients of a fan-out email that were sent to before
+    sending failed, retries must leave them out so they do not get the email twice
+    """
 
-    def __init__(self, message=None):
+    def __init__(self, message=None, sent: List[Dict[str, str]] | None = None):
         super().__init__(message or "Failed to send email message")
+        self.sent = sent or []
 
 
 class ServiceIntegrationException(AppException):
@@ -16,3 +21,13 @@ class ServiceIntegrationException(AppException):
 
     def __init__(self, message=None):
         super().__init__(message or "Service Integration Error")
+
+
+class FanoutPartiallySentException(ServiceIntegrationException):
+    """
+    Exception representing a fan-out email that failed after it was sent to some of its recipients, those are in sent
+    """
+
+    def __init__(self, sent: List[Dict[str, str]], message=None):
+        super().__init__(message)
+        self.sent = sent
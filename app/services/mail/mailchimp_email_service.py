@@ -4,10 +4,12 @@ Wrapper for MailChimp Email Service provider
 from typing import Dict, List, Literal
 from mailchimp_transactional.api_client import ApiClientError
 import mailchimp_transactional as mail_client
-from app.utils import singleton
+from app.utils import is_html, singleton
 from app.config import get_config
 from app.logger import log
-from .exceptions import ServiceIntegrationException
+from app.services.attachments import load_attachments
+from app.services.ratelimit import get_rate_limiter, RateLimitTimeoutException
+from .exceptions import FanoutPartiallySentException, ServiceIntegrationException
 from .email_service import EmailService
 from .types import RecipientList, EmailParticipant
 
@@ -28,6 +30,8 @@ class MailChimpEmailService(EmailService):
         self.url = url
         self.token = token
         self.mail_client = mail_client.Client(api_key=token)
+        if url:
+            self.mail_client.api_client.host = url
 
         try:
             self.mail_client.users.ping()
@@ -53,8 +57,12 @@ class MailChimpEmailService(EmailService):
         recipients_to = self._setup_recipients(
             recipients=recipients, recipient_type="to"
         )
-        recipients_to += self._setup_recipients(recipients=ccs, recipient_type="cc")
-        recipients_to += self._setup_recipients(recipients=bcc, recipient_type="bcc")
+        recipients_to += self._setup_recipients(
+            recipients=ccs or [], recipient_type="cc"
+        )
+        recipients_to += self._setup_recipients(
+            recipients=bcc or [], recipient_type="bcc"
+        )
 
         mail = {
             "from_email": sender.get("email"),
@@ -65,16 +73,17 @@ class MailChimpEmailService(EmailService):
         if sender.get("name"):
             mail.update(dict(from_name=sender.get("name")))
 
-        if "<html" in message:
+        if is_html(message):
             mail.update(dict(html=message))
         else:
             mail.update(dict(text=message))
 
         if attachments:
-            mail.update(dict(attachments=attachments))
+            mail.update(dict(attachments=self._setup_attachments(attachments)))
 
         try:
-            response = self.mail_client.messages.send(dict(message=mail))
+            with get_rate_limiter("mailchimp").limit():
+                response = self.mail_client.messages.send(dict(message=mail))
             log.debug(
                 f"Message sent successfully from {sender} to {recipients}. Res: {response}"
             )
@@ -82,12 +91,88 @@ class MailChimpEmailService(EmailService):
                 success=True,
                 message=f"Message from {sender} successfully sent to {recipients}",
             )
-        except ApiClientError as err:
+        except (ApiClientError, RateLimitTimeoutException) as err:
             log.error(f"Failed to send email {err}")
             raise ServiceIntegrationException(
                 f"Sending email from {sender} to {recipients} failed"
             ) from err
 
+    # pylint: disable=too-many-arguments
+    def send_fanout(
+        self,
+        sender: EmailParticipant,
+        recipients: RecipientList,
+        subject: str,
+        message: str,
+        attachments: List[Dict[str, str]] | None,
+    ):
+        """
+        Sends a separate copy of the message to each recipient. With preserve_recipients disabled Mailchimp addresses
+        every recipient in the to list individually, so one API call reaches a whole chunk of recipients. Raises
+        FanoutPartiallySentException with the recipients already sent to if a call fails after the first
+        """
+        mail = {
+            "from_email": sender.get("email"),
+            "subject": subject,
+            "preserve_recipients": False,
+        }
+
+        if sender.get("name"):
+            mail.update(dict(from_name=sender.get("name")))
+
+        if is_html(message):
+            mail.update(dict(html=message))
+        else:
+            mail.update(dict(text=message))
+
+        if attachments:
+            mail.update(dict(attachments=self._setup_attachments(attachments)))
+
+        chunk_size = get_config().mail_fanout_max_recipients
+        for start in range(0, len(recipients), chunk_size):
+            chunk = recipients[start : start + chunk_size]
+            try:
+                with get_rate_limiter("mailchimp").limit():
+                    response = self.mail_client.messages.send(
+                        dict(
+                            message=dict(
+                                mail,
+                                to=self._setup_recipients(
+                                    recipients=chunk, recipient_type="to"
+                                ),
+                            )
+                        )
+                    )
+                log.debug(
+                    f"Message sent successfully from {sender} to {len(chunk)} recipients. Res: {response}"
+                )
+            except (ApiClientError, RateLimitTimeoutException) as err:
+                log.error(f"Failed to send email {err}")
+                if start:
+                    raise FanoutPartiallySentException(
+                        recipients[:start],
+                        f"Sending email from {sender} failed after {start} recipients",
+                    ) from err
+                raise ServiceIntegrationException(
+                    f"Sending email from {sender} to {len(chunk)} recipients failed"
+                ) from err
+
+        return dict(
+            success=True,
+            message=f"Message from {sender} successfully sent to {len(recipients)} recipients",
+        )
+
+    @staticmethod
+    def _setup_attachments(attachments: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        return [
+            {
+                "type": attachment.get("type"),
+                "name": attachment.get("filename"),
+                "content": attachment.get("content"),
+            }
+            for attachment in load_attachments(attachments)
+        ]
+
     @staticmethod
     def _setup_recipients(
         recipients: RecipientList, recipient_type: Literal["to", "cc", "bcc"]
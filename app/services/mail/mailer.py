@@ -1,72 +1,200 @@
 """
-Send email service wrapper. This handles sending the actual email to recipients and handles connection to an SMTP client
-if provided with the credentials. If that fails, this will use an alternative to send an email using an External API.
+Send email service wrapper. This handles sending the actual email to recipients through the configured providers, an
+SMTP client and External APIs, failing over from one provider to the next when sending through a provider fails.
 Ensure that the correct environment variables have been set for the SMTP client and External API for this method to work
 These env variables are imported and included in the config.py file under the Config class for these to be available in
 the current application context
 """
+import asyncio
+from typing import Any, Dict, List, Tuple
 from app.logger import log as logger
-from app.config import get_config
 from app.domain.entities import EmailRequest
-from .exceptions import EmailSendingException
-from .smtp_proxy import SmtpServer
-from .sendgrid_email_service import SendGridEmailService
+from app.services.templates import render_request
+from .exceptions import EmailSendingException, FanoutPartiallySentException
+from .email_service import EmailService
+from .async_smtp_proxy import AsyncSmtpServer
+from .provider_router import get_provider_router
 
 
-@logger.catch
+@logger.catch(reraise=True)
 def send_plain_mail(request: EmailRequest):
     """
     Sends a plain text email to a list of recipients with optional Carbon Copies and Blind Carbon Copies. This includes
-    an option for sending email attachments
+    an option for sending email attachments. The provider is picked by the provider router, which fails over to the
+    next provider should a send fail. Emails using a template are rendered first, those whose recipients render
+    different emails are sent as one email per rendering. Fan-out emails that fail after reaching some recipients are
+    only sent to the rest by the next provider, the EmailSendingException raised when every provider failed carries the
+    recipients that were sent to
     """
-    logger.info(f"Sending email request {request}")
+    rendered = render_request(request)
+    if len(rendered) > 1:
+        results = []
+        sent: List[Dict[str, str]] = []
+        for part in rendered:
+            try:
+                results.append(send_plain_mail(part))
+            except EmailSendingException as error:
+                raise EmailSendingException(
+                    str(error), sent=sent + error.sent
+                ) from error
+            sent.extend(part.get("recipients"))
+        return results
+    request = rendered[0]
+
+    logger.bind(email=request).info("Sending email request")
 
     sender = request.get("sender")
     recipients = request.get("recipients")
-    ccs = request.get("ccs", [])
-    bccs = request.get("bccs", [])
-    subject = request.get("subject")
-    message = request.get("message")
-    attachments = request.get("attachments", [])
-
-    if get_config().mail_smtp_enabled:
-        email_svc = SmtpServer()
+    kwargs = dict(
+        sender=sender,
+        recipients=recipients,
+        subject=request.get("subject"),
+        message=request.get("message"),
+        attachments=request.get("attachments") or [],
+    )
+
+    sent: List[Dict[str, str]] = []
+    if request.get("fanout"):
+
+        def send(provider: EmailService):
+            try:
+                return provider.send_fanout(**kwargs)
+            except FanoutPartiallySentException as err:
+                # the next provider only sends to the recipients this one did not reach
+                sent.extend(err.sent)
+                kwargs["recipients"] = [
+                    recipient
+                    for recipient in kwargs["recipients"]
+                    if recipient not in err.sent
+                ]
+                raise
+
     else:
-        email_svc = SendGridEmailService()
+        kwargs.update(ccs=request.get("ccs", []), bcc=request.get("bccs", []))
+
+        def send(provider: EmailService):
+            return provider.send_email(**kwargs)
 
     try:
-        response = email_svc.sendmail(
-            sender=sender,
-            recipients=recipients,
-            ccs=ccs,
-            bcc=bccs,
-            subject=subject,
-            message=message,
-            attachments=attachments,
-        )
+        return get_provider_router().send(send)
+    except EmailSendingException as error:
+        logger.error(f"Failed to send message with error {error}")
+        raise EmailSendingException(
+            f"Failed to send email message from {sender} to {recipients}", sent=sent
+        ) from error
+
 
-        return response
-    # pylint: disable=broad-except
-    except Exception as err:
-        # this should only happen if there is a fallback, or we fail to send emails with the default setting
-        # if in that event, then the application should try sending an email using a MAIL API
-        logger.warning(
-            f"Failed to send email with error {err}, using alternative to send email"
+def unsent_request(request: EmailRequest, error: Exception) -> EmailRequest:
+    """
+    Gets the part of an email request that still has to be sent after sending it failed with error, the request without
+    the fan-out recipients that were sent to before the failure
+    """
+    sent = getattr(error, "sent", None)
+    if not sent:
+        return request
+    return dict(
+        request,
+        recipients=[
+            recipient for recipient in request["recipients"] if recipient not in sent
+        ],
+    )
+
+
+def send_plain_mails(requests: List[EmailRequest]) -> List[Exception | None]:
+    """
+    Sends many emails, pushing those that can go out through SMTP as they are over a single SMTP session. Emails that
+    fail in the session, fan-out emails & emails whose recipients render different emails are then sent one by one with
+    send_plain_mail, which fails over to the other providers. Returns the error each email failed with, or None for the
+    emails that were sent
+    """
+    errors: List[Exception | None] = [None] * len(requests)
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+    single: List[int] = []
+    for index, request in enumerate(requests):
+        try:
+            rendered = render_request(request)
+        # pylint: disable=broad-except
+        except Exception as err:
+            errors[index] = err
+            continue
+        if len(rendered) == 1 and not request.get("fanout"):
+            batch.append((index, rendered[0]))
+        else:
+            single.append(index)
+
+    router = get_provider_router()
+    if batch and router.allow("smtp"):
+        logger.info(f"Sending batch of {len(batch)} email requests")
+        batch_errors = router.providers["smtp"]().send_batch(
+            [
+                dict(
+                    sender=request.get("sender"),
+                    recipients=request.get("recipients"),
+                    subject=request.get("subject"),
+                    message=request.get("message"),
+                    ccs=request.get("ccs") or [],
+                    bcc=request.get("bccs") or [],
+                    attachments=request.get("attachments") or [],
+                )
+                for _, request in batch
+            ],
+            track=lambda: router.track("smtp"),
+        )
+        single.extend(
+            index for (index, _), error in zip(batch, batch_errors) if error is not None
         )
+    else:
+        single.extend(index for index, _ in batch)
+
+    for index in sorted(single):
         try:
-            response = email_svc.send_email(
-                sender=sender,
-                recipients=recipients,
-                ccs=ccs,
-                bcc=bccs,
-                subject=subject,
-                message=message,
-                attachments=attachments,
-            )
-            return response
+            send_plain_mail(requests[index])
+        # pylint: disable=broad-except
+        except Exception as err:
+            errors[index] = err
+    return errors
+
+
+async def async_send_plain_mail(request: EmailRequest):
+    """
+    Asyncio counterpart of send_plain_mail. SMTP conversations run on the event loop, while the Mail API providers,
+    whose clients are blocking, are routed to in a worker thread
+    """
+    if request.get("fanout") or request.get("template_id"):
+        # fan-out is sent through the providers' batch APIs, which are blocking, & templates are rendered off the loop
+        return await asyncio.to_thread(send_plain_mail, request)
+
+    logger.bind(email=request).info("Sending email request")
+
+    kwargs = dict(
+        sender=request.get("sender"),
+        recipients=request.get("recipients"),
+        ccs=request.get("ccs", []),
+        bcc=request.get("bccs", []),
+        subject=request.get("subject"),
+        message=request.get("message"),
+        attachments=request.get("attachments") or [],
+    )
+
+    router = get_provider_router()
+    if router.allow("smtp"):
+        try:
+            with router.track("smtp"):
+                return await AsyncSmtpServer().send_email(**kwargs)
         # pylint: disable=broad-except
-        except Exception as error:
-            logger.error(f"Failed to send message with alternative with error {error}")
-            raise EmailSendingException(
-                f"Failed to send email message from {sender} to {recipients}"
-            ) from error
+        except Exception as err:
+            logger.warning(
+                f"Failed to send email with error {err}, using alternative to send email"
+            )
+
+    try:
+        return await asyncio.to_thread(
+            router.send,
+            lambda provider: provider.send_email(**kwargs),
+            exclude=["smtp"],
+        )
+    except EmailSendingException as error:
+        logger.error(f"Failed to send message with alternative with error {error}")
+        raise EmailSendingException(
+            f"Failed to send email message from {kwargs['sender']} to {kwargs['recipients']}"
+        ) from error
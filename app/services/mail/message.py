@@ -0,0 +1,16 @@
+"""
+Message helpers for SMTP transports. Shared by the blocking and asyncio SMTP clients, which both build their messages
+with the streaming MIME writer
+"""
+from typing import List, Dict
+
+
+def envelope_recipients(
+    recipients: List[Dict[str, str]],
+    ccs: List[Dict[str, str]] | None = None,
+    bcc: List[Dict[str, str]] | None = None,
+) -> List[str]:
+    """
+    Email addresses the message is delivered to, including carbon copies and blind carbon copies
+    """
+    return [email.get("email") for email in [*recipients, *(ccs or []), *(bcc or [])]]
@@ -0,0 +1,247 @@
+"""
+Streaming MIME writer. Produces a multipart message as a sequence of CRLF terminated chunks and streams it straight into
+the SMTP DATA command, so attachments are base64 encoded a chunk at a time as they are read from the attachment store.
+Peak memory per message is therefore bounded by the chunk size rather than by the size of the message
+"""
+import base64
+import re
+import smtplib
+import uuid
+from email.errors import HeaderParseError
+from email.header import Header
+from email.utils import encode_rfc2231, formatdate, make_msgid
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from app.services.attachments import AttachmentStore, get_attachment_store
+
+CRLF = b"\r\n"
+# 57 bytes of data encode to a single 76 character base64 line, the maximum RFC 2045 allows
+LINE_BYTES = 57
+LINE_LENGTH = 76
+LINES_PER_CHUNK = 1024
+# chunks are coalesced into writes of at least this size, as small writes are each held back by Nagle's algorithm until
+# the relay acknowledges the previous one, which it delays for up to 40ms
+WRITE_BYTES = 64 * 1024
+
+_leading_dots = re.compile(rb"(?m)^\.")
+
+
+def _header(name: str, value: str) -> bytes:
+    # a line break in a value would end the header & let the rest of the value add headers of its own
+    if "\r" in value or "\n" in value:
+        raise HeaderParseError(f"{name} header must not contain line breaks")
+    if value.isascii():
+        return f"{name}: {value}".encode("ascii") + CRLF
+    encoded = Header(value, "utf-8", header_name=name).encode(linesep="\r\n")
+    return f"{name}: {encoded}".encode("ascii") + CRLF
+
+
+def _address_header(name: str, participants: List[Dict[str, str]]) -> bytes:
+    # one address per folded line keeps long recipient lists within the SMTP line length limit
+    addresses = [participant.get("email") for participant in participants]
+    if any("\r" in address or "\n" in address for address in addresses):
+        raise HeaderParseError(f"{name} header must not contain line breaks")
+    addresses = ",\r\n ".join(addresses)
+    return f"{name}: {addresses}".encode("ascii") + CRLF
+
+
+def _content_disposition(filename: str) -> str:
+    if filename.isascii():
+        quoted = filename.replace("\\", "\\\\").replace('"', '\\"')
+        return f'attachment; filename="{quoted}"'
+    # RFC 2231 encodes the filename parameter alone, an encoded word would take the whole header value with it
+    return f"attachment; filename*={encode_rfc2231(filename, 'utf-8')}"
+
+
+def _base64_chunks(data: bytes | memoryview) -> Iterator[bytes]:
+    step = LINE_BYTES * LINES_PER_CHUNK
+    for offset in range(0, len(data), step):
+        encoded = base64.b64encode(data[offset : offset + step])
+        yield CRLF.join(
+            encoded[start : start + LINE_LENGTH]
+            for start in range(0, len(encoded), LINE_LENGTH)
+        ) + CRLF
+
+
+def _rewrap_base64(content: str) -> Iterator[bytes]:
+    encoded = "".join(content.split()).encode("ascii")
+    step = LINE_LENGTH * LINES_PER_CHUNK
+    for offset in range(0, len(encoded), step):
+        chunk = encoded[offset : offset + step]
+        yield CRLF.join(
+            chunk[start : start + LINE_LENGTH]
+            for start in range(0, len(chunk), LINE_LENGTH)
+        ) + CRLF
+
+
+def _attachment_chunks(
+    attachment: Dict[str, str], store: AttachmentStore
+) -> Iterator[bytes]:
+    content = attachment.get("content")
+    if content is not None:
+        # inline content is already base64 encoded
+        yield from _rewrap_base64(content)
+        return
+
+    with store.open(attachment.get("reference")) as contents:
+        yield from _base64_chunks(contents)
+
+
+# pylint: disable=too-many-arguments
+def stream_message(
+    sender: Dict[str, str],
+    recipients: List[Dict[str, str]],
+    subject: str,
+    message: str,
+    ccs: List[Dict[str, str]] | None = None,
+    attachments: List[Dict[str, str]] | None = None,
+    store: AttachmentStore | None = None,
+) -> Iterator[bytes]:
+    """
+    Generates a multipart message as CRLF terminated chunks. Attachments are either inline base64 content or references
+    to the attachment store, which are read through a memory map & encoded a chunk at a time. Blind carbon copies are
+    deliberately left out of the headers. Headers are built up front, so header values with line breaks in them raise
+    HeaderParseError before anything is sent
+    """
+    boundary = f"==============={uuid.uuid4().hex}=="
+    dash_boundary = f"--{boundary}".encode("ascii") + CRLF
+
+    headers = b"".join(
+        [
+            # folded by hand, the boundary parameter alone would take the line past the length limit
+            f'Content-Type: multipart/mixed;\r\n boundary="{boundary}"'.encode("ascii")
+            + CRLF,
+            _header("MIME-Version", "1.0"),
+            _header("Date", formatdate(localtime=True)),
+            _header("Message-ID", make_msgid()),
+            _header("From", sender.get("email")),
+            _address_header("To", recipients),
+            _address_header("Cc", ccs) if ccs else b"",
+            _header("Subject", subject),
+            CRLF,
+            dash_boundary,
+            _header("Content-Type", 'text/plain; charset="utf-8"'),
+            _header("MIME-Version", "1.0"),
+            _header("Content-Transfer-Encoding", "base64"),
+            CRLF,
+        ]
+    )
+    parts = [
+        (
+            b"".join(
+                [
+                    dash_boundary,
+                    _header(
+                        "Content-Type",
+                        attachment.get("type") or "application/octet-stream",
+                    ),
+                    _header("MIME-Version", "1.0"),
+                    _header("Content-Transfer-Encoding", "base64"),
+                    _header(
+                        "Content-Disposition",
+                        _content_disposition(attachment.get("filename") or ""),
+                    ),
+                    CRLF,
+                ]
+            ),
+            attachment,
+        )
+        for attachment in attachments or []
+    ]
+    return _stream(headers, message, parts, boundary, store)
+
+
+def _stream(
+    headers: bytes,
+    message: str,
+    parts: List[Tuple[bytes, Dict[str, str]]],
+    boundary: str,
+    store: AttachmentStore | None,
+) -> Iterator[bytes]:
+    yield headers
+    yield from _base64_chunks(message.encode("utf-8"))
+    for part_headers, attachment in parts:
+        yield part_headers
+        yield from _attachment_chunks(attachment, store or get_attachment_store())
+    yield f"--{boundary}--".encode("ascii") + CRLF
+
+
+def send_stream(
+    client: smtplib.SMTP, from_addr: str, to_addrs: List[str], chunks: Iterable[bytes]
+) -> Dict[str, tuple]:
+    """
+    Sends a message produced as CRLF terminated chunks over an SMTP connection. This is smtplib's sendmail, except that
+    the message is written to the DATA stream as it is produced instead of being passed in as a single string. When the
+    relay supports PIPELINING, MAIL FROM, RCPT TO & DATA go out in a single write, so the envelope of a message costs
+    one round trip instead of one per command
+    """
+    client.ehlo_or_helo_if_needed()
+
+    if "pipelining" in client.esmtp_features:
+        commands = [
+            f"mail FROM:{smtplib.quoteaddr(from_addr)}",
+            *(f"rcpt TO:{smtplib.quoteaddr(address)}" for address in to_addrs),
+            "data",
+        ]
+        client.send("".join(f"{command}\r\n" for command in commands))
+        mail_reply, *rcpt_replies, data_reply = [client.getreply() for _ in commands]
+    else:
+        mail_reply = client.mail(from_addr)
+        rcpt_replies, data_reply = [], None
+        if mail_reply[0] == 250:
+            for address in to_addrs:
+                rcpt_replies.append(client.rcpt(address))
+                if rcpt_replies[-1][0] == 421:
+                    break
+
+    code, response = mail_reply
+    if code != 250:
+        if code == 421:
+            client.close()
+        else:
+            _abort(client, data_reply)
+        raise smtplib.SMTPSenderRefused(code, response, from_addr)
+
+    refused = {}
+    for address, (code, response) in zip(to_addrs, rcpt_replies):
+        if code not in (250, 251):
+            refused[address] = (code, response)
+        if code == 421:
+            client.close()
+            raise smtplib.SMTPRecipientsRefused(refused)
+    if len(refused) == len(to_addrs):
+        _abort(client, data_reply)
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    if data_reply is None:
+        client.putcmd("data")
+        data_reply = client.getreply()
+    code, response = data_reply
+    if code != 354:
+        raise smtplib.SMTPDataError(code, response)
+
+    pending = bytearray()
+    for chunk in chunks:
+        pending += _leading_dots.sub(b"..", chunk)
+        if len(pending) >= WRITE_BYTES:
+            client.send(bytes(pending))
+            pending.clear()
+    pending += b"." + CRLF
+    client.send(bytes(pending))
+
+    code, response = client.getreply()
+    if code != 250:
+        if code == 421:
+            client.close()
+        else:
+            client.rset()
+        raise smtplib.SMTPDataError(code, response)
+    return refused
+
+
+def _abort(client: smtplib.SMTP, data_reply: tuple | None):
+    # a relay may have accepted a pipelined DATA regardless, in which case the empty message is ended before resetting
+    if data_reply is not None and data_reply[0] == 354:
+        client.send(b"." + CRLF)
+        client.getreply()
+    client.rset()
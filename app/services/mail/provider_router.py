@@ -0,0 +1,207 @@
+"""
+Email provider router. Picks the provider each message is sent through from the providers whose circuit breakers allow
+it, favouring the ones that have been answering fastest, and fails over to the next provider when a send fails
+"""
+import random
+import smtplib
+import time
+from contextlib import contextmanager
+from email.errors import HeaderParseError
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, TypeVar
+
+from app.config import get_config
+from app.logger import log
+from app.metrics import (
+    PROVIDER_CIRCUIT_OPEN,
+    PROVIDER_SEND_DURATION,
+    PROVIDER_SEND_ERRORS,
+)
+from app.services.analytics import get_minute_series
+from app.services.attachments import AttachmentNotFoundException
+from app.services.ratelimit import RateLimitTimeoutException
+from .circuit_breaker import CircuitBreaker
+from .email_service import EmailService
+from .exceptions import EmailSendingException
+from .smtp_proxy import SmtpServer
+from .sendgrid_email_service import SendGridEmailService
+from .mailchimp_email_service import MailChimpEmailService
+
+T = TypeVar("T")
+
+PROVIDERS: Dict[str, Callable[[], EmailService]] = {
+    "smtp": SmtpServer,
+    "sendgrid": SendGridEmailService,
+    "mailchimp": MailChimpEmailService,
+}
+
+# errors caused by the message or by our own pacing rather than by the provider, these do not count against its health
+_NEUTRAL_ERRORS = (
+    RateLimitTimeoutException,
+    AttachmentNotFoundException,
+    smtplib.SMTPRecipientsRefused,
+    HeaderParseError,
+)
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """
+    Whether an error means the provider is unhealthy. Providers wrap the errors they run into, so the whole chain of
+    causes is checked
+    """
+    while error is not None:
+        if isinstance(error, _NEUTRAL_ERRORS):
+            return False
+        error = error.__cause__
+    return True
+
+
+class ProviderRouter:
+    """
+    Routes sends across email providers.
+
+    Providers are tried tier by tier: primary providers first, then fallback providers once every primary provider has
+    failed or is unavailable. Within a tier the order is drawn at random, weighted by the inverse of each provider's
+    average latency, so faster providers take a larger share of the traffic. A provider whose circuit breaker is open
+    is skipped without being contacted
+    """
+
+    def __init__(
+        self,
+        providers: Dict[str, Callable[[], EmailService]],
+        breakers: Dict[str, CircuitBreaker],
+        primary: List[str],
+        fallback: List[str] | None = None,
+    ):
+        self.providers = providers
+        self.breakers = breakers
+        self.primary = primary
+        self.fallback = [name for name in fallback or [] if name not in primary]
+
+    def allow(self, name: str) -> bool:
+        """
+        Whether a provider is routed to and its circuit breaker lets a call through
+        """
+        return name in self.breakers and self.breakers[name].allow()
+
+    @contextmanager
+    def track(self, name: str) -> Iterator[None]:
+        """
+        Context manager that records the outcome & latency of a call to a provider with its circuit breaker & in the
+        provider's analytics
+        """
+        breaker = self.breakers[name]
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as err:
+            latency = time.monotonic() - started
+            if is_provider_failure(err):
+                breaker.record_failure()
+                PROVIDER_SEND_ERRORS.labels(provider=name, cause="provider").inc()
+            else:
+                breaker.release()
+                PROVIDER_SEND_ERRORS.labels(provider=name, cause="message").inc()
+            PROVIDER_SEND_DURATION.labels(provider=name, outcome="failure").observe(
+                latency
+            )
+            get_minute_series().record("provider", name, "failed")
+            raise
+        latency = time.monotonic() - started
+        breaker.record_success(latency)
+        PROVIDER_SEND_DURATION.labels(provider=name, outcome="success").observe(latency)
+        get_minute_series().record("provider", name, "sent")
+
+    def send(
+        self, operation: Callable[[EmailService], T], exclude: Iterable[str] = ()
+    ) -> T:
+        """
+        Calls operation with providers in routing order until one succeeds, skipping excluded providers. Raises
+        EmailSendingException if no provider succeeded
+        """
+        last_error = None
+        for name in self.order(exclude):
+            if not self.breakers[name].allow():
+                log.debug(f"Skipping email provider {name}, its circuit is open")
+                PROVIDER_CIRCUIT_OPEN.labels(provider=name).inc()
+                continue
+            try:
+                with self.track(name):
+                    return operation(self.providers[name]())
+            # pylint: disable=broad-except
+            except Exception as err:
+                log.warning(f"Failed to send email through {name} with error {err}")
+                last_error = err
+
+        if last_error is None:
+            raise EmailSendingException("No email provider is available")
+        raise EmailSendingException("All email providers failed") from last_error
+
+    def order(self, exclude: Iterable[str] = ()) -> List[str]:
+        """
+        Order in which providers are tried for a single send
+        """
+        exclude = set(exclude)
+        return [
+            *self._weighted_order(
+                [name for name in self.primary if name not in exclude]
+            ),
+            *self._weighted_order(
+                [name for name in self.fallback if name not in exclude]
+            ),
+        ]
+
+    def _weighted_order(self, names: List[str]) -> List[str]:
+        latencies = [
+            self.breakers[name].latency
+            for name in names
+            if self.breakers[name].latency is not None
+        ]
+        # providers that have not been timed yet are assumed to be as fast as the fastest one, so they get tried
+        default_latency = min(latencies) if latencies else 1.0
+
+        remaining = list(names)
+        ordered = []
+        while remaining:
+            weights = [
+                1 / max(self.breakers[name].latency or default_latency, 1e-3)
+                for name in remaining
+            ]
+            choice = random.choices(remaining, weights=weights)[0]
+            ordered.append(choice)
+            remaining.remove(choice)
+        return ordered
+
+
+@lru_cache()
+def get_provider_router() -> ProviderRouter:
+    """
+    Gets the provider router, configured from the provider & circuit breaker settings
+    """
+    config = get_config()
+
+    def enabled(names: List[str]) -> List[str]:
+        return [
+            name
+            for name in names
+            if name in PROVIDERS and (name != "smtp" or config.mail_smtp_enabled)
+        ]
+
+    primary = enabled(config.mail_providers)
+    fallback = enabled(config.mail_fallback_providers)
+
+    return ProviderRouter(
+        providers=PROVIDERS,
+        breakers={
+            name: CircuitBreaker(
+                name=name,
+                failure_rate=config.circuit_breaker_failure_rate,
+                window=config.circuit_breaker_window,
+                min_calls=config.circuit_breaker_min_calls,
+                open_timeout=config.circuit_breaker_open_timeout,
+            )
+            for name in {*primary, *fallback}
+        },
+        primary=primary,
+        fallback=fallback,
+    )
@@ -17,13 +17,18 @@ from sendgrid.helpers.mail import (
     FileName,
     FileType,
 )
-from app.utils import singleton
+from app.utils import is_html, singleton
 from app.config import get_config
 from app.logger import log
-from .exceptions import ServiceIntegrationException
+from app.services.attachments import load_attachments
+from app.services.ratelimit import get_rate_limiter
+from .exceptions import FanoutPartiallySentException, ServiceIntegrationException
 from .email_service import EmailService
 from .types import RecipientList, EmailParticipant
 
+# SendGrid accepts at most this many personalizations in a single send request
+SENDGRID_MAX_PERSONALIZATIONS = 1000
+
 
 @singleton
 # pylint: disable=too-few-public-methods
@@ -40,7 +45,11 @@ class SendGridEmailService(EmailService):
         super().__init__()
         self.url = url
         self.token = token
-        self.mail_client = mail_client.SendGridAPIClient(api_key=token)
+        self.mail_client = (
+            mail_client.SendGridAPIClient(api_key=token, host=url)
+            if url
+            else mail_client.SendGridAPIClient(api_key=token)
+        )
 
     # pylint: disable=too-many-arguments
     def send_email(
@@ -61,11 +70,7 @@ class SendGridEmailService(EmailService):
         ]
 
         mail = Mail(from_email=from_email, to_emails=to_emails, subject=subject)
-
-        if "<html" in message:
-            mail.content = HtmlContent(content=message)
-        else:
-            mail.content = Content(mime_type=MimeType.text, content=message)
+        self._set_content(mail, message)
 
         if ccs:
             mail.cc = [
@@ -78,6 +83,67 @@ class SendGridEmailService(EmailService):
                 for recipient in bcc
             ]
 
+        self._set_attachments(mail, load_attachments(attachments or []))
+
+        return self._post(mail, sender=sender, recipients=recipients)
+
+    # pylint: disable=too-many-arguments
+    def send_fanout(
+        self,
+        sender: EmailParticipant,
+        recipients: RecipientList,
+        subject: str,
+        message: str,
+        attachments: List[Dict[str, str]] | None,
+    ):
+        """
+        Sends a separate copy of the message to each recipient. Every recipient gets their own personalization, so a
+        single API call reaches up to SENDGRID_MAX_PERSONALIZATIONS recipients. Raises FanoutPartiallySentException with
+        the recipients already sent to if a call fails after the first
+        """
+        from_email = Email(email=sender.get("email"), name=sender.get("name"))
+        attachments = load_attachments(attachments or [])
+        chunk_size = min(
+            get_config().mail_fanout_max_recipients, SENDGRID_MAX_PERSONALIZATIONS
+        )
+
+        for start in range(0, len(recipients), chunk_size):
+            chunk = recipients[start : start + chunk_size]
+            mail = Mail(
+                from_email=from_email,
+                to_emails=[
+                    To(email=recipient.get("email"), name=recipient.get("name"))
+                    for recipient in chunk
+                ],
+                subject=subject,
+                is_multiple=True,
+            )
+            self._set_content(mail, message)
+            self._set_attachments(mail, attachments)
+            try:
+                self._post(mail, sender=sender, recipients=chunk)
+            except ServiceIntegrationException as err:
+                if start:
+                    raise FanoutPartiallySentException(
+                        recipients[:start],
+                        f"Sending email from {sender} failed after {start} recipients",
+                    ) from err
+                raise
+
+        return dict(
+            success=True,
+            message=f"Message from {sender} successfully sent to {len(recipients)} recipients",
+        )
+
+    @staticmethod
+    def _set_content(mail: Mail, message: str):
+        if is_html(message):
+            mail.content = HtmlContent(content=message)
+        else:
+            mail.content = Content(mime_type=MimeType.text, content=message)
+
+    @staticmethod
+    def _set_attachments(mail: Mail, attachments: List[Dict[str, str]] | None):
         if attachments:
             mail.attachment = [
                 Attachment(
@@ -88,8 +154,12 @@ class SendGridEmailService(EmailService):
                 for attachment in attachments
             ]
 
+    def _post(self, mail: Mail, sender: EmailParticipant, recipients: RecipientList):
         try:
-            response = self.mail_client.client.mail.send.post(request_body=mail.get())
+            with get_rate_limiter("sendgrid").limit():
+                response = self.mail_client.client.mail.send.post(
+                    request_body=mail.get()
+                )
             status_code = response.status_code
             if not status_code >= 200 and status_code <= 299:
                 raise ServiceIntegrationException(
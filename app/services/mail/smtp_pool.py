@@ -0,0 +1,292 @@
+"""
+SMTP connection pool. Keeps a bounded set of authenticated SMTP connections that worker threads borrow when sending
+messages, so that several messages can be pushed to the relay in parallel without sharing a single SMTP dialogue
+"""
+import smtplib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Iterable, Iterator, List
+
+from app.logger import log
+from .exceptions import ServiceIntegrationException
+from .mime_stream import send_stream
+
+
+def is_connection_error(error: Exception) -> bool:
+    """
+    Whether an error raised while talking to the relay means the connection itself is gone, as opposed to the relay
+    rejecting the message. smtplib's own exceptions subclass OSError, so only a disconnect counts among those
+    """
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class SmtpConnection:
+    """
+    A pooled SMTP connection. Tracks the bookkeeping the pool needs to decide when a connection should be recycled
+    """
+
+    def __init__(self, client: smtplib.SMTP):
+        self.client = client
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_success = self.created_at
+        self.messages_sent = 0
+
+    def idle_for(self) -> float:
+        """
+        Number of seconds since this connection was last returned to the pool
+        """
+        return time.monotonic() - self.last_used
+
+    def quiet_for(self) -> float:
+        """
+        Number of seconds since the relay last answered a command successfully on this connection
+        """
+        return time.monotonic() - self.last_success
+
+    def is_open(self) -> bool:
+        """
+        Passive liveness check. smtplib drops the socket once it notices the relay has disconnected
+        """
+        return self.client.sock is not None
+
+    def is_alive(self) -> bool:
+        """
+        Checks that the connection is still usable by issuing an SMTP NOOP
+        """
+        try:
+            alive = self.client.noop()[0] == 250
+        # pylint: disable=broad-except
+        except Exception as err:
+            log.warning(f"SMTP connection is disconnected {err}")
+            return False
+        if alive:
+            self.last_success = time.monotonic()
+        return alive
+
+    def sendmail(self, from_addr: str, to_addrs: List[str], msg: str):
+        """
+        Sends a message over this connection
+        """
+        self.client.sendmail(from_addr=from_addr, to_addrs=to_addrs, msg=msg)
+        self.messages_sent += 1
+        self.last_success = time.monotonic()
+
+    def send_stream(self, from_addr: str, to_addrs: List[str], chunks: Iterable[bytes]):
+        """
+        Sends a message produced as a stream of chunks over this connection
+        """
+        send_stream(self.client, from_addr=from_addr, to_addrs=to_addrs, chunks=chunks)
+        self.messages_sent += 1
+        self.last_success = time.monotonic()
+
+    def close(self):
+        """
+        Closes the connection, politely if possible
+        """
+        try:
+            self.client.quit()
+        # pylint: disable=broad-except
+        except Exception:
+            self.client.close()
+
+
+# pylint: disable=too-many-instance-attributes
+class SmtpConnectionPool:
+    """
+    Bounded, thread-safe pool of SMTP connections.
+
+    Connections are created lazily through the factory up to max_size, handed out LIFO so that hot connections stay hot
+    while surplus ones age out after idle_timeout, and recycled after max_messages messages. Liveness is tracked
+    passively: a connection the relay answered within the last probe_interval seconds is handed out as is, and only
+    quieter connections are probed with a NOOP before checkout.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        factory: Callable[[], smtplib.SMTP],
+        min_size: int = 1,
+        max_size: int = 10,
+        idle_timeout: float = 300.0,
+        max_messages: int = 100,
+        checkout_timeout: float = 30.0,
+        probe_interval: float = 30.0,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if min_size > max_size:
+            raise ValueError("min_size must not be greater than max_size")
+
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.checkout_timeout = checkout_timeout
+        self.probe_interval = probe_interval
+
+        self._idle: Deque[SmtpConnection] = deque()
+        self._size = 0
+        self._closed = False
+        self._available = threading.Condition(threading.Lock())
+
+    @property
+    def size(self) -> int:
+        """
+        Number of open connections, whether idle or checked out
+        """
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        """
+        Number of connections waiting in the pool
+        """
+        return len(self._idle)
+
+    def warm(self):
+        """
+        Opens connections until the pool holds at least min_size of them
+        """
+        with self._available:
+            self._closed = False
+            missing = max(self.min_size - self._size, 0)
+            self._size += missing
+
+        opened = []
+        try:
+            for _ in range(missing):
+                opened.append(self._open())
+        finally:
+            with self._available:
+                self._size -= missing - len(opened)
+                self._idle.extend(opened)
+                self._available.notify(len(opened))
+
+    def acquire(self, probe: bool = False) -> SmtpConnection:
+        """
+        Borrows a connection from the pool, opening a new one if none is idle and the pool is not yet full. Blocks for
+        at most checkout_timeout seconds when the pool is exhausted. With probe set, idle connections are always
+        checked with a NOOP, which is useful once another connection to the relay has been found dead
+        """
+        deadline = time.monotonic() + self.checkout_timeout
+
+        while True:
+            connection = None
+            with self._available:
+                while (
+                    not self._closed and not self._idle and self._size >= self.max_size
+                ):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise ServiceIntegrationException(
+                            "Timed out waiting for an SMTP connection"
+                        )
+                    self._available.wait(remaining)
+
+                if self._closed:
+                    raise ServiceIntegrationException("SMTP connection pool is closed")
+
+                if self._idle:
+                    connection = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if connection is None:
+                try:
+                    return self._open()
+                except Exception:
+                    self._forget()
+                    raise
+
+            if self._is_usable(connection, probe):
+                return connection
+            self._discard(connection)
+
+    def release(self, connection: SmtpConnection, discard: bool = False):
+        """
+        Returns a connection to the pool. The connection is closed instead if it is broken, has reached max_messages or
+        the pool has been closed
+        """
+        connection.last_used = time.monotonic()
+
+        if discard or self._closed or connection.messages_sent >= self.max_messages:
+            self._discard(connection)
+            return
+
+        with self._available:
+            self._idle.append(connection)
+            self._available.notify()
+
+        self._reap_idle()
+
+    @contextmanager
+    def connection(self, probe: bool = False) -> Iterator[SmtpConnection]:
+        """
+        Context manager that borrows a connection and returns it to the pool on exit. A connection that raised while
+        in use is assumed to be in an unknown state and is discarded
+        """
+        connection = self.acquire(probe)
+        try:
+            yield connection
+        except Exception:
+            self.release(connection, discard=True)
+            raise
+        self.release(connection)
+
+    def close(self):
+        """
+        Closes all idle connections and stops handing out new ones. Connections still checked out are closed as they
+        are released
+        """
+        with self._available:
+            self._closed = True
+            connections = list(self._idle)
+            self._idle.clear()
+            self._size -= len(connections)
+            self._available.notify_all()
+
+        for connection in connections:
+            connection.close()
+
+    def _open(self) -> SmtpConnection:
+        return SmtpConnection(self.factory())
+
+    def _is_usable(self, connection: SmtpConnection, probe: bool) -> bool:
+        if connection.idle_for() > self.idle_timeout or not connection.is_open():
+            return False
+        if not probe and connection.quiet_for() < self.probe_interval:
+            return True
+        return connection.is_alive()
+
+    def _discard(self, connection: SmtpConnection):
+        connection.close()
+        self._forget()
+
+    def _forget(self):
+        with self._available:
+            self._size -= 1
+            self._available.notify()
+
+    def _reap_idle(self):
+        """
+        Closes connections that have been idle for longer than idle_timeout, keeping at least min_size open. The oldest
+        idle connections sit at the left of the deque since checkouts pop from the right
+        """
+        expired = []
+        with self._available:
+            while (
+                self._idle
+                and self._size > self.min_size
+                and self._idle[0].idle_for() > self.idle_timeout
+            ):
+                expired.append(self._idle.popleft())
+                self._size -= 1
+
+        for connection in expired:
+            connection.close()
@@ -1,122 +1,127 @@
 """
 SMTP Proxy service. This wraps functionality around an SMTP library
 """
-from typing import List, Dict
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterable, List
 import smtplib
 import ssl
-from email import encoders
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email.mime.text import MIMEText
+from email.errors import HeaderParseError
 
 from app.config import config
 from app.logger import log
 from app.utils import singleton
-from .exceptions import ServiceIntegrationException
+from app.services.ratelimit import get_rate_limiter
+from .exceptions import FanoutPartiallySentException, ServiceIntegrationException
+from .email_service import EmailService
+from .smtp_pool import SmtpConnection, SmtpConnectionPool, is_connection_error
+from .message import envelope_recipients
+from .mime_stream import stream_message
 
 
 @singleton
-class SmtpServer:
+class SmtpServer(EmailService):
     """
-    SMTP Server
+    SMTP Server. Messages are sent over connections borrowed from a bounded connection pool, so this can safely be
+    shared by concurrent worker threads
     """
 
     def __init__(
         self, host: str | None = config.mail_server, port: int | None = config.mail_port
     ):
+        super().__init__()
         self.host = host
         self.port = port
         self.context = ssl.create_default_context()
-        if config.mail_use_ssl:
-            self.server = smtplib.SMTP_SSL(host=host, port=port, context=self.context)
-        else:
-            self.server = smtplib.SMTP(host=host, port=port)
+        self.username = config.mail_username
+        self.password = config.mail_password
+        self.pool = SmtpConnectionPool(
+            factory=self._connect,
+            min_size=config.mail_pool_min_size,
+            max_size=config.mail_pool_max_size,
+            idle_timeout=config.mail_pool_idle_timeout,
+            max_messages=config.mail_pool_max_messages,
+            checkout_timeout=config.mail_pool_checkout_timeout,
+            probe_interval=config.mail_pool_probe_interval,
+        )
 
     def login(self, username: str, password: str):
         """
-        Logs into SMTP server
+        Sets the credentials used to authenticate pooled connections & opens the minimum number of connections
         """
         log.info(f"Logging into SMTP {self.host}")
+        self.username = username
+        self.password = password
         try:
-            self.server.ehlo()
-            if config.mail_use_tls:
-                self.server.starttls(context=self.context)
-                self.server.login(user=username, password=password)
-            if config.mail_use_ssl:
-                self.server.login(
-                    user=config.mail_username, password=config.mail_password
-                )
-            self.server.ehlo()
+            self.pool.warm()
         # pylint: disable=broad-except
         except Exception as err:
             log.error(f"Failed to login {err}")
-            self.server.quit()
 
     def logout(self):
         """
-        Logs out of SMTP server
+        Logs out of SMTP server, closing all pooled connections
         """
         log.info(f"Logging out of SMTP {self.host}")
         try:
-            self.server.quit()
+            self.pool.close()
         # pylint: disable=broad-except
         except Exception as err:
-            log.error(f"Failed to quite smtp server {err}")
-            self.server.quit()
+            log.error(f"Failed to quit smtp server {err}")
+
+    def _connect(self) -> smtplib.SMTP:
+        """
+        Opens a new authenticated connection to the SMTP server. Used by the pool to create connections
+        """
+        if config.mail_use_ssl:
+            server = smtplib.SMTP_SSL(
+                host=self.host, port=self.port, context=self.context
+            )
+        else:
+            server = smtplib.SMTP(host=self.host, port=self.port)
+
+        try:
+            server.ehlo()
+            if config.mail_use_tls:
+                server.starttls(context=self.context)
+                server.ehlo()
+            if config.mail_use_tls or config.mail_use_ssl:
+                server.login(user=self.username, password=self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
 
     # pylint: disable=too-many-arguments
-    def sendmail(
+    def send_email(
         self,
         sender: Dict[str, str],
         recipients: List[Dict[str, str]],
+        ccs: List[Dict[str, str]] | None,
+        bcc: List[Dict[str, str]] | None,
         subject: str,
         message: str,
-        ccs: List[Dict[str, str]] | None = None,
-        bcc: List[Dict[str, str]] | None = None,
-        attachments: List[Dict[str, str]] | None = None,
+        attachments: List[Dict[str, str]] | None,
     ):
         """
-        Sends plain email
+        Sends plain email. The message is streamed to the server as it is built, attachments may either carry their
+        base64 encoded content or refer to the attachment store
         """
-        body = MIMEMultipart()
-        body["From"] = sender.get("email")
-        body["To"] = ", ".join(email.get("email") for email in recipients)
-        body["Cc"] = ", ".join(email.get("email") for email in ccs)
-        body["Bcc"] = ", ".join(email.get("email") for email in bcc)
-        body["Subject"] = subject
 
-        body.attach(MIMEText(message, "plain"))
-
-        if attachments:
-            part = MIMEBase("application", "octet-stream")
-
-            for attachment in attachments:
-                filename = attachment.get("filename")
-                content = attachment.get("content")
-
-                part.set_payload(content)
-
-                # Encode file in ASCII characters to send by email
-                encoders.encode_base64(part)
-
-                # Add header as key/value pair to attachment part
-                part.add_header(
-                    "Content-Disposition",
-                    f"attachment; filename= {filename}",
-                )
-
-            body.attach(part)
-
-        text = body.as_string()
+        def message_chunks():
+            return stream_message(
+                sender=sender,
+                recipients=recipients,
+                subject=subject,
+                message=message,
+                ccs=ccs,
+                attachments=attachments,
+            )
 
         try:
-            if not self.__check_connection():
-                self.server.connect(host=config.mail_server, port=config.mail_port)
-            # pylint: disable=duplicate-code
-            self.server.sendmail(
+            self._deliver(
                 from_addr=sender.get("email"),
-                to_addrs=[email.get("email") for email in recipients],
-                msg=text,
+                to_addrs=envelope_recipients(recipients, ccs, bcc),
+                message_chunks=message_chunks,
             )
             return dict(
                 success=True,
@@ -129,14 +134,157 @@ class SmtpServer:
                 f"Sending email from {sender} to {recipients} failed"
             ) from err
 
-    def __check_connection(self) -> bool:
+    # pylint: disable=too-many-arguments
+    def send_fanout(
+        self,
+        sender: Dict[str, str],
+        recipients: List[Dict[str, str]],
+        subject: str,
+        message: str,
+        attachments: List[Dict[str, str]] | None = None,
+    ):
+        """
+        Sends a separate copy of the message to each recipient. Each copy is its own SMTP transaction, but they share
+        pooled connections so the cost of connecting & authenticating is paid once for the whole recipient list. Raises
+        FanoutPartiallySentException with the recipients already sent to if a copy fails after the first
+        """
+        for index, recipient in enumerate(recipients):
+
+            # pylint: disable=cell-var-from-loop
+            def message_chunks():
+                return stream_message(
+                    sender=sender,
+                    recipients=[recipient],
+                    subject=subject,
+                    message=message,
+                    attachments=attachments,
+                )
+
+            try:
+                self._deliver(
+                    from_addr=sender.get("email"),
+                    to_addrs=[recipient.get("email")],
+                    message_chunks=message_chunks,
+                )
+            # pylint: disable=broad-except
+            except Exception as err:
+                log.error(f"Failed to send email {err}")
+                if index:
+                    raise FanoutPartiallySentException(
+                        recipients[:index],
+                        f"Sending email from {sender} to {recipient} failed after {index} recipients",
+                    ) from err
+                raise ServiceIntegrationException(
+                    f"Sending email from {sender} to {recipient} failed"
+                ) from err
+
+        return dict(
+            success=True,
+            message=f"Message from {sender} successfully sent to {len(recipients)} recipients",
+        )
+
+    def send_batch(
+        self,
+        messages: List[Dict[str, Any]],
+        track: Callable[[], ContextManager] = nullcontext,
+    ) -> List[Exception | None]:
         """
-        Checks connection of SMTP server
+        Sends several messages, each given as the keyword arguments of send_email, one after the other in a single SMTP
+        session, so the connection is checked out once for the whole batch. Returns the error each message failed with,
+        or None for messages that were sent. Messages are not retried here, a connection that failed is replaced for the
+        rest of the batch. Each send is wrapped in a context from track, which is used to record it with a circuit
+        breaker
         """
+        errors: List[Exception | None] = []
+        connection = None
         try:
-            status = self.server.noop()[0]
-        # pylint: disable=broad-except
-        except Exception as err:
-            log.error(f"SMTP Server is disconnected {err}")
-            status = -1
-        return status == 250
+            for message in messages:
+                try:
+                    # a message that cannot be built fails on its own, without counting against the relay
+                    chunks = stream_message(
+                        sender=message["sender"],
+                        recipients=message["recipients"],
+                        subject=message["subject"],
+                        message=message["message"],
+                        ccs=message.get("ccs"),
+                        attachments=message.get("attachments"),
+                    )
+                except HeaderParseError as err:
+                    log.error(f"Failed to build email in batch {err}")
+                    errors.append(err)
+                    continue
+                try:
+                    with track(), get_rate_limiter("smtp").limit():
+                        if connection is None:
+                            connection = self.pool.acquire()
+                        connection.send_stream(
+                            from_addr=message["sender"].get("email"),
+                            to_addrs=envelope_recipients(
+                                message["recipients"],
+                                message.get("ccs"),
+                                message.get("bcc"),
+                            ),
+                            chunks=chunks,
+                        )
+                    errors.append(None)
+                # pylint: disable=broad-except
+                except Exception as err:
+                    log.error(f"Failed to send email in batch {err}")
+                    errors.append(err)
+                    if connection is not None and not _recover(connection, err):
+                        self.pool.release(connection, discard=True)
+                        connection = None
+        finally:
+            if connection is not None:
+                self.pool.release(connection)
+        return errors
+
+    def _deliver(
+        self,
+        from_addr: str,
+        to_addrs: List[str],
+        message_chunks: Callable[[], Iterable[bytes]],
+    ):
+        """
+        Streams a message over a pooled connection. If the relay dropped the connection, the message is produced again
+        and retried once on a connection that has been verified to be alive. Sends are paced by the SMTP rate limiter
+        """
+        with get_rate_limiter("smtp").limit():
+            try:
+                # the message is set up before a connection is borrowed, so a message that cannot be built does not
+                # cost a connection
+                chunks = message_chunks()
+                with self.pool.connection() as connection:
+                    connection.send_stream(
+                        from_addr=from_addr, to_addrs=to_addrs, chunks=chunks
+                    )
+            # pylint: disable=broad-except
+            except Exception as err:
+                if not is_connection_error(err):
+                    raise
+                log.warning(
+                    f"SMTP connection dropped, retrying on a fresh connection {err}"
+                )
+                with self.pool.connection(probe=True) as connection:
+                    connection.send_stream(
+                        from_addr=from_addr, to_addrs=to_addrs, chunks=message_chunks()
+                    )
+
+
+def _recover(connection: SmtpConnection, error: Exception) -> bool:
+    """
+    Resets a connection after the relay rejected a message, so that it can carry on with the next one. Returns False if
+    the connection cannot be trusted anymore, as when a message failed halfway through DATA for another reason
+    """
+    if (
+        not isinstance(
+            error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException)
+        )
+        or not connection.is_open()
+    ):
+        return False
+    try:
+        return connection.client.rset()[0] == 250
+    # pylint: disable=broad-except
+    except Exception:
+        return False
@@ -0,0 +1,10 @@
+"""
+Provider rate limiting services
+"""
+from .backends import (
+    RateLimitBackend,
+    LocalRateLimitBackend,
+    RedisRateLimitBackend,
+)
+from .rate_limiter import RateLimiter, get_rate_limiter
+from .exceptions import RateLimitTimeoutException
@@ -0,0 +1,176 @@
+"""
+Rate limit backends. A backend holds the state of token buckets & concurrency slots where every process sending through
+a provider can see it, so that all of them together stay within the provider's limits
+"""
+import fcntl
+import os
+import struct
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, Hashable, Set
+
+import redis
+
+_bucket_state = struct.Struct("<dd")
+
+# refills the bucket for the time passed since it was last updated, then takes a token if there is one. Returns the
+# number of seconds until a token is available, as a string since Lua numbers are truncated to integers on return
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+# concurrency slots are members of a sorted set scored by their expiry, so slots held by crashed processes lapse
+_LEASE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local ttl = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now + ttl, ARGV[2])
+redis.call('EXPIRE', KEYS[1], math.ceil(ttl))
+return 1
+"""
+
+
+class RateLimitBackend(ABC):
+    """
+    Shared state of rate limiters
+    """
+
+    @abstractmethod
+    def take(self, name: str, rate: float, burst: int) -> float:
+        """
+        Takes a token from the named bucket, which refills at rate tokens per second up to burst tokens. Returns 0 if a
+        token was taken, otherwise the number of seconds until one is available
+        """
+        raise NotImplementedError("take not yet implemented")
+
+    @abstractmethod
+    def lease(self, name: str, limit: int, ttl: float) -> Hashable | None:
+        """
+        Leases one of limit named concurrency slots for at most ttl seconds. Returns the lease, or None if all slots are
+        taken
+        """
+        raise NotImplementedError("lease not yet implemented")
+
+    @abstractmethod
+    def release(self, name: str, lease: Hashable):
+        """
+        Releases a concurrency slot
+        """
+        raise NotImplementedError("release not yet implemented")
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Keeps rate limits in Redis, coordinating processes across hosts. Buckets & slots are updated atomically by Lua
+    scripts, timed by the Redis server clock so that clock skew between hosts does not matter
+    """
+
+    def __init__(self, url: str, prefix: str = "barua-pepe:ratelimit"):
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._take = self.client.register_script(_TAKE_SCRIPT)
+        self._lease = self.client.register_script(_LEASE_SCRIPT)
+
+    def take(self, name: str, rate: float, burst: int) -> float:
+        return float(
+            self._take(keys=[f"{self.prefix}:{name}:bucket"], args=[rate, burst])
+        )
+
+    def lease(self, name: str, limit: int, ttl: float) -> Hashable | None:
+        lease = uuid.uuid4().hex
+        leased = self._lease(
+            keys=[f"{self.prefix}:{name}:slots"], args=[limit, lease, ttl]
+        )
+        return lease if leased else None
+
+    def release(self, name: str, lease: Hashable):
+        self.client.zrem(f"{self.prefix}:{name}:slots", lease)
+
+
+class LocalRateLimitBackend(RateLimitBackend):
+    """
+    Keeps rate limits in files, coordinating the processes of a single host. Buckets are read & updated under an
+    exclusive file lock, and each concurrency slot is a byte range lock on a slots file, which the kernel releases when
+    the process holding it exits
+    """
+
+    def __init__(self, path: str):
+        self.root = path
+        os.makedirs(self.root, exist_ok=True)
+        self._files: Dict[str, int] = {}
+        self._held: Dict[str, Set[int]] = {}
+        # file locks are held by a process, so the threads of a process are serialised here
+        self._lock = threading.Lock()
+
+    def take(self, name: str, rate: float, burst: int) -> float:
+        with self._lock:
+            descriptor = self._open(f"{name}.bucket")
+            fcntl.flock(descriptor, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                state = os.pread(descriptor, _bucket_state.size, 0)
+                if len(state) == _bucket_state.size:
+                    tokens, updated = _bucket_state.unpack(state)
+                else:
+                    tokens, updated = burst, now
+
+                tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+                wait = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / rate
+                os.pwrite(descriptor, _bucket_state.pack(tokens, now), 0)
+                return wait
+            finally:
+                fcntl.flock(descriptor, fcntl.LOCK_UN)
+
+    def lease(self, name: str, limit: int, ttl: float) -> Hashable | None:
+        with self._lock:
+            descriptor = self._open(f"{name}.slots")
+            held = self._held.setdefault(name, set())
+            for slot in range(limit):
+                if slot in held:
+                    continue
+                try:
+                    fcntl.lockf(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, slot)
+                except OSError:
+                    continue
+                held.add(slot)
+                return slot
+            return None
+
+    def release(self, name: str, lease: Hashable):
+        with self._lock:
+            fcntl.lockf(self._open(f"{name}.slots"), fcntl.LOCK_UN, 1, lease)
+            self._held[name].discard(lease)
+
+    def _open(self, filename: str) -> int:
+        # descriptors stay open, closing any descriptor of a file drops every lock this process holds on it
+        if filename not in self._files:
+            self._files[filename] = os.open(
+                os.path.join(self.root, filename), os.O_RDWR | os.O_CREAT, 0o600
+            )
+        return self._files[filename]
@@ -0,0 +1,11 @@
+"""
+Exceptions for Rate Limiting Services
+"""
+from app.exceptions import AppException
+
+
+class RateLimitTimeoutException(AppException):
+    """Exception raised when a send could not get within a provider's rate limits in time"""
+
+    def __init__(self, message=None):
+        super().__init__(message or "Timed out waiting for the provider rate limit")
@@ -0,0 +1,133 @@
+"""
+Rate limiter. Paces sends to a provider so that all workers together stay within its request rate & concurrent
+connection limits, instead of hammering it & backing off once it starts throttling
+"""
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Hashable, Iterator
+
+from app.config import get_config
+from app.logger import log
+from .backends import LocalRateLimitBackend, RateLimitBackend, RedisRateLimitBackend
+from .exceptions import RateLimitTimeoutException
+
+# seconds between attempts to get a concurrency slot
+LEASE_POLL_INTERVAL = 0.05
+
+
+# pylint: disable=too-many-instance-attributes
+class RateLimiter:
+    """
+    Token bucket rate limiter with a cap on concurrent sends.
+
+    Sends are allowed at rate per second on average, with up to burst sends at once after a quiet period, and at most
+    max_concurrency sends in flight. A rate or max_concurrency of 0 disables that limit. Limits are shared through the
+    backend. Should the backend be unreachable the limiter lets sends through rather than stopping all mail
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        name: str,
+        backend: RateLimitBackend,
+        rate: float = 0,
+        burst: int = 1,
+        max_concurrency: int = 0,
+        timeout: float = 30.0,
+        lease_ttl: float = 300.0,
+    ):
+        self.name = name
+        self.backend = backend
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.lease_ttl = lease_ttl
+
+    @contextmanager
+    def limit(self) -> Iterator[None]:
+        """
+        Context manager that waits until a send is within the limits & holds a concurrency slot while the send is in
+        flight. Raises RateLimitTimeoutException if that takes longer than timeout seconds
+        """
+        deadline = time.monotonic() + self.timeout
+        self._wait_for_token(deadline)
+        lease = self._wait_for_slot(deadline)
+        try:
+            yield
+        finally:
+            if lease is not None:
+                self._release(lease)
+
+    def _wait_for_token(self, deadline: float):
+        if self.rate <= 0:
+            return
+
+        while True:
+            try:
+                wait = self.backend.take(self.name, self.rate, self.burst)
+            # pylint: disable=broad-except
+            except Exception as err:
+                log.warning(f"Rate limiter {self.name} is unavailable {err}")
+                return
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimitTimeoutException(
+                    f"Timed out waiting for the {self.name} rate limit"
+                )
+            time.sleep(wait)
+
+    def _wait_for_slot(self, deadline: float) -> Hashable | None:
+        if self.max_concurrency <= 0:
+            return None
+
+        while True:
+            try:
+                lease = self.backend.lease(
+                    self.name, self.max_concurrency, self.lease_ttl
+                )
+            # pylint: disable=broad-except
+            except Exception as err:
+                log.warning(f"Rate limiter {self.name} is unavailable {err}")
+                return None
+            if lease is not None:
+                return lease
+            if time.monotonic() + LEASE_POLL_INTERVAL > deadline:
+                raise RateLimitTimeoutException(
+                    f"Timed out waiting for a {self.name} connection slot"
+                )
+            time.sleep(LEASE_POLL_INTERVAL)
+
+    def _release(self, lease: Hashable):
+        try:
+            self.backend.release(self.name, lease)
+        # pylint: disable=broad-except
+        except Exception as err:
+            log.warning(f"Failed to release {self.name} connection slot {err}")
+
+
+@lru_cache()
+def _get_backend() -> RateLimitBackend:
+    config = get_config()
+    if config.rate_limit_redis_url:
+        return RedisRateLimitBackend(config.rate_limit_redis_url)
+    return LocalRateLimitBackend(config.rate_limit_path)
+
+
+@lru_cache()
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """
+    Gets the rate limiter of a provider, one of smtp, sendgrid or mailchimp, configured from its settings
+    """
+    config = get_config()
+    return RateLimiter(
+        name=provider,
+        backend=_get_backend(),
+        rate=getattr(config, f"{provider}_rate_limit"),
+        burst=getattr(config, f"{provider}_rate_burst"),
+        max_concurrency=getattr(config, f"{provider}_max_concurrency"),
+        timeout=config.rate_limit_timeout,
+        lease_ttl=config.rate_limit_lease_ttl,
+    )
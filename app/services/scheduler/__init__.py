@@ -0,0 +1,9 @@
+"""
+Scheduled send services
+"""
+from .backends import (
+    ScheduleBackend,
+    LocalScheduleBackend,
+    RedisScheduleBackend,
+)
+from .send_scheduler import SendScheduler, get_send_scheduler
@@ -0,0 +1,180 @@
+"""
+Schedule backends. A backend holds scheduled sends indexed by the time they are due, outside of the broker, so that
+pending sends cost neither broker nor worker memory however many of them there are
+"""
+import os
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+
+import redis
+
+# claims up to ARGV[2] of the sends due by ARGV[1] in one step by pushing them back to ARGV[3], so concurrent releases
+# never take the same send twice. Returns the ids & payloads of the claimed sends, one after the other
+_CLAIM_DUE_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+if #ids == 0 then
+    return {}
+end
+local payloads = redis.call('HMGET', KEYS[2], unpack(ids))
+local claimed = {}
+for index, id in ipairs(ids) do
+    redis.call('ZADD', KEYS[1], 'XX', ARGV[3], id)
+    table.insert(claimed, id)
+    table.insert(claimed, payloads[index])
+end
+return claimed
+"""
+
+# a scheduled send, the timestamp it is due at & its payload
+ScheduledSend = Tuple[float, str]
+# a claimed send, its id & its payload
+ClaimedSend = Tuple[str, str]
+
+
+class ScheduleBackend(ABC):
+    """
+    Time index of scheduled sends
+    """
+
+    @abstractmethod
+    def add(self, sends: List[ScheduledSend]):
+        """
+        Adds sends to the schedule
+        """
+        raise NotImplementedError("add not yet implemented")
+
+    @abstractmethod
+    def claim_due(self, now: float, limit: int, lease: float) -> List[ClaimedSend]:
+        """
+        Claims at most limit of the sends due by now, earliest first, by making them due again lease seconds later.
+        Claimed sends stay on the schedule until they are removed, so sends whose release failed come due again
+        """
+        raise NotImplementedError("claim_due not yet implemented")
+
+    @abstractmethod
+    def remove(self, ids: List[str]):
+        """
+        Takes claimed sends off the schedule
+        """
+        raise NotImplementedError("remove not yet implemented")
+
+    @abstractmethod
+    def size(self) -> int:
+        """
+        Number of scheduled sends
+        """
+        raise NotImplementedError("size not yet implemented")
+
+
+class RedisScheduleBackend(ScheduleBackend):
+    """
+    Keeps scheduled sends in Redis, in a sorted set of ids scored by due time next to a hash of payloads
+    """
+
+    def __init__(self, url: str, prefix: str = "barua-pepe:schedule"):
+        self.client = redis.Redis.from_url(url)
+        self.index = f"{prefix}:index"
+        self.payloads = f"{prefix}:payloads"
+        self._claim_due = self.client.register_script(_CLAIM_DUE_SCRIPT)
+
+    def add(self, sends: List[ScheduledSend]):
+        ids = [uuid.uuid4().hex for _ in sends]
+        with self.client.pipeline(transaction=True) as pipeline:
+            pipeline.hset(
+                self.payloads,
+                mapping={id_: payload for id_, (_, payload) in zip(ids, sends)},
+            )
+            pipeline.zadd(self.index, {id_: due for id_, (due, _) in zip(ids, sends)})
+            pipeline.execute()
+
+    def claim_due(self, now: float, limit: int, lease: float) -> List[ClaimedSend]:
+        claimed = self._claim_due(
+            keys=[self.index, self.payloads], args=[now, limit, now + lease]
+        )
+        return [
+            (id_.decode("utf-8"), payload.decode("utf-8"))
+            for id_, payload in zip(claimed[::2], claimed[1::2])
+            if payload is not None
+        ]
+
+    def remove(self, ids: List[str]):
+        if not ids:
+            return
+        with self.client.pipeline(transaction=True) as pipeline:
+            pipeline.zrem(self.index, *ids)
+            pipeline.hdel(self.payloads, *ids)
+            pipeline.execute()
+
+    def size(self) -> int:
+        return self.client.zcard(self.index)
+
+
+class LocalScheduleBackend(ScheduleBackend):
+    """
+    Keeps scheduled sends in a SQLite database indexed by due time, shared by the processes of a single host. Releases
+    claim sends under a write lock on the database, so concurrent releases never take the same send twice
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS scheduled_sends "
+                "(id INTEGER PRIMARY KEY, due REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS scheduled_sends_due ON scheduled_sends (due)"
+            )
+
+    def add(self, sends: List[ScheduledSend]):
+        with self._connection() as connection:
+            connection.executemany(
+                "INSERT INTO scheduled_sends (due, payload) VALUES (?, ?)", sends
+            )
+
+    def claim_due(self, now: float, limit: int, lease: float) -> List[ClaimedSend]:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                "SELECT id, payload FROM scheduled_sends WHERE due <= ? ORDER BY due LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE scheduled_sends SET due = ? WHERE id = ?",
+                [(now + lease, id_) for id_, _ in rows],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return [(str(id_), payload) for id_, payload in rows]
+
+    def remove(self, ids: List[str]):
+        with self._connection() as connection:
+            connection.executemany(
+                "DELETE FROM scheduled_sends WHERE id = ?", [(int(id_),) for id_ in ids]
+            )
+
+    def size(self) -> int:
+        return (
+            self._connection()
+            .execute("SELECT COUNT(*) FROM scheduled_sends")
+            .fetchone()[0]
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite connections must not be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
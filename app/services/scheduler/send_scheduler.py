@@ -0,0 +1,83 @@
+"""
+Send scheduler. Parks emails that are to be sent at a later time & releases them to the mail sending task in batches as
+they come due. Celery ETA tasks are not used as they are held in worker memory until they are due
+"""
+import json
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, List
+
+from app.config import get_config
+from app.domain.entities import EmailRequest
+from app.logger import log
+from .backends import LocalScheduleBackend, RedisScheduleBackend, ScheduleBackend
+
+
+class SendScheduler:
+    """
+    Schedules sends in a backend indexed by due time. Releasing sends claims them batch_size at a time & only takes them
+    off the schedule once they are published, so sends are published at least once: a batch that fails to publish, or
+    whose release was cut short, comes due again lease seconds after it was claimed, which may send the messages of the
+    batch published before the failure twice
+    """
+
+    def __init__(
+        self, backend: ScheduleBackend, batch_size: int = 1000, lease: float = 300
+    ):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.lease = lease
+
+    def schedule(self, email_requests: List[EmailRequest]):
+        """
+        Schedules emails to be sent at their send_at time
+        """
+        self.backend.add(
+            [
+                (email_request.send_at.timestamp(), email_request.json())
+                for email_request in email_requests
+            ]
+        )
+
+    def release_due(
+        self,
+        publish: Callable[[List[Dict[str, Any]]], None],
+        now: float | None = None,
+    ) -> int:
+        """
+        Publishes the sends that are due, a batch at a time. Returns the number of sends released
+        """
+        now = now or time.time()
+        released = 0
+        while True:
+            claimed = self.backend.claim_due(now, self.batch_size, self.lease)
+            if not claimed:
+                return released
+
+            batch = [json.loads(payload) for _, payload in claimed]
+            try:
+                publish(batch)
+            except Exception:
+                log.error(
+                    f"Failed to release {len(batch)} scheduled sends, they are retried in {self.lease} seconds"
+                )
+                raise
+            self.backend.remove([id_ for id_, _ in claimed])
+            released += len(batch)
+            if len(claimed) < self.batch_size:
+                return released
+
+
+@lru_cache()
+def get_send_scheduler() -> SendScheduler:
+    """
+    Gets the send scheduler, configured from the schedule settings
+    """
+    config = get_config()
+    if config.schedule_redis_url:
+        backend = RedisScheduleBackend(config.schedule_redis_url)
+    else:
+        backend = LocalScheduleBackend(config.schedule_path)
+    return SendScheduler(
+        backend, batch_size=config.schedule_batch_size, lease=config.schedule_lease
+    )
@@ -0,0 +1,7 @@
+"""
+Suppression services
+"""
+from .suppression_store import SuppressionStore
+from .suppression_list import SuppressionList, get_suppression_list
+from .bloom_filter import BloomFilter
+from .exceptions import SuppressionNotFoundException
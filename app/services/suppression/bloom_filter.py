@@ -0,0 +1,50 @@
+"""
+Bloom filter. A compact set membership test that may report an item it was never given, at a rate chosen when it is
+built, but never misses an item it was given
+"""
+import hashlib
+import math
+import struct
+
+# each bit position is taken from 4 bytes of a single blake2b digest, which is at most 64 bytes long
+MAX_HASHES = 16
+
+
+class BloomFilter:
+    """
+    Bloom filter sized to hold capacity items at the given false positive rate. Items can only be added, the rate
+    degrades once more than capacity items were added
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.size = max(
+            8,
+            math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2),
+        )
+        self.hashes = min(MAX_HASHES, max(1, round(self.size / capacity * math.log(2))))
+        self._bits = bytearray((self.size + 7) // 8)
+        self._unpack = struct.Struct(f"<{self.hashes}I").unpack
+
+    def add(self, item: str):
+        """
+        Adds an item
+        """
+        bits = self._bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(
+            item.encode("utf-8"), digest_size=4 * self.hashes
+        ).digest()
+        size = self.size
+        return (value % size for value in self._unpack(digest))
@@ -0,0 +1,11 @@
+"""
+Exceptions for Suppression Services
+"""
+from app.exceptions import AppException
+
+
+class SuppressionNotFoundException(AppException):
+    """Exception raised when an address is not on the suppression list"""
+
+    def __init__(self, message=None):
+        super().__init__(message or "Address is not suppressed")
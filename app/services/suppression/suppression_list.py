@@ -0,0 +1,127 @@
+"""
+Suppression list. Every process keeps a Bloom filter of the suppressed addresses in front of the suppression store, so
+the recipients of a request are checked in memory & only the few the filter reports are looked up in the store. The
+filter catches up on the changes made by other processes every suppression_refresh_interval seconds
+"""
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from app.config import get_config
+from app.logger import log
+from .bloom_filter import BloomFilter
+from .exceptions import SuppressionNotFoundException
+from .suppression_store import SuppressionStore, normalize
+
+
+class SuppressionList:
+    """
+    Suppression list of a process.
+
+    The filter only ever reports too many addresses, never too few, so every address it reports is confirmed against
+    the store. This also covers addresses whose suppression was lifted, which stay in the filter until it is rebuilt
+    """
+
+    def __init__(
+        self,
+        store: SuppressionStore,
+        refresh_interval: float = get_config().suppression_refresh_interval,
+        capacity: int = get_config().suppression_capacity,
+        false_positive_rate: float = get_config().suppression_false_positive_rate,
+    ):
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self.false_positive_rate = false_positive_rate
+        self._capacity = capacity
+        self._lock = threading.Lock()
+        self._filter = BloomFilter(capacity, false_positive_rate)
+        self._count = 0
+        self._version = 0
+        self._refreshed = 0.0
+
+    def suppressed(self, emails: Iterable[str]) -> Set[str]:
+        """
+        Returns the normalized addresses out of emails that are suppressed. Addresses are let through if the store
+        can not be read, a failing store must not stop emails from being sent
+        """
+        try:
+            self._refresh()
+            bloom_filter = self._filter
+            candidates = [
+                key
+                for key in {normalize(email) for email in emails}
+                if key in bloom_filter
+            ]
+            if not candidates:
+                return set()
+            return self.store.suppressed(candidates)
+        except Exception as exc:  # pylint: disable=broad-except
+            log.error(f"Failed to check the suppression list, {exc}")
+            return set()
+
+    def add(self, entries: Iterable[Tuple[str, str]]) -> int:
+        """
+        Suppresses addresses, given with their reasons. Returns the number of addresses suppressed
+        """
+        added = self.store.add(entries)
+        self._refresh(force=True)
+        return added
+
+    def remove(self, email: str):
+        """
+        Lifts the suppression of an address
+        """
+        if not self.store.remove(email):
+            raise SuppressionNotFoundException(f"{email} is not suppressed")
+
+    def get(self, email: str) -> Dict[str, Any]:
+        """
+        Gets the suppression of an address
+        """
+        suppression = self.store.get(email)
+        if suppression is None:
+            raise SuppressionNotFoundException(f"{email} is not suppressed")
+        return suppression
+
+    def _refresh(self, force: bool = False):
+        if not force and time.monotonic() - self._refreshed < self.refresh_interval:
+            return
+        with self._lock:
+            if not force and time.monotonic() - self._refreshed < self.refresh_interval:
+                return
+            changes = self.store.changes(self._version)
+            additions = [email for email, suppressed, _ in changes if suppressed]
+            if self._count + len(additions) > self._capacity:
+                self._rebuild(self._count + len(additions))
+            else:
+                for email in additions:
+                    self._filter.add(email)
+                self._count += len(additions)
+                if changes:
+                    self._version = changes[-1][2]
+            self._refreshed = time.monotonic()
+
+    def _rebuild(self, needed: int):
+        # lifted suppressions are left out of the new filter, which is swapped in whole for readers not holding the lock
+        while self._capacity < needed:
+            self._capacity *= 2
+        changes = self.store.changes(0)
+        bloom_filter = BloomFilter(self._capacity, self.false_positive_rate)
+        suppressed: List[str] = [email for email, flag, _ in changes if flag]
+        for email in suppressed:
+            bloom_filter.add(email)
+        log.info(
+            f"Rebuilt the suppression filter with {len(suppressed)} addresses & room for {self._capacity}"
+        )
+        self._filter = bloom_filter
+        self._count = len(suppressed)
+        self._version = changes[-1][2] if changes else 0
+
+
+@lru_cache()
+def get_suppression_list() -> SuppressionList:
+    """
+    Gets the suppression list
+    """
+    return SuppressionList(SuppressionStore(get_config().suppression_path))
@@ -0,0 +1,149 @@
+"""
+Suppression store. Keeps the suppression list in a SQLite database shared by the API & worker processes of a host.
+Every change to the list is numbered, so processes keeping an index of the list catch up on the changes since they last
+looked rather than reading the whole list again
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+# SQLite refuses statements with more parameters than this
+_MAX_PARAMETERS = 500
+
+# an address, whether it is suppressed & the number of the change
+Change = Tuple[str, bool, int]
+
+
+def normalize(address: str) -> str:
+    """
+    Normalizes an address for lookups, addresses are suppressed regardless of case
+    """
+    return address.strip().lower()
+
+
+class SuppressionStore:
+    """
+    Suppressed addresses & their reasons in a SQLite database. Removed addresses are kept with a flag, so that the
+    removal is a change other processes can pick up
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS suppressions (email TEXT PRIMARY KEY, reason TEXT NOT NULL, "
+                "created REAL NOT NULL, suppressed INTEGER NOT NULL, version INTEGER NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS suppressions_version ON suppressions (version)"
+            )
+
+    def add(self, entries: Iterable[Tuple[str, str]]) -> int:
+        """
+        Suppresses addresses, given with their reasons. Returns the number of addresses given
+        """
+        rows = [(normalize(email), reason) for email, reason in entries]
+        if not rows:
+            return 0
+        now = time.time()
+        self._change(
+            lambda connection, version: connection.executemany(
+                "INSERT INTO suppressions (email, reason, created, suppressed, version) VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT (email) DO UPDATE SET reason = excluded.reason, suppressed = 1, "
+                "version = excluded.version, "
+                "created = CASE WHEN suppressed THEN created ELSE excluded.created END",
+                [
+                    (email, reason, now, version + index)
+                    for index, (email, reason) in enumerate(rows, start=1)
+                ],
+            ),
+        )
+        return len(rows)
+
+    def remove(self, email: str) -> bool:
+        """
+        Lifts the suppression of an address. Returns False if the address was not suppressed
+        """
+        cursor = self._change(
+            lambda connection, version: connection.execute(
+                "UPDATE suppressions SET suppressed = 0, version = ? WHERE email = ? AND suppressed",
+                (version + 1, normalize(email)),
+            ),
+        )
+        return cursor.rowcount > 0
+
+    def get(self, email: str) -> Dict[str, Any] | None:
+        """
+        Gets the suppression of an address, None if the address is not suppressed
+        """
+        row = (
+            self._connection()
+            .execute(
+                "SELECT email, reason, created FROM suppressions WHERE email = ? AND suppressed",
+                (normalize(email),),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        return dict(email=row[0], reason=row[1], created=row[2])
+
+    def suppressed(self, emails: List[str]) -> Set[str]:
+        """
+        Returns the normalized addresses out of emails that are suppressed
+        """
+        found = set()
+        keys = sorted({normalize(email) for email in emails})
+        for start in range(0, len(keys), _MAX_PARAMETERS):
+            chunk = keys[start : start + _MAX_PARAMETERS]
+            found.update(
+                row[0]
+                for row in self._connection().execute(
+                    "SELECT email FROM suppressions WHERE suppressed AND email IN "
+                    f"({', '.join('?' * len(chunk))})",
+                    chunk,
+                )
+            )
+        return found
+
+    def changes(self, since: int) -> List[Change]:
+        """
+        Lists the changes made after change since, oldest first
+        """
+        return [
+            (email, bool(suppressed), version)
+            for email, suppressed, version in self._connection().execute(
+                "SELECT email, suppressed, version FROM suppressions WHERE version > ? ORDER BY version",
+                (since,),
+            )
+        ]
+
+    def _change(self, apply) -> sqlite3.Cursor:
+        # changes are numbered under a write lock, so concurrent writers never hand out the same numbers
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            version = connection.execute(
+                "SELECT COALESCE(MAX(version), 0) FROM suppressions"
+            ).fetchone()[0]
+            cursor = apply(connection, version)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return cursor
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite connections must not be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
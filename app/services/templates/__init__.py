@@ -0,0 +1,10 @@
+"""
+Template services
+"""
+from .template_store import TemplateStore, get_template_store
+from .template_engine import TemplateEngine, get_template_engine, render_request
+from .exceptions import (
+    TemplateInvalidException,
+    TemplateNotFoundException,
+    TemplateRenderingException,
+)
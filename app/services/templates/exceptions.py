@@ -0,0 +1,25 @@
+"""
+Exceptions for Template Services
+"""
+from app.exceptions import AppException
+
+
+class TemplateNotFoundException(AppException):
+    """Exception raised when a referenced template is not in the template store"""
+
+    def __init__(self, message=None):
+        super().__init__(message or "Template not found")
+
+
+class TemplateInvalidException(AppException):
+    """Exception raised when a template does not compile"""
+
+    def __init__(self, message=None):
+        super().__init__(message or "Template is invalid")
+
+
+class TemplateRenderingException(AppException):
+    """Exception raised when a template fails to render, for example because a variable is missing"""
+
+    def __init__(self, message=None):
+        super().__init__(message or "Failed to render template")
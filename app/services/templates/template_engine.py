@@ -0,0 +1,109 @@
+"""
+Template engine. Renders stored templates with Jinja2 at the worker, right before the message is built, so an email
+only carries the id of its template & its variables through the API & the queue
+"""
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from jinja2 import StrictUndefined, Template, TemplateError
+from jinja2.sandbox import SandboxedEnvironment
+
+from app.config import get_config
+from app.utils import is_html
+from .exceptions import TemplateInvalidException, TemplateRenderingException
+from .template_store import TemplateStore, get_template_store
+
+
+class CompiledTemplate(NamedTuple):
+    """
+    Compiled subject & message of a template
+    """
+
+    subject: Template
+    message: Template
+
+
+class TemplateEngine:
+    """
+    Compiles templates once & keeps the cache_size most recently used compiled templates. Templates are registered by
+    API clients, so they are rendered in a sandbox, and messages that are HTML documents have variables escaped.
+    Variables a template uses must be given, rendering fails rather than sending an email with blanks in it
+    """
+
+    def __init__(self, store: TemplateStore, cache_size: int = 256):
+        self.store = store
+        self._text = SandboxedEnvironment(undefined=StrictUndefined, autoescape=False)
+        self._html = SandboxedEnvironment(undefined=StrictUndefined, autoescape=True)
+        self._compiled = lru_cache(maxsize=cache_size)(self._compile)
+
+    def check(self, subject: str, message: str):
+        """
+        Checks that a template compiles
+        """
+        self._compile_source(subject, message)
+
+    def render(self, template_id: str, variables: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Renders the subject & message of a template
+        """
+        template = self._compiled(template_id)
+        try:
+            return template.subject.render(variables), template.message.render(
+                variables
+            )
+        except TemplateError as err:
+            raise TemplateRenderingException(
+                f"Failed to render template {template_id}: {err}"
+            ) from err
+
+    def _compile(self, template_id: str) -> CompiledTemplate:
+        template = self.store.get(template_id)
+        return self._compile_source(template["subject"], template["message"])
+
+    def _compile_source(self, subject: str, message: str) -> CompiledTemplate:
+        environment = self._html if is_html(message) else self._text
+        try:
+            return CompiledTemplate(
+                subject=self._text.from_string(subject),
+                message=environment.from_string(message),
+            )
+        except TemplateError as err:
+            raise TemplateInvalidException(f"Template is invalid: {err}") from err
+
+
+@lru_cache()
+def get_template_engine() -> TemplateEngine:
+    """
+    Gets the template engine, configured from the template settings
+    """
+    return TemplateEngine(get_template_store(), get_config().template_cache_size)
+
+
+def render_request(
+    request: Dict[str, Any], engine: TemplateEngine | None = None
+) -> List[Dict[str, Any]]:
+    """
+    Renders the template of an email request into its subject & message. Recipients with variables of their own are
+    rendered one by one, and recipients whose emails render the same are kept together in a single fan-out message
+    """
+    template_id = request.get("template_id")
+    if not template_id:
+        return [request]
+
+    engine = engine or get_template_engine()
+    variables = request.get("variables") or {}
+    recipients = request.get("recipients")
+    if not any(recipient.get("variables") for recipient in recipients):
+        subject, message = engine.render(template_id, variables)
+        return [dict(request, subject=subject, message=message)]
+
+    rendered: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for recipient in recipients:
+        content = engine.render(
+            template_id, {**variables, **(recipient.get("variables") or {})}
+        )
+        rendered.setdefault(content, []).append(recipient)
+    return [
+        dict(request, subject=subject, message=message, recipients=recipients)
+        for (subject, message), recipients in rendered.items()
+    ]
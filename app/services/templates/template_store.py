@@ -0,0 +1,92 @@
+"""
+Template store. Templates are registered once & only their id travels with each email, so neither the API nor the
+queue carry the same body over & over for a campaign. The directory must be shared between the API & the workers, for
+example through a mounted volume
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+from functools import lru_cache
+from typing import Dict
+
+from app.config import get_config
+from .exceptions import TemplateNotFoundException
+
+_id_pattern = re.compile(r"[0-9a-f]{64}")
+
+
+class TemplateStore:
+    """
+    Content addressed template store on the local filesystem.
+
+    Templates are keyed by the SHA-256 digest of their subject & message, so registering the same template again returns
+    the same id & a template never changes under its id, which lets workers cache compiled templates without ever
+    invalidating them
+    """
+
+    def __init__(self, path: str = get_config().template_store_path):
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def put(self, subject: str, message: str) -> str:
+        """
+        Stores a template & returns its id
+        """
+        contents = json.dumps(dict(subject=subject, message=message), sort_keys=True)
+        template_id = hashlib.sha256(contents.encode("utf-8")).hexdigest()
+        path = self._path_of(template_id)
+        if os.path.exists(path):
+            return template_id
+
+        descriptor, partial = tempfile.mkstemp(dir=self.path, suffix=".part")
+        with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+            file.write(contents)
+        os.replace(partial, path)
+        return template_id
+
+    def get(self, template_id: str) -> Dict[str, str]:
+        """
+        Reads the subject & message of a template
+        """
+        try:
+            with open(self._path_of(template_id), encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError as err:
+            raise TemplateNotFoundException(
+                f"Template {template_id} not found"
+            ) from err
+
+    def exists(self, template_id: str) -> bool:
+        """
+        Whether a template is in the store
+        """
+        try:
+            return os.path.exists(self._path_of(template_id))
+        except TemplateNotFoundException:
+            return False
+
+    def delete(self, template_id: str):
+        """
+        Removes a template. Workers may still render it from their cache for emails that were queued before
+        """
+        try:
+            os.remove(self._path_of(template_id))
+        except FileNotFoundError as err:
+            raise TemplateNotFoundException(
+                f"Template {template_id} not found"
+            ) from err
+
+    def _path_of(self, template_id: str) -> str:
+        if not _id_pattern.fullmatch(template_id or ""):
+            raise TemplateNotFoundException(f"Invalid template id {template_id}")
+        return os.path.join(self.path, f"{template_id}.json")
+
+
+@lru_cache()
+def get_template_store() -> TemplateStore:
+    """
+    Gets the template store
+    """
+    return TemplateStore()
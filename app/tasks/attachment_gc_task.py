@@ -0,0 +1,16 @@
+"""
+Attachment garbage collection task
+"""
+from app.worker.celery_app import celery_app
+from app.logger import log
+from app.services.attachments import get_attachment_store
+
+
+@celery_app.task(name="attachment_gc_task", ignore_result=True)
+@log.catch
+def attachment_gc_task():
+    """
+    Periodic task that removes attachments that have outlived the attachment store ttl
+    """
+    removed = get_attachment_store().collect_garbage()
+    log.info(f"Removed {removed} expired attachments")
@@ -1,10 +1,11 @@
 """
 Mail Analytics tasks can be found here
 """
+from typing import List
 from app.worker.celery_app import celery_app
 from app.logger import log
-from app.services.mail import send_plain_mail
-from app.domain.entities import EmailRequest
+from app.services.analytics import get_analytics_store
+from app.services.analytics.time_series import Row
 
 
 @celery_app.task(
@@ -13,19 +14,20 @@ from app.domain.entities import EmailRequest
     max_retries=3,
     name="mail_analytics_task",
     acks_late=True,
+    ignore_result=True,
 )
 @log.catch
-def mail_analytics_task(self, data: EmailRequest):
+def mail_analytics_task(self, counts: List[Row]):
     """
-    Task that handles analytics for email messages in the background. Whether there was a failed delivery, it's tracked
-    here.
+    Task that adds the per minute counts of sent, failed & bounced emails a worker process drained from its minute
+    series to the analytics store, in a single write
     """
-
     try:
-        return send_plain_mail(**data)
+        get_analytics_store().add(counts)
     # pylint: disable=broad-except
     except Exception as exc:
         log.error(
-            f"[AnalyticsTask]: Error sending email with error {exc}. Attempt {self.request.retries}/{self.max_retries}"
+            f"[AnalyticsTask]: Error storing {len(counts)} counts with error {exc}. "
+            f"Attempt {self.request.retries}/{self.max_retries}"
         )
         raise self.retry(countdown=30 * 2, exc=exc, max_retries=3)
@@ -2,8 +2,11 @@
 Error Tasks
 """
 import os
+from typing import List
 from app.worker.celery_app import celery_app
 from app.domain.entities import EmailRequest
+from app.domain.record_events import record_events
+from app.services.events import MailEvent
 from app.logger import log
 
 broker_host = os.environ.get("BROKER_HOST")
@@ -29,16 +32,28 @@ def mail_error_task(
     """
     Mail Error Task. This handles tasks that have failed to deliver messages
     """
-    log.info(f"Received Data={data}")
+    log.bind(email=data).info("Received failed email")
 
 
 @celery_app.task(
-    bind=True, default_retry_delay=30, max_retries=2, name="mail_error_callback_task"
+    bind=True,
+    default_retry_delay=30,
+    max_retries=3,
+    name="mail_error_callback_task",
+    acks_late=True,
+    ignore_result=True,
 )
 @log.catch
-# pylint: disable=unused-argument
-def mail_error_callback_task(self):
+def mail_error_callback_task(self, events: List[MailEvent]):
     """
-    This handles even callbacks for emails as received from SMTP or email provider. In the event there was a failure in
-    sending out an email address
+    Handles a batch of delivery events posted by an email provider to the event webhook. Bounces, spam complaints &
+    unsubscribes suppress the address & every event is added to the summary of its message
     """
+    try:
+        record_events(events)
+    # pylint: disable=broad-except
+    except Exception as exc:
+        log.error(
+            f"Error recording {len(events)} events with error {exc}. Attempt {self.request.retries}/{self.max_retries}"
+        )
+        raise self.retry(countdown=30 * 2, exc=exc)
@@ -3,7 +3,8 @@ Mail sending tasks can be found here
 """
 from app.worker.celery_app import celery_app
 from app.logger import log
-from app.services.mail import send_plain_mail
+from app.services.mail import send_plain_mail, unsent_request
+from app.services.analytics import get_minute_series
 from app.domain.entities import EmailRequest
 from .mail_error_task import mail_error_task
 
@@ -18,18 +19,27 @@ from .mail_error_task import mail_error_task
 @log.catch
 def mail_sending_task(self, data: EmailRequest):
     """
-    Worker task that handles sending email messages in the background
+    Worker task that handles sending email messages in the background. The outcome is counted in the sender's
+    analytics once the email was sent or every attempt failed. Retries leave out the fan-out recipients that were
+    already sent to
     """
+    sender = data["sender"]["email"].lower()
     try:
-        return send_plain_mail(data)
+        result = send_plain_mail(data)
+        get_minute_series().record("sender", sender, "sent")
+        return result
     # pylint: disable=broad-except
     except Exception as exc:
         log.error(
             f"Error sending email with error {exc}. Attempt {self.request.retries}/{self.max_retries} ..."
         )
+        data = unsent_request(data, exc)
 
         if self.request.retries == self.max_retries:
             log.warning("Maximum attempts reached, pushing to dlt queue...")
-            mail_error_task.apply_async(kwargs=dict(data=data.dict()))
+            get_minute_series().record("sender", sender, "failed")
+            mail_error_task.apply_async(kwargs=dict(data=data))
 
-        raise self.retry(countdown=30 * 2, exc=exc, max_retries=3)
+        raise self.retry(
+            kwargs=dict(data=data), countdown=30 * 2, exc=exc, max_retries=3
+        )
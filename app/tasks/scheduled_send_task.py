@@ -0,0 +1,29 @@
+"""
+Scheduled send release task
+"""
+from typing import Any, Dict, List
+from app.worker.celery_app import celery_app
+from app.logger import log
+from app.services.scheduler import get_send_scheduler
+from app.domain.suppression import drop_suppressed_payloads
+from .mail_sending_task import mail_sending_task
+
+
+def _publish(batch: List[Dict[str, Any]]):
+    # published synchronously over a single producer, so a send only leaves the schedule once the broker has it.
+    # Addresses may have been suppressed since the sends were scheduled
+    batch = drop_suppressed_payloads(batch)
+    with celery_app.producer_pool.acquire(block=True) as producer:
+        for data in batch:
+            mail_sending_task.apply_async(kwargs=dict(data=data), producer=producer)
+
+
+@celery_app.task(name="scheduled_send_task", ignore_result=True)
+@log.catch
+def scheduled_send_task():
+    """
+    Periodic task that releases scheduled emails to the mail sending task once they are due
+    """
+    released = get_send_scheduler().release_due(_publish)
+    if released:
+        log.info(f"Released {released} scheduled emails")
@@ -1,6 +1,9 @@
 """
 Utility functions
 """
+import re
+
+_HTML_TAG = re.compile(r"<html[\s>]", re.IGNORECASE)
 
 
 # pylint: disable=unused-argument
@@ -16,3 +19,10 @@ def singleton(cls, *args, **kw):
         return instances[cls]
 
     return _singleton
+
+
+def is_html(message: str) -> bool:
+    """
+    Checks whether a message is an HTML document, whatever the case of its html tag
+    """
+    return _HTML_TAG.search(message) is not None
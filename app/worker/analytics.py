@@ -0,0 +1,112 @@
+"""
+Analytics flusher. Drains the minute series of a worker process from a background thread & hands the counts to the
+analytics task, so that a worker publishes one analytics message every few seconds however many emails it sends
+"""
+import threading
+from functools import lru_cache
+
+from celery import signals
+from celery.concurrency.prefork import TaskPool as PreforkPool
+from app.config import get_config
+from app.logger import log
+from app.services.analytics import MinuteSeries, get_minute_series
+from app.tasks.mail_analytics_task import mail_analytics_task
+from .publisher import TaskPublisher, get_publisher
+
+
+class AnalyticsFlusher:
+    """
+    Publishes the counts of a minute series every interval seconds
+    """
+
+    def __init__(
+        self,
+        series: MinuteSeries,
+        publisher: TaskPublisher,
+        interval: float = get_config().analytics_flush_interval,
+    ):
+        self.series = series
+        self.publisher = publisher
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        """
+        Starts the background thread, unless it is running. Forked worker processes start a thread of their own
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="barua-analytics-flusher", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float | None = None):
+        """
+        Stops the background thread & publishes the counts recorded since the last flush
+        """
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def flush(self):
+        """
+        Publishes the counts recorded since the last flush
+        """
+        rows = self.series.drain()
+        if not rows:
+            return
+        try:
+            self.publisher.publish(mail_analytics_task, dict(counts=rows))
+        # pylint: disable=broad-except
+        except Exception as err:
+            log.error(
+                f"Failed to publish {len(rows)} analytics counts with error {err}"
+            )
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+
+@lru_cache()
+def get_analytics_flusher() -> AnalyticsFlusher:
+    """
+    Gets the analytics flusher for this process
+    """
+    return AnalyticsFlusher(get_minute_series(), get_publisher())
+
+
+# pylint: disable=unused-argument
+def _on_start(**kwargs):
+    get_analytics_flusher().start()
+
+
+# pylint: disable=unused-argument
+def _on_worker_ready(sender=None, **kwargs):
+    # the child processes of the prefork pool send the emails & start flushers of their own, the parent only consumes
+    if not isinstance(getattr(sender, "pool", None), PreforkPool):
+        get_analytics_flusher().start()
+
+
+# pylint: disable=unused-argument
+def _on_shutdown(**kwargs):
+    get_analytics_flusher().stop(timeout=5)
+    get_publisher().stop(timeout=10)
+
+
+def attach_analytics():
+    """
+    Runs the analytics flusher in every process that sends emails, the main worker process for the solo & threads pools
+    & each child process for the prefork pool
+    """
+    signals.worker_ready.connect(_on_worker_ready, weak=False)
+    signals.worker_process_init.connect(_on_start, weak=False)
+    signals.worker_shutdown.connect(_on_shutdown, weak=False)
+    signals.worker_process_shutdown.connect(_on_shutdown, weak=False)
+
+
+attach_analytics()
@@ -0,0 +1,260 @@
+"""
+Batch consumer. An alternative to the Celery worker for the mail sending queues, which takes up to batch_size messages
+off the queue at a time, or as many as arrived within batch_timeout seconds, and sends them over a single SMTP session
+rather than paying for provider selection & a connection checkout per message. Every message is acknowledged on its
+own once it has been handled. Connections to the broker are checked with heartbeats & re-established when they drop,
+messages that were not acknowledged by then are redelivered by the broker.
+
+Emails that fail on account of the providers, e.g. during an outage, are published again after retry_delay seconds,
+doubled with each retry, & pushed to the dead letter task once the retries of the mail sending task are used up. The
+message stays unacknowledged until it is published again, so consuming keeps going, & heartbeats with it, while up to
+batch_size emails wait for their retry. Emails that fail on account of the email itself are pushed to the dead letter
+task straight away. Other tasks that land on the queue are run in place.
+
+Run with: python -m app.worker.batch_consumer [-Q barua-queue] [--batch-size 100] [--batch-timeout 0.5]
+"""
+import argparse
+import signal
+import time
+from typing import Any, Dict, List, Tuple
+
+from celery import Celery
+from kombu.message import Message
+from kombu.mixins import ConsumerMixin
+
+from app.config import get_config
+from app.logger import log
+from app.metrics import TASK_DURATION
+from app.services.analytics import get_minute_series
+from app.services.mail import send_plain_mails, unsent_request
+from app.services.mail.exceptions import EmailSendingException
+from app.services.mail.provider_router import is_provider_failure
+from app.tasks.mail_error_task import mail_error_task
+from app.tasks.mail_sending_task import mail_sending_task
+from .analytics import get_analytics_flusher
+from .celery_app import celery_app
+from .publisher import get_publisher
+from .queues import BARUA_QUEUE_NAME
+
+
+def decode(message: Message) -> Tuple[str | None, List[Any], Dict[str, Any]]:
+    """
+    Decodes a task message into the name of the task & its arguments, for both Celery task protocols
+    """
+    body = message.decode()
+    name = (message.headers or {}).get("task")
+    if name is not None:
+        # task protocol 2 carries the task name in the headers & the arguments in the body
+        args, kwargs, _ = body
+        return name, args, kwargs
+    return body.get("task"), body.get("args") or [], body.get("kwargs") or {}
+
+
+def _sender(data: Dict[str, Any]) -> str:
+    return (data.get("sender") or {}).get("email", "").lower()
+
+
+def retries(message: Message) -> int:
+    """
+    Number of times the task of a message was retried, as counted in the headers of task protocol 2
+    """
+    return (message.headers or {}).get("retries") or 0
+
+
+class BatchConsumer(ConsumerMixin):
+    """
+    Consumes mail sending task messages in batches
+    """
+
+    def __init__(
+        self,
+        app: Celery = celery_app,
+        queues: List[str] | None = None,
+        batch_size: int = get_config().batch_consumer_size,
+        batch_timeout: float = get_config().batch_consumer_timeout,
+        retry_delay: float = get_config().batch_consumer_retry_delay,
+    ):
+        self.app = app
+        self.queues = queues or [BARUA_QUEUE_NAME]
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.retry_delay = retry_delay
+        self.connection = None
+        self._pending: List[Message] = []
+        self._deadline = 0.0
+        # emails waiting to be published again, by the time they are due
+        self._retrying: List[Tuple[float, Message, Dict[str, Any]]] = []
+
+    def run(self, _tokens: int = 1, **kwargs):
+        """
+        Consumes messages until stopped, reconnecting to the broker whenever the connection drops
+        """
+        self.app.loader.import_default_modules()
+        log.info(f"Consuming {self.queues} in batches of up to {self.batch_size}")
+
+        # connections only send & check heartbeats when opened with one, a dead broker would otherwise go unnoticed
+        with self.app.connection_for_read(
+            heartbeat=self.app.conf.broker_heartbeat
+        ) as connection:
+            self.connection = connection
+            # events are drained in short steps, so that batches are flushed close to their deadline
+            super().run(
+                _tokens, safety_interval=min(self.batch_timeout, 1.0) / 4, **kwargs
+            )
+
+    def stop(self, *_):
+        """
+        Stops consuming once the current batch has been handled. Emails waiting for a retry are left to the broker to
+        redeliver
+        """
+        self.should_stop = True
+
+    # pylint: disable=invalid-name,unused-argument
+    def get_consumers(self, Consumer, channel):
+        queues = [
+            queue for queue in self.app.conf.task_queues if queue.name in self.queues
+        ]
+        return [
+            Consumer(
+                queues=queues,
+                on_message=self._on_message,
+                accept=self.app.conf.accept_content,
+                prefetch_count=self.batch_size,
+            )
+        ]
+
+    # pylint: disable=unused-argument
+    def on_consume_ready(self, connection, channel, consumers, **kwargs):
+        # messages taken off a connection that dropped cannot be acknowledged, the broker delivers them again
+        self._pending, self._retrying = [], []
+
+    # pylint: disable=unused-argument
+    def on_consume_end(self, connection, channel):
+        self.flush()
+
+    def on_iteration(self):
+        now = time.monotonic()
+        if self._pending and (
+            len(self._pending) >= self.batch_size or now >= self._deadline
+        ):
+            self.flush()
+        if self._retrying and self._retrying[0][0] <= now:
+            self._retry_due(now)
+
+    def flush(self):
+        """
+        Handles the messages taken off the queue so far
+        """
+        messages, self._pending = self._pending, []
+        mails: List[Tuple[Message, Dict[str, Any]]] = []
+
+        for message in messages:
+            try:
+                name, args, kwargs = decode(message)
+            # pylint: disable=broad-except
+            except Exception as err:
+                log.error(f"Rejecting message that cannot be decoded {err}")
+                message.reject()
+                continue
+
+            if name == mail_sending_task.name:
+                mails.append((message, kwargs["data"]))
+            elif name in self.app.tasks:
+                self.app.tasks[name].apply(args=args, kwargs=kwargs)
+                message.ack()
+            else:
+                log.error(f"Rejecting message of unknown task {name}")
+                message.reject()
+
+        if mails:
+            self._send(mails)
+
+    def _send(self, mails: List[Tuple[Message, Dict[str, Any]]]):
+        started = time.monotonic()
+        errors = send_plain_mails([data for _, data in mails])
+
+        retried = 0
+        for (message, data), error in zip(mails, errors):
+            if error is None:
+                get_minute_series().record("sender", _sender(data), "sent")
+                message.ack()
+                continue
+
+            # fan-out recipients that were sent to before the failure are left out of the retry & the dead letter
+            data = unsent_request(data, error)
+            attempt = retries(message)
+            if (
+                isinstance(error, EmailSendingException)
+                and is_provider_failure(error)
+                and attempt < mail_sending_task.max_retries
+            ):
+                due = time.monotonic() + self.retry_delay * 2**attempt
+                self._retrying.append((due, message, data))
+                retried += 1
+            else:
+                self._dead_letter(message, data, error)
+
+        self._retrying.sort(key=lambda retry: retry[0])
+        TASK_DURATION.labels(
+            task="mail_sending_batch", state="RETRY" if retried else "SUCCESS"
+        ).observe(time.monotonic() - started)
+        if retried:
+            log.warning(
+                f"Providers failed to send {retried} emails, retrying in {self.retry_delay} seconds or more"
+            )
+
+    def _retry_due(self, now: float):
+        while self._retrying and self._retrying[0][0] <= now:
+            _, message, data = self._retrying.pop(0)
+            # published before the message is acknowledged, so the email is not lost if publishing fails
+            mail_sending_task.apply_async(
+                kwargs=dict(data=data), retries=retries(message) + 1
+            )
+            message.ack()
+
+    @staticmethod
+    def _dead_letter(message: Message, data: Dict[str, Any], error: Exception):
+        log.bind(email=data).warning(
+            f"Failed to send email with error {error}, pushing to dlt queue..."
+        )
+        get_minute_series().record("sender", _sender(data), "failed")
+        mail_error_task.apply_async(kwargs=dict(data=data))
+        message.ack()
+
+    def _on_message(self, message: Message):
+        if not self._pending:
+            self._deadline = time.monotonic() + self.batch_timeout
+        self._pending.append(message)
+
+
+def main():
+    """
+    Runs a batch consumer until it is stopped with SIGINT or SIGTERM
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-Q", "--queues", default=BARUA_QUEUE_NAME)
+    parser.add_argument(
+        "--batch-size", type=int, default=get_config().batch_consumer_size
+    )
+    parser.add_argument(
+        "--batch-timeout", type=float, default=get_config().batch_consumer_timeout
+    )
+    arguments = parser.parse_args()
+
+    consumer = BatchConsumer(
+        queues=arguments.queues.split(","),
+        batch_size=arguments.batch_size,
+        batch_timeout=arguments.batch_timeout,
+    )
+    signal.signal(signal.SIGINT, consumer.stop)
+    signal.signal(signal.SIGTERM, consumer.stop)
+    get_analytics_flusher().start()
+    try:
+        consumer.run()
+    finally:
+        get_analytics_flusher().stop(timeout=5)
+        get_publisher().stop(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,12 @@ Celery application
 """
 import os
 from celery import Celery
+from .signals import attach_signals
+from .routers import route_by_priority
+from .serializers import SERIALIZER_NAME, register_serializer
 from .queues import (
     barua_queue,
+    barua_bulk_queue,
     barua_analytics_queue,
     barua_error_queue,
     BARUA_QUEUE_NAME,
@@ -25,6 +29,8 @@ broker_password = os.environ.get("BROKER_PASSWORD", "guest")
 
 broker_transport_options = {
     "visibility_timeout": 43200,
+    # wait for the broker to confirm each published message
+    "confirm_publish": True,
 }
 
 broker_url = f"amqp://{broker_username}:{broker_password}@{broker_host}:{broker_port}"
@@ -44,23 +50,55 @@ backend_transport_options = {
 }
 
 # Task Queues
-task_queues = (barua_queue, barua_analytics_queue, barua_error_queue)
+task_queues = (barua_queue, barua_bulk_queue, barua_analytics_queue, barua_error_queue)
 
-# Task Routes
-task_routes = {
-    "mail_sending_task": dict(
-        queue=BARUA_QUEUE_NAME, routing_key=BARUA_ROUTING_KEY_NAME
-    ),
-    "mail_error_task": dict(
-        queue=BARUA_ERROR_QUEUE_NAME, routing_key=BARUA_ERROR_ROUTING_KEY_NAME
+# Task Routes, mail sending tasks are routed to the queue of their priority lane
+task_routes = (
+    route_by_priority,
+    {
+        "mail_error_task": dict(
+            queue=BARUA_ERROR_QUEUE_NAME, routing_key=BARUA_ERROR_ROUTING_KEY_NAME
+        ),
+        "mail_error_callback_task": dict(
+            queue=BARUA_ERROR_QUEUE_NAME, routing_key=BARUA_ERROR_ROUTING_KEY_NAME
+        ),
+        "mail_analytics_task": dict(
+            queue=BARUA_ANALYTICS_QUEUE_NAME,
+            routing_key=BARUA_ANALYTICS_ROUTING_KEY_NAME,
+        ),
+        "attachment_gc_task": dict(
+            queue=BARUA_QUEUE_NAME, routing_key=BARUA_ROUTING_KEY_NAME
+        ),
+        "scheduled_send_task": dict(
+            queue=BARUA_QUEUE_NAME, routing_key=BARUA_ROUTING_KEY_NAME
+        ),
+    },
+)
+
+# Periodic tasks, run with celery beat
+beat_schedule = {
+    "attachment-gc": dict(
+        task="attachment_gc_task",
+        schedule=float(os.environ.get("ATTACHMENT_GC_INTERVAL", "3600")),
     ),
-    "mail_analytics_task": dict(
-        queue=BARUA_ANALYTICS_QUEUE_NAME, routing_key=BARUA_ANALYTICS_ROUTING_KEY_NAME
+    "scheduled-send": dict(
+        task="scheduled_send_task",
+        schedule=float(os.environ.get("SCHEDULE_INTERVAL", "5")),
     ),
 }
 
 celery_app = Celery(
-    "BaruaPepeWorker", broker=broker_url, backend=backend_url, include=["app.tasks"]
+    "BaruaPepeWorker",
+    broker=broker_url,
+    backend=backend_url,
+    include=[
+        "app.tasks.mail_sending_task",
+        "app.tasks.mail_error_task",
+        "app.tasks.mail_analytics_task",
+        "app.tasks.attachment_gc_task",
+        "app.tasks.scheduled_send_task",
+        "app.worker.analytics",
+    ],
 )
 
 # Set task routes and queues
@@ -72,4 +110,17 @@ celery_app.conf.task_default_queue = BARUA_DEFAULT_QUEUE_NAME
 celery_app.conf.backend_transport_options = backend_transport_options
 celery_app.conf.broker_transport_options = broker_transport_options
 celery_app.conf.task_queues = task_queues
-celery_app.conf.task_protocol = 1
+celery_app.conf.beat_schedule = beat_schedule
+
+# Task messages are published in the compact msgpack format, with the task name & ids in the message headers. JSON is
+# still accepted so that messages published before a deployment are consumed
+register_serializer()
+celery_app.conf.task_protocol = 2
+celery_app.conf.task_serializer = SERIALIZER_NAME
+celery_app.conf.accept_content = [SERIALIZER_NAME, "json"]
+celery_app.conf.result_accept_content = ["json"]
+# protocol 2 headers carry a repr of the task arguments, which would otherwise copy up to a kilobyte of each email
+celery_app.amqp.argsrepr_maxsize = 64
+celery_app.amqp.kwargsrepr_maxsize = 64
+
+attach_signals()
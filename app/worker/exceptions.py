@@ -0,0 +1,13 @@
+"""
+Worker Exceptions
+"""
+from app.exceptions import AppException
+
+
+class PublisherBusyException(AppException):
+    """
+    Exception raised when the task publisher has too many messages waiting for the broker to accept new ones
+    """
+
+    def __init__(self, message=None):
+        super().__init__(message or "Too many messages are waiting to be published")
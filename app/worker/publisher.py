@@ -0,0 +1,176 @@
+"""
+Task publisher. Hands task messages off to a background thread that publishes them to the broker over a pooled producer,
+so that callers on the request path never wait on the broker
+"""
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Tuple
+
+from celery import Celery, Task
+from kombu.exceptions import OperationalError
+
+from app.config import get_config
+from app.logger import log
+from .celery_app import celery_app
+from .exceptions import PublisherBusyException
+
+TaskMessage = Tuple[Task, Dict[str, Any]]
+# a task message along with the number of times publishing it failed
+_Pending = Tuple[Task, Dict[str, Any], int]
+
+
+class TaskPublisher:
+    """
+    Publishes task messages in batches from a background thread.
+
+    Messages are buffered in memory up to max_pending. Once the buffer is full, because the broker is slow or
+    unavailable, new messages are refused with a PublisherBusyException so callers can push back on their clients
+    instead of piling up work. Each batch of up to batch_size messages is published with a single producer borrowed from
+    the Celery producer pool; with confirm_publish enabled on the broker connection every publish is confirmed by the
+    broker before the next one goes out. Messages that failed on account of the broker connection are put back at the
+    front of the buffer & published again after retry_delay seconds, doubled after every failed attempt up to
+    max_retry_delay, so they keep counting towards max_pending until the broker has them. Messages that failed
+    max_attempts times, or failed for any other reason, e.g. because they cannot be encoded or are too large for the
+    broker, are logged & dropped rather than holding up the rest of the buffer.
+    """
+
+    def __init__(
+        self,
+        app: Celery = celery_app,
+        max_pending: int = get_config().publisher_max_pending,
+        batch_size: int = get_config().publisher_batch_size,
+        retry_delay: float = get_config().publisher_retry_delay,
+        max_retry_delay: float = get_config().publisher_max_retry_delay,
+        max_attempts: int = get_config().publisher_max_attempts,
+    ):
+        self.app = app
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+        self._pending: Deque[_Pending] = deque()
+        self._ready = threading.Condition(threading.Lock())
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of messages waiting to be published
+        """
+        return len(self._pending)
+
+    def publish(self, task: Task, kwargs: Dict[str, Any]):
+        """
+        Queues a single task message for publishing
+        """
+        self.publish_many([(task, kwargs)])
+
+    def publish_many(self, messages: List[TaskMessage]):
+        """
+        Queues task messages for publishing. Either all of the messages are accepted or none of them are
+        """
+        with self._ready:
+            if len(self._pending) + len(messages) > self.max_pending:
+                raise PublisherBusyException(
+                    f"Cannot accept {len(messages)} messages, {len(self._pending)} are waiting to be published"
+                )
+            self._pending.extend((task, kwargs, 0) for task, kwargs in messages)
+            self._ensure_started()
+            self._ready.notify()
+
+    def stop(self, timeout: float | None = None):
+        """
+        Publishes the messages still waiting & stops the background thread. Messages the broker has not accepted by the
+        time timeout runs out are lost
+        """
+        with self._ready:
+            self._stopping = True
+            self._ready.notify()
+            thread = self._thread
+
+        if thread:
+            thread.join(timeout)
+            if thread.is_alive():
+                log.error(
+                    f"Stopped waiting for the broker, {len(self._pending)} messages were not published"
+                )
+                return
+
+        with self._ready:
+            self._stopping = False
+            self._thread = None
+
+    def _ensure_started(self):
+        # started lazily so that each forked server process gets its own publishing thread
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="barua-task-publisher", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        delay = self.retry_delay
+        while True:
+            with self._ready:
+                while not self._pending and not self._stopping:
+                    self._ready.wait()
+                if not self._pending:
+                    return
+                batch = [
+                    self._pending.popleft()
+                    for _ in range(min(self.batch_size, len(self._pending)))
+                ]
+            failed = self._flush(batch)
+            if not failed:
+                delay = self.retry_delay
+                continue
+
+            with self._ready:
+                # failed messages go back in their original order, ahead of the ones queued in the meantime
+                self._pending.extendleft(reversed(failed))
+                log.warning(
+                    f"Broker did not accept {len(failed)} messages, retrying in {delay} seconds"
+                )
+                self._ready.wait(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def _flush(self, batch: List[_Pending]) -> List[_Pending]:
+        # returns the messages that were not published & are worth publishing again
+        failed, attempted = [], 0
+        try:
+            with self.app.producer_pool.acquire(block=True) as producer:
+                retryable = (OperationalError, *producer.connection.connection_errors)
+                for task, kwargs, attempts in batch:
+                    attempted += 1
+                    try:
+                        task.apply_async(kwargs=kwargs, producer=producer)
+                    # pylint: disable=broad-except
+                    except Exception as err:
+                        if (
+                            isinstance(err, retryable)
+                            and attempts + 1 < self.max_attempts
+                        ):
+                            log.error(f"Failed to publish {task.name} with error {err}")
+                            failed.append((task, kwargs, attempts + 1))
+                        else:
+                            log.error(
+                                f"Dropped {task.name} after {attempts + 1} failed attempts, last error {err}"
+                            )
+        # pylint: disable=broad-except
+        except Exception as err:
+            log.error(
+                f"Failed to publish batch of {len(batch)} messages with error {err}"
+            )
+            failed.extend(batch[attempted:])
+        return failed
+
+
+@lru_cache()
+def get_publisher() -> TaskPublisher:
+    """
+    Gets the task publisher for this process
+    """
+    return TaskPublisher()
@@ -16,6 +16,13 @@ BARUA_QUEUE_NAME = os.environ.get("BARUA_QUEUE", "barua-queue")
 BARUA_ROUTING_KEY_NAME = os.environ.get("BARUA_ROUTING_KEY", "barua-routing-key")
 barua_exchange = Exchange(name=BARUA_EXCHANGE_NAME, type="direct")
 
+# bulk emails are sent through a queue of their own, consumed by separate workers, so that transactional emails on
+# barua_queue are never held up behind a large campaign
+BARUA_BULK_QUEUE_NAME = os.environ.get("BARUA_BULK_QUEUE", "barua-bulk-queue")
+BARUA_BULK_ROUTING_KEY_NAME = os.environ.get(
+    "BARUA_BULK_ROUTING_KEY", "barua-bulk-routing-key"
+)
+
 BARUA_ERROR_EXCHANGE_NAME = os.environ.get(
     "BARUA_ERROR_EXCHANGE", "barua-error-exchange"
 )
@@ -60,6 +67,14 @@ barua_queue = Queue(
     queue_arguments=dead_letter_queue_option,
 )
 
+# campaigns can sit in the bulk queue for a long while before workers get to them, so its messages do not expire.
+# Emails that fail every attempt are handed to the error queue by the tasks themselves
+barua_bulk_queue = Queue(
+    name=BARUA_BULK_QUEUE_NAME,
+    routing_key=BARUA_BULK_ROUTING_KEY_NAME,
+    exchange=barua_exchange,
+)
+
 barua_error_queue = Queue(
     name=BARUA_ERROR_QUEUE_NAME,
     routing_key=BARUA_ERROR_ROUTING_KEY_NAME,
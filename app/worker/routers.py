@@ -0,0 +1,29 @@
+"""
+Task routers. These pick the queue of a task message from its contents, where task_routes can only route by task name
+"""
+from typing import Any, Dict
+from app.domain.entities.email_priority import EmailPriority
+from .queues import (
+    BARUA_QUEUE_NAME,
+    BARUA_ROUTING_KEY_NAME,
+    BARUA_BULK_QUEUE_NAME,
+    BARUA_BULK_ROUTING_KEY_NAME,
+)
+
+
+# pylint: disable=unused-argument
+def route_by_priority(
+    name: str, args, kwargs: Dict[str, Any] | None, options, task=None, **kw
+) -> Dict[str, str] | None:
+    """
+    Routes mail sending tasks to the queue of their priority lane. Retries are routed the same way, so a bulk email
+    stays in the bulk lane
+    """
+    if name != "mail_sending_task":
+        return None
+    data = (kwargs or {}).get("data") or {}
+    if data.get("priority") == EmailPriority.BULK:
+        return dict(
+            queue=BARUA_BULK_QUEUE_NAME, routing_key=BARUA_BULK_ROUTING_KEY_NAME
+        )
+    return dict(queue=BARUA_QUEUE_NAME, routing_key=BARUA_ROUTING_KEY_NAME)
@@ -0,0 +1,77 @@
+"""
+Task message serializer. Task payloads are packed with msgpack, which is a fraction of the size of JSON for the nested
+email dicts & is quicker to pack & unpack, & payloads above a size threshold, typically those carrying inline
+attachments, are compressed with zstd.
+
+Every payload starts with a two byte header, the version of the wire format & a set of flags telling how the rest of it
+is encoded, so that the format can change without workers misreading messages published before the change
+"""
+from datetime import date, datetime, time
+from typing import Any
+
+import msgpack
+import zstandard
+from kombu.serialization import register
+
+from app.config import get_config
+
+SERIALIZER_NAME = "barua-msgpack"
+CONTENT_TYPE = "application/x-barua-msgpack"
+WIRE_FORMAT_VERSION = 1
+# flags of the header
+FLAG_ZSTD = 0x01
+# zstd level payloads are compressed at, low levels compress nearly as well as the default on these payloads & faster
+COMPRESSION_LEVEL = 3
+
+
+def _default(obj: Any) -> Any:
+    # dates are carried as ISO 8601 strings, as Celery's JSON serializer does
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    raise TypeError(f"Cannot serialize object of type {type(obj).__name__}")
+
+
+def dumps(
+    obj: Any, compression_threshold: int = get_config().task_compression_threshold
+) -> bytes:
+    """
+    Serializes a task payload. Payloads of at least compression_threshold bytes are compressed, 0 disables compression
+    """
+    payload = msgpack.packb(obj, default=_default, use_bin_type=True)
+    flags = 0
+    if 0 < compression_threshold <= len(payload):
+        payload = zstandard.compress(payload, COMPRESSION_LEVEL)
+        flags |= FLAG_ZSTD
+    return bytes((WIRE_FORMAT_VERSION, flags)) + payload
+
+
+def loads(data: bytes | memoryview) -> Any:
+    """
+    Deserializes a task payload
+    """
+    data = bytes(data)
+    if len(data) < 2:
+        raise ValueError("Task payload is missing its header")
+    version, flags = data[0], data[1]
+    if version != WIRE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported task payload version {version}")
+    if flags & ~FLAG_ZSTD:
+        raise ValueError(f"Unsupported task payload flags {flags:#04x}")
+
+    payload = data[2:]
+    if flags & FLAG_ZSTD:
+        payload = zstandard.decompress(payload)
+    return msgpack.unpackb(payload, raw=False)
+
+
+def register_serializer():
+    """
+    Registers the serializer with kombu, making it available to Celery as SERIALIZER_NAME
+    """
+    register(
+        SERIALIZER_NAME,
+        dumps,
+        loads,
+        content_type=CONTENT_TYPE,
+        content_encoding="binary",
+    )
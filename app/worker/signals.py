@@ -0,0 +1,50 @@
+"""
+Celery signal handlers, these record task metrics
+"""
+import time
+from typing import Dict
+from celery import signals
+from prometheus_client import start_http_server
+from app.config import get_config
+from app.logger import log
+from app.metrics import TASK_DURATION, TASK_RETRIES, get_registry
+
+_started: Dict[str, float] = {}
+
+
+# pylint: disable=unused-argument
+def _on_task_prerun(task_id=None, **kwargs):
+    _started[task_id] = time.monotonic()
+
+
+# pylint: disable=unused-argument
+def _on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is not None:
+        TASK_DURATION.labels(task=task.name, state=state or "UNKNOWN").observe(
+            time.monotonic() - started
+        )
+
+
+# pylint: disable=unused-argument
+def _on_task_retry(sender=None, **kwargs):
+    TASK_RETRIES.labels(task=sender.name).inc()
+
+
+# pylint: disable=unused-argument
+def _on_worker_init(**kwargs):
+    port = get_config().worker_metrics_port
+    if port:
+        # prefork children share the multiprocess directory, so serving from the main process covers all of them
+        start_http_server(port, registry=get_registry())
+        log.info(f"Serving worker metrics on port {port}")
+
+
+def attach_signals():
+    """
+    Connects the task metric handlers to Celery's signals
+    """
+    signals.task_prerun.connect(_on_task_prerun, weak=False)
+    signals.task_postrun.connect(_on_task_postrun, weak=False)
+    signals.task_retry.connect(_on_task_retry, weak=False)
+    signals.worker_init.connect(_on_worker_init, weak=False)
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import time
+from unittest.mock import patch
+from tests import BaseTestCase
+from app.config import get_config
+from app.services.analytics import AnalyticsStore
+
+base_url = "/api/v1/baruapepe"
+
+
+class TestAnalyticsApi(BaseTestCase):
+    """
+    Test Analytics API
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.auth = (get_config().username, get_config().password)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = AnalyticsStore(os.path.join(directory.name, "analytics.db"))
+        patcher = patch("app.api.analytics.routes.get_analytics_store", return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_gets_series_of_the_last_hour(self):
+        """Test analytics api returns the totals & minutes of each series over the last hour by default"""
+        minute = int(time.time() // 60)
+        self.store.add([
+            ("sender", "jane@example.com", minute - 1, 5, 1, 0),
+            ("sender", "jane@example.com", minute - 2, 3, 0, 0),
+            ("sender", "jane@example.com", minute - 120, 7, 0, 0),
+            ("provider", "smtp", minute - 1, 8, 1, 2),
+        ])
+
+        response = self.test_client.get(f"{base_url}/analytics/sender", auth=self.auth)
+
+        self.assert_status(actual=response.status_code, status_code=200)
+        series, = response.json()["data"]
+        self.assertEqual(
+            ("jane@example.com", 8, 1, None), (series["key"], series["sent"], series["failed"], series["bounced"])
+        )
+        self.assertEqual([3, 5], [point["sent"] for point in series["points"]])
+
+    def test_gets_a_single_series(self):
+        """Test analytics api returns only the series of the given key"""
+        minute = int(time.time() // 60)
+        self.store.add([("provider", "smtp", minute - 1, 8, 1, 2), ("provider", "sendgrid", minute - 1, 1, 0, 0)])
+
+        response = self.test_client.get(f"{base_url}/analytics/provider?key=smtp", auth=self.auth)
+
+        self.assertEqual([("smtp", 2)], [(series["key"], series["bounced"]) for series in response.json()["data"]])
+
+    def test_throws_400_with_invalid_period(self):
+        """Test analytics api refuses periods that end before they start"""
+        response = self.test_client.get(
+            f"{base_url}/analytics/sender?start=2024-01-02T00:00:00&end=2024-01-01T00:00:00", auth=self.auth)
+
+        self.assert_status(actual=response.status_code, status_code=400)
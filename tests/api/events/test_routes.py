@@ -0,0 +1,59 @@
+import json
+from unittest.mock import patch
+from tests import BaseTestCase
+from app.config import get_config
+from app.worker.exceptions import PublisherBusyException
+
+base_url = "/api/v1/baruapepe"
+
+
+class TestEventApi(BaseTestCase):
+    """
+    Test Event API
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.auth = (get_config().username, get_config().password)
+        patcher = patch("app.api.events.routes.get_publisher")
+        self.publisher = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_queues_sendgrid_events_in_batches(self):
+        """Test event api queues the recorded events of a SendGrid batch in batches of event_batch_max_size"""
+        events = [dict(email=f"user{index}@example.com", event="open", sg_message_id=f"id{index}.filter", timestamp=1)
+                  for index in range(5)] + [dict(email="jane@example.com", event="processed")]
+
+        with patch.object(get_config(), "event_batch_max_size", 2):
+            response = self.test_client.post(f"{base_url}/events/sendgrid", auth=self.auth, json=events)
+
+        self.assert_status(actual=response.status_code, status_code=200)
+        self.assertEqual(5, response.json()["data"]["accepted"])
+        messages = self.publisher.publish_many.call_args.args[0]
+        self.assertEqual([2, 2, 1], [len(kwargs["events"]) for _, kwargs in messages])
+
+    def test_queues_mailchimp_events_posted_as_form(self):
+        """Test event api reads Mailchimp events from the mandrill_events form field"""
+        events = [dict(event="spam", ts=1, msg=dict(_id="abc", email="jane@example.com"))]
+
+        response = self.test_client.post(f"{base_url}/events/mailchimp", auth=self.auth,
+                                         data=dict(mandrill_events=json.dumps(events)))
+
+        self.assert_status(actual=response.status_code, status_code=200)
+        (_, kwargs), = self.publisher.publish_many.call_args.args[0]
+        self.assertEqual("complained", kwargs["events"][0]["event"])
+
+    def test_throws_400_with_invalid_events(self):
+        """Test event api refuses payloads that are not a list of events"""
+        response = self.test_client.post(f"{base_url}/events/sendgrid", auth=self.auth, json=dict(event="open"))
+
+        self.assert_status(actual=response.status_code, status_code=400)
+
+    def test_throws_503_when_publisher_is_busy(self):
+        """Test event api asks the provider to retry when events can not be queued"""
+        self.publisher.publish_many.side_effect = PublisherBusyException()
+
+        response = self.test_client.post(f"{base_url}/events/sendgrid", auth=self.auth,
+                                         json=[dict(email="jane@example.com", event="open", timestamp=1)])
+
+        self.assert_status(actual=response.status_code, status_code=503)
@@ -3,13 +3,33 @@ from unittest.mock import patch
 import pytest
 from tests import BaseTestCase
 from app.exceptions import AppException
+from app.config import get_config
+from app.services.attachments import AttachmentStore
+from app.services.idempotency import IdempotencyCache, LocalIdempotencyBackend
+from app.worker.exceptions import PublisherBusyException
 import os
+import json
+import base64
+import tempfile
+from datetime import datetime, timedelta, timezone
 
 base_url = "/api/v1/baruapepe/sendmail/"
 
 os.environ.update(BROKER_URL="memory://", RESULT_BACKEND="rpc")
 
 
+def rocket_message():
+    return {
+        "from": {
+            "email": "ninja@example.com",
+            "name": "Ninja"
+        },
+        "to": [{"email": "johndoe@example.com"}],
+        "subject": "Rocket Schematics",
+        "message": "Let us build a rocket to the Moon",
+    }
+
+
 class TestMailApi(BaseTestCase):
     """
     Test Mail API
@@ -411,5 +431,256 @@ class TestMailApi(BaseTestCase):
             self.assertEqual("Failed to send email", response_json.get("message"))
 
 
+class TestBatchMailApi(BaseTestCase):
+    """
+    Test Batch Mail API
+    """
+
+    batch_url = "/api/v1/baruapepe/sendmail/batch"
+
+    def setUp(self):
+        super().setUp()
+        self.auth = (get_config().username, get_config().password)
+        self.message = rocket_message()
+
+    @patch("app.api.mailer.routes.send_emails")
+    def test_returns_per_message_results(self, mock_send_emails):
+        """Test batch email api enqueues valid messages & reports invalid ones with their errors"""
+        invalid = dict(self.message, subject="")
+
+        response = self.test_client.post(self.batch_url, auth=self.auth,
+                                         json=dict(messages=[self.message, invalid, self.message]))
+        response_json = response.json()
+
+        self.assert_status(actual=response.status_code, status_code=200)
+        self.assertEqual(2, response_json.get("accepted"))
+        self.assertEqual(1, response_json.get("rejected"))
+        self.assertEqual([True, False, True], [result["accepted"] for result in response_json.get("results")])
+        self.assertIn("subject", response_json.get("results")[1].get("errors"))
+        mock_send_emails.assert_called_once()
+        self.assertEqual(2, len(mock_send_emails.call_args.args[0]))
+
+    @patch("app.api.mailer.routes.send_emails")
+    def test_reports_unknown_templates_in_message_order(self, mock_send_emails):
+        """Test batch email api refuses messages with unknown templates & reports results in the order of the batch"""
+        templated = {key: value for key, value in self.message.items() if key not in ("subject", "message")}
+        messages = [dict(templated, template_id="unknown"), dict(self.message, subject=""), self.message]
+
+        response = self.test_client.post(self.batch_url, auth=self.auth, json=dict(messages=messages))
+        results = response.json().get("results")
+
+        self.assert_status(actual=response.status_code, status_code=200)
+        self.assertEqual([0, 1, 2], [result["index"] for result in results])
+        self.assertEqual([False, False, True], [result["accepted"] for result in results])
+        self.assertEqual(["Template unknown not found"], results[0]["errors"]["template_id"])
+        self.assertEqual(1, len(mock_send_emails.call_args.args[0]))
+
+    @patch("app.api.mailer.routes.send_emails")
+    def test_does_not_enqueue_when_all_messages_are_invalid(self, mock_send_emails):
+        """Test batch email api does not publish anything when no message is valid"""
+        response = self.test_client.post(self.batch_url, auth=self.auth,
+                                         json=dict(messages=[dict(self.message, subject="")]))
+
+        self.assert_status(actual=response.status_code, status_code=200)
+        self.assertEqual(0, response.json().get("accepted"))
+        mock_send_emails.assert_not_called()
+
+    @patch("app.api.mailer.routes.send_emails")
+    def test_rejects_batches_above_limit(self, mock_send_emails):
+        """Test batch email api rejects empty batches & batches larger than the configured limit"""
+        for messages in ([], [self.message] * (get_config().mail_batch_max_size + 1)):
+            response = self.test_client.post(self.batch_url, auth=self.auth, json=dict(messages=messages))
+
+            self.assert_status(actual=response.status_code, status_code=400)
+        mock_send_emails.assert_not_called()
+
+    @patch("app.api.mailer.routes.send_emails", side_effect=AppException("Boom!"))
+    def test_reports_all_rejected_when_enqueue_fails(self, mock_send_emails):
+        """Test batch email api reports no message accepted when publishing the batch fails"""
+        response = self.test_client.post(self.batch_url, auth=self.auth, json=dict(messages=[self.message]))
+        response_json = response.json()
+
+        self.assertEqual(500, response_json.get("status"))
+        self.assertEqual(0, response_json.get("accepted"))
+
+    @patch("app.api.mailer.routes.send_emails", side_effect=PublisherBusyException())
+    def test_reports_service_unavailable_when_publisher_is_busy(self, mock_send_emails):
+        """Test batch email api asks clients to retry later when too many messages are waiting to be published"""
+        response = self.test_client.post(self.batch_url, auth=self.auth, json=dict(messages=[self.message]))
+
+        self.assertEqual(503, response.json().get("status"))
+
+
+class TestMultipartMailApi(BaseTestCase):
+    """
+    Test Multipart Mail API
+    """
+
+    multipart_url = "/api/v1/baruapepe/sendmail/multipart"
+
+    def setUp(self):
+        super().setUp()
+        self.auth = (get_config().username, get_config().password)
+        self.payload = json.dumps(rocket_message())
+        self.store_dir = tempfile.TemporaryDirectory()
+        self.store = AttachmentStore(path=self.store_dir.name)
+
+    def tearDown(self):
+        self.store_dir.cleanup()
+
+    @patch("app.api.mailer.routes.send_email")
+    def test_queues_references_to_uploaded_attachments(self, mock_send_email):
+        """Test multipart email api stores uploaded files & only queues references to them"""
+        with patch("app.api.mailer.routes.get_attachment_store", return_value=self.store):
+            response = self.test_client.post(
+                self.multipart_url,
+                auth=self.auth,
+                data=dict(payload=self.payload),
+                files=[("attachments", ("schematics.pdf", b"%PDF-rocket", "application/pdf"))],
+            )
+
+        self.assert_status(actual=response.status_code, status_code=200)
+        attachment = mock_send_email.call_args.args[0].attachments[0]
+        self.assertIsNone(attachment.content)
+        self.assertEqual("schematics.pdf", attachment.filename)
+        self.assertEqual("application/pdf", attachment.type)
+        self.assertEqual(b"%PDF-rocket", self.store.read(attachment.reference))
+
+    @patch("app.api.mailer.routes.send_email")
+    def test_queues_references_to_inline_attachments(self, mock_send_email):
+        """Test multipart email api moves base64 encoded attachments in the JSON payload into the attachment store"""
+        payload = dict(json.loads(self.payload), attachments=[
+            dict(content=base64.b64encode(b"%PDF-rocket").decode(), filename="schematics.pdf", type="application/pdf")
+        ])
+
+        with patch("app.api.mailer.routes.get_attachment_store", return_value=self.store), \
+                patch("app.services.attachments.attachment_store.get_attachment_store", return_value=self.store):
+            response = self.test_client.post(
+                self.multipart_url,
+                auth=self.auth,
+                data=dict(payload=json.dumps(payload)),
+                files=[("attachments", ("schematics.pdf", b"%PDF-rocket", "application/pdf"))],
+            )
+
+        self.assert_status(actual=response.status_code, status_code=200)
+        inline, upload = mock_send_email.call_args.args[0].attachments
+        self.assertIsNone(inline.content)
+        self.assertEqual(upload.reference, inline.reference)
+
+    @patch("app.api.mailer.routes.send_email")
+    def test_throws_400_with_invalid_payload(self, mock_send_email):
+        """Test multipart email api validates the JSON encoded email"""
+        response = self.test_client.post(self.multipart_url, auth=self.auth,
+                                         data=dict(payload=json.dumps(dict(subject="Rocket Schematics"))))
+
+        self.assert_status(actual=response.status_code, status_code=400)
+        mock_send_email.assert_not_called()
+
+
+class TestIdempotentMailApi(BaseTestCase):
+    """
+    Test Mail API with idempotency keys
+    """
+
+    sendmail_url = "/api/v1/baruapepe/sendmail"
+
+    def setUp(self):
+        super().setUp()
+        self.auth = (get_config().username, get_config().password)
+        self.message = rocket_message()
+        self.idempotency_dir = tempfile.TemporaryDirectory()
+        cache = IdempotencyCache(LocalIdempotencyBackend(self.idempotency_dir.name))
+        patcher = patch("app.api.mailer.routes.get_idempotency_cache", return_value=cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.idempotency_dir.cleanup)
+
+    @patch("app.api.mailer.routes.send_email")
+    def test_replays_response_to_repeated_request(self, mock_send_email):
+        """Test email api sends an email once per idempotency key & replays the response to repeats"""
+        headers = {"Idempotency-Key": "rocket-1"}
+
+        first = self.test_client.post(self.sendmail_url, auth=self.auth, json=self.message, headers=headers)
+        second = self.test_client.post(self.sendmail_url, auth=self.auth, json=self.message, headers=headers)
+
+        self.assert_status(actual=first.status_code, status_code=200)
+        self.assert_status(actual=second.status_code, status_code=200)
+        self.assertEqual(first.json(), second.json())
+        self.assertNotIn("idempotent-replayed", first.headers)
+        self.assertEqual("true", second.headers.get("idempotent-replayed"))
+        mock_send_email.assert_called_once()
+
+    @patch("app.api.mailer.routes.send_email")
+    def test_throws_422_when_key_is_reused_for_a_different_request(self, mock_send_email):
+        """Test email api refuses a request reusing the idempotency key of a different request"""
+        headers = {"Idempotency-Key": "rocket-2"}
+
+        self.test_client.post(self.sendmail_url, auth=self.auth, json=self.message, headers=headers)
+        response = self.test_client.post(self.sendmail_url, auth=self.auth,
+                                         json=dict(self.message, subject="Moon Schematics"), headers=headers)
+
+        self.assert_status(actual=response.status_code, status_code=422)
+        mock_send_email.assert_called_once()
+
+    @patch("app.api.mailer.routes.send_email", side_effect=AppException("Boom!"))
+    def test_does_not_keep_failed_responses(self, mock_send_email):
+        """Test email api handles a retry of a failed request again rather than replaying the failure"""
+        headers = {"Idempotency-Key": "rocket-3"}
+
+        for _ in range(2):
+            self.test_client.post(self.sendmail_url, auth=self.auth, json=self.message, headers=headers)
+
+        self.assertEqual(2, mock_send_email.call_count)
+
+
+class TestScheduledMailApi(BaseTestCase):
+    """
+    Test Mail API with scheduled sends
+    """
+
+    sendmail_url = "/api/v1/baruapepe/sendmail"
+
+    def setUp(self):
+        super().setUp()
+        self.auth = (get_config().username, get_config().password)
+        self.message = rocket_message()
+
+    @patch("app.domain.send_email.get_publisher")
+    @patch("app.domain.send_email.get_send_scheduler")
+    def test_schedules_emails_with_send_time(self, mock_get_send_scheduler, mock_get_publisher):
+        """Test email api schedules an email to be sent later instead of queueing it"""
+        send_at = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+
+        response = self.test_client.post(self.sendmail_url, auth=self.auth, json=dict(self.message, send_at=send_at))
+
+        self.assert_status(actual=response.status_code, status_code=200)
+        mock_get_send_scheduler.return_value.schedule.assert_called_once()
+        mock_get_publisher.return_value.publish.assert_not_called()
+
+    @patch("app.domain.send_email.get_publisher")
+    @patch("app.domain.send_email.get_send_scheduler")
+    def test_schedules_times_without_timezone_in_utc(self, mock_get_send_scheduler, mock_get_publisher):
+        """Test email api takes send times without a timezone to be in UTC"""
+        send_at = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0) + timedelta(hours=1)
+
+        response = self.test_client.post(self.sendmail_url, auth=self.auth,
+                                         json=dict(self.message, send_at=send_at.isoformat()))
+
+        self.assert_status(actual=response.status_code, status_code=200)
+        [scheduled] = mock_get_send_scheduler.return_value.schedule.call_args.args[0]
+        self.assertEqual(send_at.replace(tzinfo=timezone.utc), scheduled.send_at)
+
+    @patch("app.api.mailer.routes.send_email")
+    def test_throws_400_with_send_time_beyond_horizon(self, mock_send_email):
+        """Test email api refuses emails scheduled further ahead than the scheduling horizon"""
+        send_at = datetime.now(timezone.utc) + timedelta(seconds=get_config().schedule_max_delay + 60)
+
+        response = self.test_client.post(self.sendmail_url, auth=self.auth,
+                                         json=dict(self.message, send_at=send_at.isoformat()))
+
+        self.assert_status(actual=response.status_code, status_code=400)
+        mock_send_email.assert_not_called()
+
+
 if __name__ == '__main__':
     unittest.main()
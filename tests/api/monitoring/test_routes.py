@@ -12,6 +12,18 @@ class MonitoringRoutesTestCase(BaseTestCase):
         self.assertEqual(200, response.status_code)
         self.assertEqual({"message": "Healthy!"}, response.json())
 
+    def test_metrics_route(self):
+        """Metrics route should expose request latency by route template"""
+        self.test_client.get("/healthz")
+
+        response = self.test_client.get("/metrics")
+
+        self.assertEqual(200, response.status_code)
+        self.assertIn(
+            'barua_http_request_duration_seconds_count{method="GET",route="/healthz",status="200"}',
+            response.text,
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
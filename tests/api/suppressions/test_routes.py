@@ -0,0 +1,61 @@
+import os
+import tempfile
+from unittest.mock import patch
+from tests import BaseTestCase
+from app.config import get_config
+from app.services.suppression import SuppressionList, SuppressionStore
+
+base_url = "/api/v1/baruapepe"
+
+
+class TestSuppressionApi(BaseTestCase):
+    """
+    Test Suppression API
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.auth = (get_config().username, get_config().password)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.suppression_list = SuppressionList(
+            SuppressionStore(os.path.join(directory.name, "suppressions.db")), refresh_interval=0
+        )
+        patcher = patch("app.api.suppressions.routes.get_suppression_list", return_value=self.suppression_list)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_adds_gets_and_removes_suppressions(self):
+        """Test suppression api suppresses addresses, returns them & lifts their suppression"""
+        response = self.test_client.post(f"{base_url}/suppressions", auth=self.auth, json=dict(
+            suppressions=[dict(email="jane@example.com", reason="unsubscribe"), dict(email="john@example.com")]))
+
+        self.assert_status(actual=response.status_code, status_code=200)
+        response = self.test_client.get(f"{base_url}/suppressions/John@example.com", auth=self.auth)
+        self.assertEqual("manual", response.json()["data"]["reason"])
+
+        response = self.test_client.delete(f"{base_url}/suppressions/jane@example.com", auth=self.auth)
+        self.assert_status(actual=response.status_code, status_code=200)
+        response = self.test_client.get(f"{base_url}/suppressions/jane@example.com", auth=self.auth)
+        self.assert_status(actual=response.status_code, status_code=404)
+
+    def test_throws_400_with_invalid_address(self):
+        """Test suppression api refuses invalid addresses"""
+        response = self.test_client.post(f"{base_url}/suppressions", auth=self.auth,
+                                         json=dict(suppressions=[dict(email="not-an-address")]))
+
+        self.assert_status(actual=response.status_code, status_code=400)
+
+    def test_imports_csv_file(self):
+        """Test suppression api imports valid lines of a CSV file & counts the others"""
+        contents = (
+            b"email,reason\njane@example.com,bounce\njohn@example.com\n"
+            b"not-an-address,bounce\njim@example.com,x\n"
+        )
+
+        response = self.test_client.post(f"{base_url}/suppressions/import", auth=self.auth,
+                                         files=dict(file=("suppressions.csv", contents, "text/csv")))
+
+        self.assert_status(actual=response.status_code, status_code=200)
+        self.assertEqual(dict(added=2, rejected=2), response.json()["data"])
+        self.assertEqual("bounce", self.suppression_list.get("jane@example.com")["reason"])
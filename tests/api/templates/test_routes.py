@@ -0,0 +1,87 @@
+import tempfile
+from unittest.mock import patch
+from tests import BaseTestCase
+from app.config import get_config
+from app.services.templates import TemplateEngine, TemplateStore
+
+base_url = "/api/v1/baruapepe"
+
+
+class TestTemplateApi(BaseTestCase):
+    """
+    Test Template API
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.auth = (get_config().username, get_config().password)
+        self.store_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.store_dir.cleanup)
+        store = TemplateStore(self.store_dir.name)
+        engine = TemplateEngine(store)
+        for target, value in (
+            ("app.api.templates.routes.get_template_store", store),
+            ("app.api.templates.routes.get_template_engine", engine),
+            ("app.api.mailer.routes.get_template_store", store),
+            ("app.api.mailer.routes.get_template_engine", engine),
+        ):
+            patcher = patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def register(self, subject="Hello {{ name }}", message="Welcome aboard"):
+        return self.test_client.post(f"{base_url}/templates", auth=self.auth,
+                                     json=dict(subject=subject, message=message))
+
+    def test_registers_and_gets_templates(self):
+        """Test template api stores a template & returns it by its id"""
+        response = self.register()
+        template_id = response.json()["data"]["template_id"]
+
+        self.assert_status(actual=response.status_code, status_code=200)
+        response = self.test_client.get(f"{base_url}/templates/{template_id}", auth=self.auth)
+        self.assertEqual("Hello {{ name }}", response.json()["data"]["subject"])
+
+        response = self.test_client.delete(f"{base_url}/templates/{template_id}", auth=self.auth)
+        self.assert_status(actual=response.status_code, status_code=200)
+        response = self.test_client.get(f"{base_url}/templates/{template_id}", auth=self.auth)
+        self.assert_status(actual=response.status_code, status_code=404)
+
+    def test_throws_400_with_invalid_template(self):
+        """Test template api refuses templates that do not compile"""
+        response = self.register(subject="Hello {{ name")
+
+        self.assert_status(actual=response.status_code, status_code=400)
+
+    @patch("app.api.mailer.routes.send_email")
+    def test_sends_email_with_template(self, mock_send_email):
+        """Test email api queues the template id & variables of an email rather than its content"""
+        template_id = self.register().json()["data"]["template_id"]
+        message = {
+            "from": {"email": "ninja@example.com", "name": "Ninja"},
+            "to": [{"email": "johndoe@example.com"}],
+            "template_id": template_id,
+            "variables": {"name": "John"},
+        }
+
+        response = self.test_client.post(f"{base_url}/sendmail", auth=self.auth, json=message)
+
+        self.assert_status(actual=response.status_code, status_code=200)
+        email_request = mock_send_email.call_args.args[0]
+        self.assertEqual(template_id, email_request.template_id)
+        self.assertIsNone(email_request.message)
+
+    @patch("app.api.mailer.routes.send_email")
+    def test_throws_400_with_missing_template_variables(self, mock_send_email):
+        """Test email api refuses emails whose template cannot be rendered with the given variables"""
+        template_id = self.register().json()["data"]["template_id"]
+        message = {
+            "from": {"email": "ninja@example.com", "name": "Ninja"},
+            "to": [{"email": "johndoe@example.com"}],
+            "template_id": template_id,
+        }
+
+        response = self.test_client.post(f"{base_url}/sendmail", auth=self.auth, json=message)
+
+        self.assert_status(actual=response.status_code, status_code=400)
+        mock_send_email.assert_not_called()
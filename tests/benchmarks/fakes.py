@@ -0,0 +1,183 @@
+"""
+Local stand-ins for the services emails are delivered to, so that benchmarks run offline: an SMTP sink that accepts &
+discards messages, and a fake mail API answering the SendGrid & Mailchimp send endpoints. Both note when each message
+arrived by the subject it was sent with.
+"""
+import json
+import re
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+_subject_header = re.compile(rb"^Subject: (.*)$", re.IGNORECASE | re.MULTILINE)
+
+
+class Deliveries:
+    """
+    Arrival times of delivered messages, by subject. A message sent to several recipients in separate transactions is
+    counted once per transaction
+    """
+
+    def __init__(self):
+        self.arrivals: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def record(self, subject: str):
+        """
+        Notes the arrival of a message
+        """
+        with self._changed:
+            self.arrivals.setdefault(subject, []).append(time.time())
+            self._changed.notify_all()
+
+    @property
+    def copies(self) -> int:
+        """
+        Number of copies delivered, over all messages
+        """
+        with self._lock:
+            return sum(len(times) for times in self.arrivals.values())
+
+    def wait_for(self, count: int, timeout: float) -> bool:
+        """
+        Waits until count distinct messages were delivered. Returns False if that did not happen within timeout seconds
+        """
+        with self._changed:
+            return self._changed.wait_for(
+                lambda: len(self.arrivals) >= count, timeout=timeout
+            )
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    # replies to pipelined commands are written one by one, which Nagle's algorithm would hold back, unlike a relay
+    # that answers them in a single write
+    disable_nagle_algorithm = True
+
+    # pylint: disable=too-many-branches
+    def handle(self):
+        self._reply(b"220 localhost ESMTP sink")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self._reply(
+                    b"250-localhost", b"250-PIPELINING", b"250-AUTH PLAIN LOGIN", b"250 8BITMIME"
+                )
+            elif command == b"HELO":
+                self._reply(b"250 localhost")
+            elif command == b"AUTH":
+                self._reply(b"235 Authentication successful")
+            elif command in (b"MAIL", b"RCPT", b"RSET", b"NOOP"):
+                self._reply(b"250 OK")
+            elif command == b"DATA":
+                self._reply(b"354 End data with <CR><LF>.<CR><LF>")
+                self._receive()
+                self._reply(b"250 OK queued")
+            elif command == b"QUIT":
+                self._reply(b"221 Bye")
+                return
+            else:
+                self._reply(b"502 Command not implemented")
+
+    def _receive(self):
+        headers, in_headers = [], True
+        for line in self.rfile:
+            if line in (b".\r\n", b".\n"):
+                break
+            if in_headers:
+                if line in (b"\r\n", b"\n"):
+                    in_headers = False
+                else:
+                    headers.append(line)
+        match = _subject_header.search(b"".join(headers))
+        self.server.deliveries.record(match.group(1).strip().decode() if match else "")
+
+    def _reply(self, *lines: bytes):
+        self.wfile.write(b"".join(line + b"\r\n" for line in lines))
+        self.wfile.flush()
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    """
+    SMTP relay that accepts every message it is sent & throws it away. Supports PIPELINING & accepts any credentials
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, deliveries: Deliveries, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _SmtpHandler)
+        self.deliveries = deliveries
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        super().__exit__(*args)
+
+
+class _MailApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    # pylint: disable=invalid-name
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.startswith("/v3/mail/send"):
+            # SendGrid sends one copy per personalization
+            request = json.loads(body)
+            for _ in request.get("personalizations") or [{}]:
+                self.server.deliveries.record(request.get("subject", ""))
+            self._respond(202, b"")
+        elif self.path.startswith("/messages/send"):
+            message = json.loads(body).get("message", {})
+            self.server.deliveries.record(message.get("subject", ""))
+            self._respond(200, json.dumps([dict(status="sent")]).encode())
+        else:
+            # users/ping & anything else the clients check the API with
+            self._respond(200, b'"PONG!"')
+
+    def _respond(self, code: int, body: bytes):
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+class FakeMailApi(ThreadingHTTPServer):
+    """
+    HTTP server standing in for the SendGrid & Mailchimp APIs, point MAIL_API_URL at its url
+    """
+
+    daemon_threads = True
+
+    def __init__(self, deliveries: Deliveries, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _MailApiHandler)
+        self.deliveries = deliveries
+
+    @property
+    def url(self) -> str:
+        """
+        Base URL of the API
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        super().__exit__(*args)
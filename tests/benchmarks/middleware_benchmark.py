@@ -0,0 +1,104 @@
+"""
+Benchmarks the request middleware against the app.middleware("http") stack it replaced. Requests are driven straight
+through the ASGI interface, without a server or network, so the numbers reflect the cost of the middleware layer.
+
+Run with: python -m tests.benchmarks.middleware_benchmark [requests]
+"""
+import asyncio
+import sys
+import time
+from fastapi import FastAPI, Request
+from app.infra.middleware import RequestMiddleware
+from app.logger import log
+
+
+def base_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/sendmail")
+    async def sendmail():
+        return {"status": 200, "message": "Email sent out successfully"}
+
+    return app
+
+
+def http_middleware_app() -> FastAPI:
+    """The previous stack, two middlewares registered with app.middleware("http")"""
+    app = base_app()
+
+    @app.middleware("http")
+    async def log_request_time(request: Request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        log.info(f"Request: {request.url} took {process_time}")
+        return response
+
+    @app.middleware("http")
+    async def after_request(request: Request, call_next):
+        response = await call_next(request)
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["server"] = "Barua Pepe"
+        return response
+
+    return app
+
+
+def asgi_middleware_app() -> FastAPI:
+    app = base_app()
+    app.add_middleware(RequestMiddleware)
+    return app
+
+
+async def run(app: FastAPI, requests: int) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/sendmail",
+        "raw_path": b"/sendmail",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"content-length", b"0")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 5000),
+    }
+
+    async def send(_message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        # the request body, then a disconnect as a server reports once the response has been sent
+        messages = iter([{"type": "http.request", "body": b"", "more_body": False}])
+
+        # pylint: disable=cell-var-from-loop
+        async def receive():
+            return next(messages, {"type": "http.disconnect"})
+
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - started
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    # request logging is part of both stacks, but writing the lines out would drown the middleware cost
+    log.remove()
+
+    for name, app in (
+        ("app.middleware(http)", http_middleware_app()),
+        ("RequestMiddleware", asgi_middleware_app()),
+    ):
+        asyncio.run(run(app, 100))
+        elapsed = asyncio.run(run(app, requests))
+        print(
+            f"{name:<24} {requests / elapsed:>10.0f} req/s {elapsed / requests * 1e6:>8.1f} us/req"
+        )
+
+
+if __name__ == "__main__":
+    main()
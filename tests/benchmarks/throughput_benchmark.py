@@ -0,0 +1,264 @@
+"""
+End to end throughput benchmark. Emails are posted to the API, queued on an in-memory broker, picked up by workers in
+the same process & delivered to a local SMTP sink or a fake SendGrid/Mailchimp API, so the whole path runs offline &
+the numbers can be compared from one commit to the next. Reports the rate the API accepted emails at, the rate they were
+delivered at, end to end latency percentiles & the memory used by the application.
+
+The API & the workers run in a process of their own, started once the environment points at the stand-ins, since the
+settings are read when the app modules are first imported. The stand-ins stay in this process & are left out of the
+memory figures.
+
+Run with: python -m tests.benchmarks.throughput_benchmark [--messages 1000] [--recipients 1] [--attachment-size 0]
+"""
+# pylint: disable=import-outside-toplevel
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List
+
+from tests.benchmarks.fakes import Deliveries, FakeMailApi, SmtpSink
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--recipients", type=int, default=1, help="recipients per email")
+    parser.add_argument("--fanout", action="store_true", help="send a copy to each recipient")
+    parser.add_argument("--attachments", type=int, default=1, help="attachments per email")
+    parser.add_argument("--attachment-size", type=int, default=0, help="size of each attachment in KiB")
+    parser.add_argument("--provider", choices=["smtp", "sendgrid", "mailchimp"], default="smtp")
+    parser.add_argument("--consumer", choices=["celery", "batch"], default="celery")
+    parser.add_argument("--workers", type=int, default=4, help="worker threads")
+    parser.add_argument("--concurrency", type=int, default=50, help="API requests in flight")
+    parser.add_argument("--timeout", type=float, default=300.0, help="seconds to wait for deliveries")
+    return parser.parse_args()
+
+
+def configure(arguments: argparse.Namespace, smtp_port: int, api_url: str, root: str):
+    """
+    Points the application at the local stand-ins through the environment, which the app process inherits
+    """
+    os.environ.update(
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=str(smtp_port),
+        MAIL_API_URL=api_url,
+        MAIL_API_TOKEN="benchmark",
+        MAIL_PROVIDERS=json.dumps([arguments.provider]),
+        MAIL_FALLBACK_PROVIDERS="[]",
+        MAIL_POOL_MAX_SIZE=str(arguments.workers),
+        ATTACHMENT_STORE_PATH=os.path.join(root, "attachments"),
+        TEMPLATE_STORE_PATH=os.path.join(root, "templates"),
+        RATE_LIMIT_PATH=os.path.join(root, "ratelimit"),
+        IDEMPOTENCY_PATH=os.path.join(root, "idempotency"),
+        SCHEDULE_PATH=os.path.join(root, "schedule.db"),
+    )
+
+
+def payload(arguments: argparse.Namespace, subject: str) -> Dict[str, Any]:
+    attachment = base64.b64encode(os.urandom(arguments.attachment_size * 1024)).decode()
+    return {
+        "from": {"email": "sender@example.com", "name": "Benchmark"},
+        "to": [dict(email=f"user{index}@example.com") for index in range(arguments.recipients)],
+        "subject": subject,
+        "message": "Benchmark message",
+        "fanout": arguments.fanout,
+        "attachments": [
+            dict(content=attachment, filename=f"attachment{index}.bin", type="application/octet-stream")
+            for index in range(arguments.attachments if arguments.attachment_size else 0)
+        ],
+    }
+
+
+async def post_emails(arguments: argparse.Namespace, sent: Dict[str, float]) -> int:
+    """
+    Posts the emails to the API, concurrency at a time, noting when each was posted. Returns the number of failed
+    requests
+    """
+    import httpx
+    from app import app
+    from app.config import config
+
+    semaphore = asyncio.Semaphore(arguments.concurrency)
+    failures = 0
+
+    async with httpx.AsyncClient(
+        app=app, base_url="http://benchmark", auth=(config.username, config.password)
+    ) as client:
+
+        async def post(index: int):
+            nonlocal failures
+            subject = f"benchmark-{index:07d}"
+            body = payload(arguments, subject)
+            async with semaphore:
+                sent[subject] = time.time()
+                response = await client.post(f"{config.base_url}/sendmail", json=body)
+            if response.status_code != 200 or response.json().get("status") != 200:
+                failures += 1
+                del sent[subject]
+
+        await asyncio.gather(*(post(index) for index in range(arguments.messages)))
+    return failures
+
+
+def start_workers(arguments: argparse.Namespace, stack: ExitStack):
+    """
+    Starts Celery workers on threads, with the batch consumer taking the place of the mail sending worker if asked for
+    """
+    from celery.contrib.testing.worker import start_worker
+    from app.worker.batch_consumer import BatchConsumer
+    from app.worker.celery_app import celery_app
+    from app.worker.queues import BARUA_QUEUE_NAME
+
+    # the in-memory transport is polled, & acks of late acknowledged tasks are only sent between polls, which wait up to
+    # two seconds once a worker has taken as many messages as it may. Taking any number & polling often keeps workers
+    # busy as they would be on RabbitMQ
+    celery_app.conf.update(
+        broker_url="memory://",
+        broker_transport_options=dict(polling_interval=0.001),
+        worker_prefetch_multiplier=0,
+        result_backend="cache+memory://",
+        task_ignore_result=True,
+    )
+    celery_app.loader.import_default_modules()
+    queues = [queue.name for queue in celery_app.conf.task_queues]
+
+    if arguments.consumer == "batch":
+        consumer = BatchConsumer(queues=[BARUA_QUEUE_NAME])
+        thread = threading.Thread(target=consumer.run, daemon=True)
+        thread.start()
+        stack.callback(thread.join)
+        stack.callback(consumer.stop)
+        queues.remove(BARUA_QUEUE_NAME)
+
+    stack.enter_context(
+        start_worker(
+            celery_app,
+            concurrency=arguments.workers,
+            pool="threads",
+            perform_ping_check=False,
+            queues=queues,
+        )
+    )
+
+
+def run_app(arguments: argparse.Namespace, results: Connection, delivered):
+    """
+    Runs the API & the workers, posts the emails & keeps the workers running until they were all delivered
+    """
+    from app.logger import log
+    from app.worker.publisher import get_publisher
+
+    # every log line would otherwise be written out, drowning the cost of sending
+    log.remove()
+
+    with ExitStack() as stack:
+        start_workers(arguments, stack)
+        stack.callback(get_publisher().stop, timeout=10)
+
+        sent: Dict[str, float] = {}
+        rss_start = rss_megabytes()
+        started = time.time()
+        failures = asyncio.run(post_emails(arguments, sent))
+        results.send(
+            dict(sent=sent, failures=failures, started=started, posted=time.time(), rss_start=rss_start)
+        )
+
+        delivered.wait(arguments.timeout)
+        results.send(dict(rss_end=rss_megabytes(), rss_peak=peak_rss_megabytes()))
+
+
+def rss_megabytes() -> float:
+    """
+    Current resident set size, from /proc where available & the peak otherwise
+    """
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return peak_rss_megabytes()
+
+
+def peak_rss_megabytes() -> float:
+    # ru_maxrss is reported in KiB on Linux & in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if os.uname().sysname == "Darwin" else peak / 2**10
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(arguments: argparse.Namespace, deliveries: Deliveries, results: Dict[str, Any], finished: float):
+    sent = results["sent"]
+    latencies = [
+        (max(deliveries.arrivals[subject]) - posted) * 1000
+        for subject, posted in sent.items()
+        if subject in deliveries.arrivals
+    ]
+    elapsed = finished - results["started"]
+
+    print(
+        f"{arguments.messages} emails to {arguments.recipients} recipients{' (fan-out)' if arguments.fanout else ''} "
+        f"with {arguments.attachments if arguments.attachment_size else 0} x {arguments.attachment_size} KiB "
+        f"attachments via {arguments.provider}, {arguments.consumer} consumer with {arguments.workers} workers"
+    )
+    print(
+        f"{'accepted':<12} {len(sent) / (results['posted'] - results['started']):>10.1f} emails/s "
+        f"({results['failures']} failed)"
+    )
+    print(
+        f"{'delivered':<12} {len(latencies) / elapsed:>10.1f} emails/s {deliveries.copies / elapsed:>10.1f} copies/s "
+        f"({len(sent) - len(latencies)} missing)"
+    )
+    if latencies:
+        print(
+            f"{'latency ms':<12} p50 {percentile(latencies, 0.5):.1f} p90 {percentile(latencies, 0.9):.1f} "
+            f"p99 {percentile(latencies, 0.99):.1f} max {max(latencies):.1f} mean {statistics.mean(latencies):.1f}"
+        )
+    print(
+        f"{'rss MiB':<12} start {results['rss_start']:.1f} end {results['rss_end']:.1f} "
+        f"peak {results['rss_peak']:.1f}"
+    )
+
+
+def main():
+    arguments = parse_arguments()
+    deliveries = Deliveries()
+    context = multiprocessing.get_context("spawn")
+
+    with ExitStack() as stack:
+        root = stack.enter_context(tempfile.TemporaryDirectory())
+        sink = stack.enter_context(SmtpSink(deliveries))
+        mail_api = stack.enter_context(FakeMailApi(deliveries))
+        configure(arguments, sink.server_address[1], mail_api.url, root)
+
+        receiver, sender = context.Pipe(duplex=False)
+        delivered = context.Event()
+        process = context.Process(target=run_app, args=(arguments, sender, delivered))
+        process.start()
+        stack.callback(process.join)
+        stack.callback(delivered.set)
+
+        results = receiver.recv()
+        if not deliveries.wait_for(len(results["sent"]), timeout=arguments.timeout):
+            print(f"Timed out waiting for deliveries after {arguments.timeout} seconds")
+        finished = time.time()
+        delivered.set()
+        results.update(receiver.recv())
+
+        report(arguments, deliveries, results, finished)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmarks validating a send request with 1, 100 & 1000 recipients, from the parsed JSON body to the email request that
+is queued. Compares the previous path, which validated the payload & then the email request built from it, against the
+single validation pass, once with addresses that were not seen before & once with addresses that are in the cache.
+
+Run with: python -m tests.benchmarks.validation_benchmark [requests]
+"""
+import sys
+import time
+from typing import Any, Callable, Dict
+from app.api.mailer.dto import EmailRequestDto
+from app.api.mailer.routes import _to_email_request
+from app.domain.entities import EmailRequest
+from app.domain.entities.email_address import _validate
+
+
+def body(recipients: int, run: int) -> Dict[str, Any]:
+    return {
+        "from": {"email": "sender@example.com", "name": "Benchmark"},
+        "to": [dict(email=f"user{index}.{run}@example.com", name=f"User {index}") for index in range(recipients)],
+        "subject": "Benchmark",
+        "message": "Benchmark message",
+    }
+
+
+def revalidated(payload: Dict[str, Any]) -> EmailRequest:
+    """The previous path, which built the email request from the validated payload & validated it again"""
+    dto = EmailRequestDto.parse_obj(payload)
+    return EmailRequest(
+        sender=dto.from_,
+        recipients=dto.to,
+        ccs=dto.cc,
+        bccs=dto.bcc,
+        subject=dto.subject,
+        message=dto.message,
+        attachments=dto.attachments,
+        fanout=dto.fanout,
+        priority=dto.priority,
+        send_at=dto.send_at,
+    )
+
+
+def single_pass(payload: Dict[str, Any]) -> EmailRequest:
+    return _to_email_request(EmailRequestDto.parse_obj(payload))
+
+
+def run(validate: Callable[[Dict[str, Any]], EmailRequest], recipients: int, requests: int, cached: bool) -> float:
+    """
+    Validates requests bodies. Every body has addresses of its own unless cached is set, in which case they are all the
+    same & their validation is cached after the first one. Returns seconds per request
+    """
+    _validate.cache_clear()
+    bodies = [body(recipients, 0 if cached else run_index) for run_index in range(requests)]
+    validate(bodies[0])
+
+    started = time.perf_counter()
+    for payload in bodies:
+        validate(payload)
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    print(f"{'recipients':>10} {'revalidated':>14} {'single pass':>14} {'cached':>14}")
+    for recipients in (1, 100, 1000):
+        # keep the total number of addresses validated roughly the same for each size
+        count = max(3, requests // recipients)
+        timings = [
+            run(revalidated, recipients, count, cached=False),
+            run(single_pass, recipients, count, cached=False),
+            run(single_pass, recipients, count, cached=True),
+        ]
+        print(f"{recipients:>10} " + " ".join(f"{timing * 1e6:>11.1f} us" for timing in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import unittest
+from unittest.mock import patch
+from pydantic import BaseModel, ValidationError
+from app.domain.entities import EmailAddress
+from app.domain.entities.email_address import _validate
+
+
+class Participant(BaseModel):
+    email: EmailAddress
+
+
+class EmailAddressTestCases(unittest.TestCase):
+
+    def setUp(self):
+        _validate.cache_clear()
+
+    def test_normalizes_addresses_as_email_str(self):
+        """Email addresses should be normalized the way EmailStr normalizes them"""
+        self.assertEqual("JohnDoe@example.com", Participant(email="JohnDoe@EXAMPLE.com").email)
+
+    def test_validates_repeated_addresses_once(self):
+        """Email addresses that were seen before should not be validated again"""
+        with patch("app.domain.entities.email_address.validate_email",
+                   return_value=("johndoe", "johndoe@example.com")) as mock_validate_email:
+            for _ in range(3):
+                Participant(email="johndoe@example.com")
+
+        mock_validate_email.assert_called_once_with("johndoe@example.com")
+
+    def test_rejects_invalid_addresses_every_time(self):
+        """Invalid email addresses should be rejected each time they are seen"""
+        for _ in range(2):
+            with self.assertRaises(ValidationError):
+                Participant(email="not an email address")
+
+
+if __name__ == "__main__":
+    unittest.main()
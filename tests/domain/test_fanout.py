@@ -0,0 +1,58 @@
+import unittest
+from app.domain.entities import EmailRequest
+from app.domain.fanout import group_recipients, split_recipients
+
+
+def email_request(*recipients, **kwargs):
+    data = dict(
+        sender=dict(email="johndoe@example.com", name="John Doe"),
+        recipients=[dict(email=recipient, name=recipient) for recipient in recipients],
+        subject="Hello!",
+        message="Testing 1 2 3",
+    )
+    data.update(kwargs)
+    return EmailRequest(**data)
+
+
+class FanoutTestCases(unittest.TestCase):
+
+    def test_groups_messages_with_identical_content(self):
+        """Messages sharing sender, subject & message should be merged into a single fan-out message"""
+        grouped = group_recipients(
+            [email_request(f"user{index}@example.com") for index in range(5)]
+        )
+
+        self.assertEqual(1, len(grouped))
+        self.assertTrue(grouped[0].fanout)
+        self.assertEqual(5, len(grouped[0].recipients))
+
+    def test_does_not_group_messages_with_different_content(self):
+        """Messages with a different subject, priority or carbon copies should be passed through as they are"""
+        cc = [dict(email="boss@example.com", name="Boss")]
+        messages = [
+            email_request("jane@example.com"),
+            email_request("john@example.com", subject="Other"),
+            email_request("jim@example.com", ccs=cc),
+            email_request("jill@example.com", "jack@example.com"),
+            email_request("joe@example.com", priority="bulk"),
+        ]
+
+        grouped = group_recipients(messages)
+
+        self.assertEqual(messages, grouped)
+        self.assertFalse(any(message.fanout for message in grouped))
+
+    def test_splits_oversized_recipient_lists(self):
+        """Fan-out messages should be split into messages of at most max_recipients recipients"""
+        message = email_request(
+            *[f"user{index}@example.com" for index in range(25)], fanout=True
+        )
+
+        split = split_recipients(message, max_recipients=10)
+
+        self.assertEqual([10, 10, 5], [len(part.recipients) for part in split])
+        self.assertTrue(all(part.fanout for part in split))
+
+
+if __name__ == '__main__':
+    unittest.main()
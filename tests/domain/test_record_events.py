@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from app.domain.record_events import record_events
+from app.services.analytics import MinuteSeries
+from app.services.events import EventStore
+from app.services.suppression import SuppressionList, SuppressionStore
+
+
+class RecordEventsTestCases(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.suppression_list = SuppressionList(
+            SuppressionStore(os.path.join(directory.name, "suppressions.db")), refresh_interval=0
+        )
+        self.event_store = EventStore(os.path.join(directory.name, "events.db"))
+        self.series = MinuteSeries(slots=5)
+        for target, value in (
+            ("app.domain.record_events.get_suppression_list", self.suppression_list),
+            ("app.domain.record_events.get_event_store", self.event_store),
+            ("app.domain.record_events.get_minute_series", self.series),
+        ):
+            patcher = patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_suppresses_bounced_complaining_and_unsubscribed_addresses(self):
+        """Hard bounces, complaints & unsubscribes should suppress the address, other events should not"""
+        events = [
+            dict(provider="sendgrid", message_id="a", email="Jane@example.com", event="bounced", timestamp=1),
+            dict(provider="sendgrid", message_id="b", email="john@example.com", event="soft_bounced", timestamp=1),
+            dict(provider="mailchimp", message_id="c", email="jim@example.com", event="complained", timestamp=1),
+            dict(provider="mailchimp", message_id="d", email="jill@example.com", event="opened", timestamp=1),
+        ]
+
+        record_events(events)
+
+        self.assertEqual(
+            {"jane@example.com", "jim@example.com"},
+            self.suppression_list.suppressed(event["email"] for event in events),
+        )
+        self.assertEqual("complaint", self.suppression_list.get("jim@example.com")["reason"])
+        self.assertEqual("soft_bounced", self.event_store.get("sendgrid", "b")[0]["event"])
+
+    def test_counts_retried_batches_once(self):
+        """Recording a batch again, as a retried task does, should not count its events twice"""
+        events = [dict(provider="sendgrid", message_id="a", email="jane@example.com", event="bounced", timestamp=1)]
+
+        record_events(events)
+        record_events(events)
+
+        self.assertEqual(1, self.event_store.get("sendgrid", "a")[0]["counts"]["bounced"])
+        self.assertEqual([1], [row[-1] for row in self.series.drain()])
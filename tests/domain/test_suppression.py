@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from app.domain.entities import EmailRequest
+from app.domain.suppression import drop_suppressed, drop_suppressed_payloads
+from app.services.suppression import SuppressionList, SuppressionStore
+
+
+def email_request(*recipients, **kwargs):
+    data = dict(
+        sender=dict(email="johndoe@example.com", name="John Doe"),
+        recipients=[dict(email=recipient, name=recipient) for recipient in recipients],
+        subject="Hello!",
+        message="Testing 1 2 3",
+    )
+    data.update(kwargs)
+    return EmailRequest(**data)
+
+
+class SuppressionTestCases(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        suppression_list = SuppressionList(
+            SuppressionStore(os.path.join(directory.name, "suppressions.db")), refresh_interval=0
+        )
+        suppression_list.add([("bounced@example.com", "bounce")])
+        patcher = patch("app.domain.suppression.get_suppression_list", return_value=suppression_list)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_leaves_suppressed_recipients_out(self):
+        """Suppressed recipients, ccs & bccs should be removed & requests without recipients dropped"""
+        cc = [dict(email="Bounced@example.com", name="Bounced")]
+        requests = [
+            email_request("jane@example.com", "bounced@example.com", ccs=cc),
+            email_request("bounced@example.com"),
+            email_request("john@example.com"),
+        ]
+
+        kept = drop_suppressed(requests)
+
+        self.assertEqual(2, len(kept))
+        self.assertEqual(["jane@example.com"], [recipient.email for recipient in kept[0].recipients])
+        self.assertIsNone(kept[0].ccs)
+        self.assertIs(requests[2], kept[1])
+
+    def test_leaves_suppressed_recipients_out_of_payloads(self):
+        """Suppressed recipients should be removed from scheduled payloads as well"""
+        payloads = [
+            email_request("jane@example.com", "bounced@example.com").dict(exclude_none=True),
+            email_request("bounced@example.com").dict(exclude_none=True),
+        ]
+
+        kept = drop_suppressed_payloads(payloads)
+
+        self.assertEqual(1, len(kept))
+        self.assertEqual(["jane@example.com"], [recipient["email"] for recipient in kept[0]["recipients"]])
@@ -0,0 +1,33 @@
+import unittest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from app.infra.middleware import RequestMiddleware
+
+
+class RequestMiddlewareTestCases(unittest.TestCase):
+
+    def setUp(self):
+        app = FastAPI()
+        app.add_middleware(RequestMiddleware, server_name="Barua Pepe")
+
+        @app.get("/stream")
+        def stream():
+            headers = {"X-Frame-Options": "SAMEORIGIN"}
+            return StreamingResponse(iter([b"rocket ", b"schematics"]), headers=headers)
+
+        self.test_client = TestClient(app=app)
+
+    def test_adds_security_headers(self):
+        """Request middleware should set the security headers, replacing any set by the endpoint"""
+        response = self.test_client.get("/stream")
+
+        self.assertEqual(b"rocket schematics", response.content)
+        self.assertEqual("DENY", response.headers["x-frame-options"])
+        self.assertEqual("nosniff", response.headers["x-content-type-options"])
+        self.assertEqual("1; mode=block", response.headers["x-xss-protection"])
+        self.assertEqual("Barua Pepe", response.headers["server"])
+
+
+if __name__ == '__main__':
+    unittest.main()
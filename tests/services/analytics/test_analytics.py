@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from app.services.analytics import AnalyticsStore, MinuteSeries
+
+
+class MinuteSeriesTestCases(unittest.TestCase):
+
+    def test_counts_outcomes_per_minute_and_series(self):
+        """Outcomes should be counted per series & minute, & only drained once"""
+        series = MinuteSeries(slots=5)
+        series.record("sender", "jane@example.com", "sent", timestamp=600)
+        series.record("sender", "jane@example.com", "sent", timestamp=659)
+        series.record("sender", "jane@example.com", "failed", timestamp=660)
+        series.record("provider", "smtp", "bounced", 3, timestamp=600)
+
+        self.assertEqual(
+            sorted([("sender", "jane@example.com", 10, 2, 0, 0), ("sender", "jane@example.com", 11, 0, 1, 0),
+                    ("provider", "smtp", 10, 0, 0, 3)]),
+            sorted(series.drain()),
+        )
+        self.assertEqual([], series.drain())
+
+    def test_reuses_slots_of_minutes_that_left_the_ring(self):
+        """A slot should be taken over by a later minute, & minutes that already left the ring should be ignored"""
+        series = MinuteSeries(slots=5)
+        series.record("provider", "smtp", "sent", timestamp=600)
+        series.record("provider", "smtp", "sent", timestamp=900)
+        series.record("provider", "smtp", "sent", timestamp=600)
+
+        self.assertEqual([("provider", "smtp", 15, 1, 0, 0)], series.drain())
+
+    def test_forgets_idle_series(self):
+        """Series should be kept until nothing was recorded in them over a whole ring"""
+        series = MinuteSeries(slots=5)
+        series.record("sender", "jane@example.com", "sent", timestamp=600)
+        series.record("sender", "john@example.com", "sent", timestamp=780)
+
+        series.drain(now=600)
+        series.drain(now=840)
+        self.assertEqual({("sender", "jane@example.com"), ("sender", "john@example.com")}, set(series._rings))
+
+        series.drain(now=900)
+        self.assertEqual({("sender", "john@example.com")}, set(series._rings))
+
+
+class AnalyticsStoreTestCases(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = AnalyticsStore(os.path.join(directory.name, "analytics.db"), retention=3600)
+
+    def test_sums_counts_of_the_same_minute(self):
+        """Counts of the same series & minute drained by several processes should be added up"""
+        self.store.add([("sender", "jane@example.com", 10, 2, 0, 0), ("sender", "john@example.com", 10, 1, 0, 0)],
+                       now=600)
+        self.store.add([("sender", "jane@example.com", 10, 1, 1, 0), ("provider", "smtp", 10, 4, 0, 0)], now=600)
+
+        self.assertEqual(
+            {"jane@example.com": [dict(minute=10, sent=3, failed=1, bounced=0)],
+             "john@example.com": [dict(minute=10, sent=1, failed=0, bounced=0)]},
+            self.store.series("sender", 0, 11),
+        )
+        self.assertEqual({}, self.store.series("sender", 11, 20))
+        self.assertEqual(["smtp"], list(self.store.series("provider", 0, 11, key="smtp")))
+
+    def test_removes_minutes_past_retention(self):
+        """Minutes older than the retention should be removed as counts are added"""
+        self.store.add([("provider", "smtp", 10, 1, 0, 0)], now=600)
+        self.store.add([("provider", "smtp", 100, 1, 0, 0)], now=6000)
+
+        self.assertEqual([100], [point["minute"] for point in self.store.series("provider", 0, 200)["smtp"]])
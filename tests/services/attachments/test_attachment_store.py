@@ -0,0 +1,76 @@
+import base64
+import io
+import os
+import tempfile
+import time
+import unittest
+from app.services.attachments import (
+    AttachmentStore,
+    AttachmentNotFoundException,
+    load_attachments,
+    store_attachments,
+)
+
+
+class AttachmentStoreTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.store_dir = tempfile.TemporaryDirectory()
+        self.store = AttachmentStore(path=self.store_dir.name, ttl=60)
+
+    def tearDown(self):
+        self.store_dir.cleanup()
+
+    def stored_files(self):
+        return [filename for _, _, filenames in os.walk(self.store_dir.name) for filename in filenames]
+
+    def test_stores_and_reads_attachments(self):
+        """Attachment store should give back the contents stored under a digest"""
+        reference = self.store.put(io.BytesIO(b"rocket schematics"))
+
+        self.assertEqual(b"rocket schematics", self.store.read(reference))
+        with self.store.open(reference) as contents:
+            self.assertEqual(b"rocket", contents[:6])
+
+    def test_stores_identical_contents_once(self):
+        """Attachment store should keep a single copy of contents stored many times"""
+        references = {self.store.put(io.BytesIO(b"rocket schematics")) for _ in range(3)}
+        references.add(self.store.put_bytes(b"rocket schematics"))
+
+        self.assertEqual(1, len(references))
+        self.assertEqual(1, len(self.stored_files()))
+
+    def test_raises_for_unknown_references(self):
+        """Attachment store should raise for references it does not know, including ones escaping its directory"""
+        for reference in ("0" * 64, "../etc/passwd"):
+            with self.assertRaises(AttachmentNotFoundException):
+                self.store.read(reference)
+
+    def test_collects_expired_attachments(self):
+        """Attachment store should remove attachments that have not been stored within the ttl"""
+        expired = self.store.put_bytes(b"old schematics")
+        fresh = self.store.put_bytes(b"new schematics")
+        # pylint: disable=protected-access
+        past = time.time() - 120
+        os.utime(self.store._path_of(expired), (past, past))
+
+        self.assertEqual(1, self.store.collect_garbage())
+        self.assertEqual(b"new schematics", self.store.read(fresh))
+        with self.assertRaises(AttachmentNotFoundException):
+            self.store.read(expired)
+
+    def test_stores_and_loads_inline_attachments(self):
+        """Inline attachments should be stored as references & loaded back as base64 content"""
+        content = base64.b64encode(b"rocket schematics").decode("ascii")
+        attachments = [dict(content=content, filename="schematics.txt", type="text/plain")]
+
+        stored = store_attachments(attachments, self.store)
+        loaded = load_attachments(stored, self.store)
+
+        self.assertIsNone(stored[0].get("content"))
+        self.assertEqual(b"rocket schematics", self.store.read(stored[0].get("reference")))
+        self.assertEqual(content, loaded[0].get("content"))
+
+
+if __name__ == '__main__':
+    unittest.main()
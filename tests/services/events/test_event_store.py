@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+import unittest
+from app.services.events import (
+    EventPayloadException,
+    EventStore,
+    parse_mailchimp_events,
+    parse_sendgrid_events,
+)
+
+
+def event(message_id, event_type, timestamp, email="jane@example.com", **kwargs):
+    return dict(provider="sendgrid", message_id=message_id, email=email, event=event_type, timestamp=timestamp,
+                **kwargs)
+
+
+class ProviderEventsTestCases(unittest.TestCase):
+
+    def test_parses_sendgrid_events(self):
+        """SendGrid events should be mapped onto event types, leaving out the ones that are not recorded"""
+        events = parse_sendgrid_events([
+            dict(email="jane@example.com", event="bounce", type="bounce", sg_message_id="abc.filter0001", timestamp=10,
+                 sg_event_id="event-1"),
+            dict(email="john@example.com", event="bounce", type="blocked", sg_message_id="def.filter0001",
+                 timestamp=11),
+            dict(email="jim@example.com", event="processed", sg_message_id="ghi.filter0001", timestamp=12),
+            dict(email="jill@example.com", event="spamreport", sg_message_id="jkl.filter0001", timestamp=13),
+        ])
+
+        self.assertEqual(
+            [("abc", "jane@example.com", "bounced"), ("def", "john@example.com", "soft_bounced"),
+             ("jkl", "jill@example.com", "complained")],
+            [(item["message_id"], item["email"], item["event"]) for item in events],
+        )
+        self.assertEqual("event-1", events[0]["event_id"])
+        self.assertNotIn("event_id", events[1])
+
+    def test_parses_mailchimp_events(self):
+        """Mailchimp events posted as a JSON encoded form field should be mapped onto event types"""
+        events = parse_mailchimp_events(json.dumps([
+            dict(event="hard_bounce", ts=10, msg=dict(_id="abc", email="jane@example.com")),
+            dict(event="unsub", ts=11, msg=dict(_id="def", email="john@example.com")),
+            dict(type="whitelist", action="add"),
+        ]))
+
+        self.assertEqual(
+            [("mailchimp", "abc", "bounced", 10.0), ("mailchimp", "def", "unsubscribed", 11.0)],
+            [(item["provider"], item["message_id"], item["event"], item["timestamp"]) for item in events],
+        )
+
+    def test_throws_with_invalid_payload(self):
+        """Payloads that are not a list of events should raise"""
+        with self.assertRaises(EventPayloadException):
+            parse_sendgrid_events(dict(event="open"))
+        with self.assertRaises(EventPayloadException):
+            parse_mailchimp_events("not json")
+
+
+class EventStoreTestCases(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = EventStore(os.path.join(directory.name, "events.db"))
+
+    def test_sums_up_events_per_message(self):
+        """Events should be counted per message & type, keeping the latest event across batches"""
+        added = self.store.record([
+            event("abc", "delivered", 10), event("abc", "opened", 30), event("abc", "opened", 20),
+            event("def", "delivered", 10),
+        ])
+        self.store.record([event("abc", "clicked", 25), event("abc", "opened", 40)])
+
+        self.assertEqual(4, len(added))
+        summary, = self.store.get("sendgrid", "abc")
+        self.assertEqual(("opened", 40), (summary["event"], summary["updated"]))
+        self.assertEqual(
+            dict(delivered=1, opened=3, clicked=1),
+            {name: count for name, count in summary["counts"].items() if count},
+        )
+
+    def test_keeps_recipients_of_a_message_apart(self):
+        """Recipients of the same message should each have their own summary"""
+        self.store.record([event("abc", "delivered", 10), event("abc", "bounced", 10, email="john@example.com")])
+
+        self.assertEqual(
+            [("jane@example.com", "delivered"), ("john@example.com", "bounced")],
+            [(summary["email"], summary["event"]) for summary in self.store.get("sendgrid", "abc")],
+        )
+
+    def test_counts_events_recorded_again_once(self):
+        """Events recorded again, by event id or by content for providers without ids, should not be counted twice"""
+        batch = [event("abc", "opened", 10, event_id="event-1"), event("abc", "opened", 10, event_id="event-2"),
+                 event("abc", "delivered", 5)]
+
+        self.assertEqual(3, len(self.store.record(batch)))
+        self.assertEqual([], self.store.record(batch))
+
+        summary, = self.store.get("sendgrid", "abc")
+        counts = {name: count for name, count in summary["counts"].items() if count}
+        self.assertEqual(dict(delivered=1, opened=2), counts)
+
+    def test_forgets_event_ids_after_the_dedup_window(self):
+        """Event ids should only be kept for dedup_window seconds"""
+        batch = [event("abc", "opened", 10, event_id="event-1")]
+        self.store.record(batch, now=1000)
+
+        self.assertEqual([], self.store.record(batch, now=1000 + self.store.dedup_window - 1))
+        self.assertEqual(1, len(self.store.record(batch, now=1000 + 2 * self.store.dedup_window)))
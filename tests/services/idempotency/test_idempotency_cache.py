@@ -0,0 +1,103 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock
+from app.services.idempotency import (
+    IdempotencyCache,
+    IdempotencyConflictException,
+    IdempotencyKeyReusedException,
+    LocalIdempotencyBackend,
+    fingerprint,
+)
+
+
+class IdempotencyCacheTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.backend_dir = tempfile.TemporaryDirectory()
+        self.backend = LocalIdempotencyBackend(self.backend_dir.name)
+        self.cache = IdempotencyCache(self.backend, ttl=60, pending_ttl=60)
+        self.fingerprint = fingerprint(b'{"subject": "Rocket Schematics"}')
+
+    def tearDown(self):
+        self.backend_dir.cleanup()
+
+    def test_replays_completed_responses(self):
+        """Idempotency cache should hand back the response to an earlier request with the same key"""
+        self.assertIsNone(self.cache.begin("key", self.fingerprint))
+        self.cache.complete("key", self.fingerprint, {"status": 200})
+
+        self.assertEqual({"status": 200}, self.cache.begin("key", self.fingerprint))
+
+    def test_shares_responses_through_the_backend(self):
+        """Idempotency cache should replay responses completed by another process"""
+        self.cache.begin("key", self.fingerprint)
+        self.cache.complete("key", self.fingerprint, {"status": 200})
+
+        other = IdempotencyCache(LocalIdempotencyBackend(self.backend_dir.name))
+        self.assertEqual({"status": 200}, other.begin("key", self.fingerprint))
+
+    def test_refuses_requests_while_key_is_pending(self):
+        """Idempotency cache should refuse a repeat while the first request is still being handled"""
+        self.cache.begin("key", self.fingerprint)
+
+        with self.assertRaises(IdempotencyConflictException):
+            self.cache.begin("key", self.fingerprint)
+
+    def test_refuses_keys_reused_for_different_requests(self):
+        """Idempotency cache should refuse a key that was used for a different request"""
+        self.cache.begin("key", self.fingerprint)
+        self.cache.complete("key", self.fingerprint, {"status": 200})
+
+        with self.assertRaises(IdempotencyKeyReusedException):
+            self.cache.begin("key", fingerprint(b"another request"))
+
+    def test_released_keys_can_be_retried(self):
+        """Idempotency cache should let a released request be handled again"""
+        self.cache.begin("key", self.fingerprint)
+        self.cache.release("key")
+
+        self.assertIsNone(self.cache.begin("key", self.fingerprint))
+
+    def test_expires_pending_claims(self):
+        """Idempotency cache should let a request through once the claim of a crashed request expired"""
+        cache = IdempotencyCache(self.backend, pending_ttl=0)
+        cache.begin("key", self.fingerprint)
+        time.sleep(0.01)
+
+        self.assertIsNone(cache.begin("key", self.fingerprint))
+
+    def test_evicts_least_recently_used_responses(self):
+        """Idempotency cache should keep at most max_entries responses in process"""
+        cache = IdempotencyCache(self.backend, max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.begin(key, self.fingerprint)
+            cache.complete(key, self.fingerprint, {"key": key})
+
+        self.assertEqual(["b", "c"], list(cache._entries))
+        # evicted responses are still found in the backend
+        self.assertEqual({"key": "a"}, cache.begin("a", self.fingerprint))
+
+    def test_fails_open_when_backend_is_unavailable(self):
+        """Idempotency cache should handle requests as if they had no key when the backend fails"""
+        backend = MagicMock()
+        backend.claim.side_effect = ConnectionError("Redis is down")
+        cache = IdempotencyCache(backend)
+
+        self.assertIsNone(cache.begin("key", self.fingerprint))
+        self.assertIsNone(cache.begin("key", self.fingerprint))
+
+    def test_collects_expired_records(self):
+        """Local backend should remove expired records"""
+        self.backend.claim("expired", self.fingerprint, 0)
+        self.backend.complete("kept", self.fingerprint, {"status": 200}, 60)
+        time.sleep(0.01)
+
+        self.assertEqual(1, self.backend.collect_garbage())
+        records = [name for _, _, names in os.walk(self.backend_dir.name) for name in names]
+        self.assertEqual(1, len(records))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import email
+import unittest
+from unittest.mock import patch, AsyncMock, MagicMock
+from app.services.mail import AsyncSmtpServer
+from app.services.mail.exceptions import ServiceIntegrationException
+
+
+def smtp_client():
+    client = AsyncMock()
+    client.is_connected = True
+    client.close = MagicMock()
+    return client
+
+
+class AsyncSmtpServerTestCases(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.server = AsyncSmtpServer()
+        # pylint: disable=protected-access
+        self.server._idle.clear()
+        self.email = dict(
+            sender={"email": "johndoe@example.com", "name": "John Doe"},
+            recipients=[dict(email="janedoe@example.com", name="Jane Doe")],
+            ccs=[dict(email="jack@example.com", name="Jack")],
+            bcc=[dict(email="spy@example.com", name="Mr Spy")],
+            subject="Hello Jane!",
+            message="Testing 1 2 3",
+            attachments=None,
+        )
+
+    @patch("app.services.mail.async_smtp_proxy.aiosmtplib.SMTP")
+    async def test_sends_email_to_all_envelope_recipients(self, smtp_patch):
+        """Async SMTP server should deliver to recipients, carbon copies and blind carbon copies"""
+        client = smtp_client()
+        smtp_patch.return_value = client
+
+        response = await self.server.send_email(**self.email)
+
+        self.assertTrue(response.get("success"))
+        sender, recipients, text = client.sendmail.call_args.args
+        self.assertEqual("johndoe@example.com", sender)
+        self.assertEqual(["janedoe@example.com", "jack@example.com", "spy@example.com"], recipients)
+        self.assertNotIn(b"spy@example.com", text)
+
+    @patch("app.services.mail.async_smtp_proxy.aiosmtplib.SMTP")
+    async def test_sends_base64_attachments_as_they_are(self, smtp_patch):
+        """Async SMTP server should send attachment content, which is base64 already, without encoding it again"""
+        client = smtp_client()
+        smtp_patch.return_value = client
+        self.email["attachments"] = [dict(filename="hello.txt", content="aGVsbG8=", type="text/plain")]
+
+        await self.server.send_email(**self.email)
+
+        parsed = email.message_from_bytes(client.sendmail.call_args.args[2])
+        attachment = parsed.get_payload()[1]
+        self.assertEqual("hello.txt", attachment.get_filename())
+        self.assertEqual(b"hello", attachment.get_payload(decode=True))
+
+    @patch("app.services.mail.async_smtp_proxy.aiosmtplib.SMTP")
+    async def test_reuses_connections_between_sends(self, smtp_patch):
+        """Async SMTP server should reuse an idle connection rather than reconnecting for every message"""
+        smtp_patch.side_effect = lambda **kwargs: smtp_client()
+
+        await self.server.send_email(**self.email)
+        await self.server.send_email(**self.email)
+
+        self.assertEqual(1, smtp_patch.call_count)
+
+    @patch("app.services.mail.async_smtp_proxy.aiosmtplib.SMTP")
+    async def test_closes_connection_on_failure(self, smtp_patch):
+        """Async SMTP server should raise & drop the connection when sending fails"""
+        client = smtp_client()
+        client.sendmail.side_effect = OSError("connection reset")
+        smtp_patch.return_value = client
+
+        with self.assertRaises(ServiceIntegrationException):
+            await self.server.send_email(**self.email)
+
+        # pylint: disable=protected-access
+        self.assertEqual([], self.server._idle)
+        client.quit.assert_awaited()
+
+
+if __name__ == '__main__':
+    unittest.main()
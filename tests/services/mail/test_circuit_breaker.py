@@ -0,0 +1,49 @@
+import unittest
+from unittest.mock import patch
+from app.services.mail.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+class CircuitBreakerTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker("smtp", failure_rate=0.5, window=60, min_calls=4, open_timeout=30)
+
+    def test_opens_once_failure_rate_is_reached(self):
+        """Circuit breaker should open once enough calls in the window failed"""
+        self.breaker.record_success(0.1)
+        self.breaker.record_failure()
+        self.breaker.record_success(0.1)
+        self.assertEqual(CLOSED, self.breaker.state)
+
+        self.breaker.record_failure()
+
+        self.assertEqual(OPEN, self.breaker.state)
+        self.assertFalse(self.breaker.allow())
+
+    def test_lets_a_single_probe_through_after_open_timeout(self):
+        """Circuit breaker should let one probe through once open for open_timeout, closing if it succeeds"""
+        for _ in range(4):
+            self.breaker.record_failure()
+
+        with patch("app.services.mail.circuit_breaker.time.monotonic", return_value=10 ** 9):
+            self.assertEqual(HALF_OPEN, self.breaker.state)
+            self.assertTrue(self.breaker.allow())
+            self.assertFalse(self.breaker.allow())
+
+            self.breaker.record_success(0.1)
+
+        self.assertEqual(CLOSED, self.breaker.state)
+
+    def test_reopens_when_probe_fails(self):
+        """Circuit breaker should open again when the probe fails"""
+        for _ in range(4):
+            self.breaker.record_failure()
+
+        with patch("app.services.mail.circuit_breaker.time.monotonic", return_value=10 ** 9):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record_failure()
+            self.assertEqual(OPEN, self.breaker.state)
+
+
+if __name__ == '__main__':
+    unittest.main()
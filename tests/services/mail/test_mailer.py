@@ -0,0 +1,128 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.services.mail import async_send_plain_mail, send_plain_mail, unsent_request
+from app.services.mail.exceptions import EmailSendingException, FanoutPartiallySentException
+
+
+def email_request(**kwargs):
+    return dict(
+        dict(
+            sender=dict(email="johndoe@example.com", name="John Doe"),
+            recipients=[dict(email="janedoe@example.com", name="Jane Doe")],
+            subject="Hello Jane!",
+            message="Testing 1 2 3",
+        ),
+        **kwargs,
+    )
+
+
+class AsyncSendPlainMailTestCases(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.router = MagicMock()
+        self.router.allow.return_value = True
+        patcher = patch("app.services.mail.mailer.get_provider_router", return_value=self.router)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("app.services.mail.mailer.AsyncSmtpServer")
+        self.smtp = patcher.start().return_value
+        self.smtp.send_email = AsyncMock(return_value=dict(success=True))
+        self.addCleanup(patcher.stop)
+
+    async def test_sends_through_async_smtp(self):
+        """Emails should be sent over the asyncio SMTP client & tracked with the smtp circuit breaker"""
+        response = await async_send_plain_mail(email_request())
+
+        self.assertEqual(dict(success=True), response)
+        self.router.track.assert_called_once_with("smtp")
+        self.assertEqual("Hello Jane!", self.smtp.send_email.call_args.kwargs["subject"])
+        self.router.send.assert_not_called()
+
+    async def test_falls_back_to_other_providers(self):
+        """Emails should be sent through the other providers when the SMTP send fails"""
+        self.smtp.send_email.side_effect = OSError("connection reset")
+        self.router.send.return_value = dict(success=True, provider="sendgrid")
+
+        response = await async_send_plain_mail(email_request())
+
+        self.assertEqual("sendgrid", response["provider"])
+        self.assertEqual(["smtp"], self.router.send.call_args.kwargs["exclude"])
+
+    async def test_skips_smtp_when_its_circuit_is_open(self):
+        """Emails should go straight to the other providers when SMTP is not allowed"""
+        self.router.allow.return_value = False
+
+        await async_send_plain_mail(email_request())
+
+        self.smtp.send_email.assert_not_called()
+        self.router.send.assert_called_once()
+
+    async def test_raises_when_every_provider_fails(self):
+        """Async sending should raise once the other providers failed as well"""
+        self.router.allow.return_value = False
+        self.router.send.side_effect = EmailSendingException("All email providers failed")
+
+        with self.assertRaises(EmailSendingException):
+            await async_send_plain_mail(email_request())
+
+    @patch("app.services.mail.mailer.send_plain_mail", return_value=dict(success=True))
+    async def test_sends_fanout_emails_in_a_thread(self, mock_send_plain_mail):
+        """Fan-out emails should be handed to the blocking send, which uses the providers' batch APIs"""
+        request = email_request(fanout=True)
+
+        await async_send_plain_mail(request)
+
+        mock_send_plain_mail.assert_called_once_with(request)
+        self.smtp.send_email.assert_not_called()
+
+
+class SendPlainMailTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.router = MagicMock()
+        patcher = patch("app.services.mail.mailer.get_provider_router", return_value=self.router)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.recipients = [dict(email=f"user{index}@example.com", name=f"User {index}") for index in range(3)]
+        self.first, self.second = MagicMock(), MagicMock()
+        self.first.send_fanout.side_effect = FanoutPartiallySentException(self.recipients[:1])
+
+    def test_fails_over_to_the_recipients_not_sent_to(self):
+        """Fan-out emails that failed partway should only be sent to the remaining recipients by the next provider"""
+        self.second.send_fanout.return_value = dict(success=True)
+
+        def send(operation):
+            try:
+                return operation(self.first)
+            except FanoutPartiallySentException:
+                return operation(self.second)
+
+        self.router.send.side_effect = send
+
+        response = send_plain_mail(email_request(fanout=True, recipients=self.recipients))
+
+        self.assertEqual(dict(success=True), response)
+        self.assertEqual(self.recipients[1:], self.second.send_fanout.call_args.kwargs["recipients"])
+
+    def test_reports_recipients_sent_to_when_every_provider_fails(self):
+        """Failed fan-out emails should report the recipients that were sent to, so that retries leave them out"""
+        request = email_request(fanout=True, recipients=self.recipients)
+
+        def send(operation):
+            try:
+                return operation(self.first)
+            except FanoutPartiallySentException as err:
+                raise EmailSendingException("All email providers failed") from err
+
+        self.router.send.side_effect = send
+
+        with self.assertRaises(EmailSendingException) as context:
+            send_plain_mail(request)
+
+        self.assertEqual(self.recipients[:1], context.exception.sent)
+        self.assertEqual(self.recipients[1:], unsent_request(request, context.exception)["recipients"])
+        self.assertEqual(self.recipients, request["recipients"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import base64
+import email
+import itertools
+import tempfile
+import unittest
+from email.errors import HeaderParseError
+from unittest.mock import MagicMock
+from app.services.attachments import AttachmentStore
+from app.services.mail.mime_stream import stream_message, send_stream, LINE_LENGTH
+
+
+class MimeStreamTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.store_dir = tempfile.TemporaryDirectory()
+        self.store = AttachmentStore(path=self.store_dir.name)
+
+    def tearDown(self):
+        self.store_dir.cleanup()
+
+    def test_streams_parsable_multipart_message(self):
+        """Streamed message should parse back into its text & attachment parts"""
+        schematics = bytes(range(256)) * 1000
+        reference = self.store.put_bytes(schematics)
+
+        chunks = list(stream_message(
+            sender={"email": "johndoe@example.com", "name": "John Doe"},
+            recipients=[dict(email="janedoe@example.com"), dict(email="jack@example.com")],
+            ccs=[dict(email="jill@example.com")],
+            subject="Rocket Schematics ✓",
+            message="Let us build a rocket to the Moon",
+            attachments=[
+                dict(reference=reference, filename="schematics.bin", type="application/octet-stream"),
+                dict(content=base64.b64encode(b"inline notes").decode(), filename="notes.txt", type="text/plain"),
+            ],
+            store=self.store,
+        ))
+        raw = b"".join(chunks)
+        parsed = email.message_from_bytes(raw)
+        text, binary, notes = parsed.get_payload()
+
+        self.assertTrue(all(len(line) <= LINE_LENGTH for line in raw.split(b"\r\n")))
+        subject = email.header.make_header(email.header.decode_header(parsed["Subject"]))
+        self.assertEqual("Rocket Schematics ✓", str(subject))
+        self.assertIn("jack@example.com", parsed["To"])
+        self.assertEqual("Let us build a rocket to the Moon", text.get_payload(decode=True).decode())
+        self.assertEqual(schematics, binary.get_payload(decode=True))
+        self.assertEqual("schematics.bin", binary.get_filename())
+        self.assertEqual(b"inline notes", notes.get_payload(decode=True))
+        self.assertGreater(len(chunks), 3)
+
+    def test_rejects_line_breaks_in_subject(self):
+        """A subject with a line break in it should be rejected rather than add headers of its own"""
+        with self.assertRaises(HeaderParseError):
+            stream_message(
+                sender={"email": "johndoe@example.com"},
+                recipients=[dict(email="janedoe@example.com")],
+                subject="Rocket Schematics\r\nBcc: spy@example.com",
+                message="Let us build a rocket to the Moon",
+            )
+
+    def test_rejects_line_breaks_in_attachment_headers(self):
+        """An attachment filename or type with a line break in it should be rejected"""
+        for attachment in [
+            dict(content="bm90ZXM=", filename="notes.txt\r\nBcc: spy@example.com", type="text/plain"),
+            dict(content="bm90ZXM=", filename="notes.txt", type="text/plain\nBcc: spy@example.com"),
+        ]:
+            with self.subTest(attachment=attachment), self.assertRaises(HeaderParseError):
+                stream_message(
+                    sender={"email": "johndoe@example.com"},
+                    recipients=[dict(email="janedoe@example.com")],
+                    subject="Rocket Schematics",
+                    message="Let us build a rocket to the Moon",
+                    attachments=[attachment],
+                )
+
+    def test_encodes_non_ascii_filename_parameter(self):
+        """A non-ASCII filename should be encoded as an RFC 2231 parameter, leaving the disposition readable"""
+        raw = b"".join(stream_message(
+            sender={"email": "johndoe@example.com"},
+            recipients=[dict(email="janedoe@example.com")],
+            subject="Rocket Schematics",
+            message="Let us build a rocket to the Moon",
+            attachments=[dict(content="bm90ZXM=", filename="Rechnung_März.pdf", type="application/pdf")],
+        ))
+        _, attachment = email.message_from_bytes(raw).get_payload()
+
+        self.assertEqual("attachment; filename*=utf-8''Rechnung_M%C3%A4rz.pdf", attachment["Content-Disposition"])
+        self.assertEqual("Rechnung_März.pdf", attachment.get_filename())
+
+    def test_send_stream_writes_chunks_to_data_command(self):
+        """Chunks should be written to the DATA stream, dot stuffed, terminated & coalesced into a single write"""
+        client = MagicMock()
+        client.mail.return_value = (250, b"OK")
+        client.rcpt.return_value = (250, b"OK")
+        client.getreply.side_effect = itertools.cycle([(354, b"Go ahead"), (250, b"OK")])
+
+        send_stream(client, "johndoe@example.com", ["janedoe@example.com"], [b"Subject: hi\r\n", b".hidden\r\n"])
+
+        client.putcmd.assert_called_once_with("data")
+        sent = [call.args[0] for call in client.send.call_args_list]
+        self.assertEqual([b"Subject: hi\r\n..hidden\r\n.\r\n"], sent)
+
+    def test_send_stream_pipelines_envelope(self):
+        """MAIL FROM, RCPT TO & DATA should go out in a single write when the relay supports PIPELINING"""
+        client = MagicMock()
+        client.esmtp_features = {"pipelining": ""}
+        client.getreply.side_effect = [(250, b"OK"), (250, b"OK"), (550, b"User unknown"), (354, b"Go ahead"),
+                                       (250, b"OK")]
+
+        refused = send_stream(client, "johndoe@example.com", ["janedoe@example.com", "nobody@example.com"],
+                              [b"Subject: hi\r\n"])
+
+        sent = [call.args[0] for call in client.send.call_args_list]
+        self.assertEqual("mail FROM:<johndoe@example.com>\r\nrcpt TO:<janedoe@example.com>\r\n"
+                         "rcpt TO:<nobody@example.com>\r\ndata\r\n", sent[0])
+        self.assertEqual([b"Subject: hi\r\n.\r\n"], sent[1:])
+        self.assertEqual(["nobody@example.com"], list(refused))
+        client.mail.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import smtplib
+import unittest
+from unittest.mock import MagicMock
+from app.services.mail.circuit_breaker import CircuitBreaker, OPEN
+from app.services.mail.exceptions import EmailSendingException, ServiceIntegrationException
+from app.services.mail.provider_router import ProviderRouter
+
+
+class ProviderRouterTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.smtp, self.sendgrid, self.mailchimp = MagicMock(), MagicMock(), MagicMock()
+        self.router = ProviderRouter(
+            providers=dict(smtp=lambda: self.smtp, sendgrid=lambda: self.sendgrid, mailchimp=lambda: self.mailchimp),
+            breakers={name: CircuitBreaker(name, min_calls=1) for name in ("smtp", "sendgrid", "mailchimp")},
+            primary=["smtp"],
+            fallback=["sendgrid"],
+        )
+
+    def test_fails_over_to_fallback_provider(self):
+        """Router should send through the fallback provider when the primary one fails"""
+        self.smtp.send_email.side_effect = ServiceIntegrationException("Connection refused")
+        self.sendgrid.send_email.return_value = dict(success=True)
+
+        response = self.router.send(lambda provider: provider.send_email())
+
+        self.assertTrue(response.get("success"))
+        self.assertEqual(OPEN, self.router.breakers["smtp"].state)
+
+    def test_skips_providers_with_open_circuit(self):
+        """Router should not contact a provider whose circuit is open"""
+        self.router.breakers["smtp"].record_failure()
+
+        self.router.send(lambda provider: provider.send_email())
+
+        self.smtp.send_email.assert_not_called()
+        self.sendgrid.send_email.assert_called_once()
+
+    def test_fails_fast_when_no_provider_is_available(self):
+        """Router should fail without contacting any provider when every circuit is open"""
+        self.router.breakers["smtp"].record_failure()
+        self.router.breakers["sendgrid"].record_failure()
+
+        with self.assertRaises(EmailSendingException):
+            self.router.send(lambda provider: provider.send_email())
+
+        self.smtp.send_email.assert_not_called()
+        self.sendgrid.send_email.assert_not_called()
+
+    def test_rejected_recipients_do_not_open_circuit(self):
+        """Router should not hold a provider responsible for recipients it refused"""
+        refused = smtplib.SMTPRecipientsRefused({"nobody@example.com": (550, b"User unknown")})
+        self.smtp.send_email.side_effect = ServiceIntegrationException("Refused")
+        self.smtp.send_email.side_effect.__cause__ = refused
+
+        self.router.send(lambda provider: provider.send_email())
+
+        self.assertTrue(self.router.breakers["smtp"].allow())
+
+    def test_favours_faster_providers(self):
+        """Router should route most traffic to the provider with the lowest latency"""
+        router = ProviderRouter(
+            providers=self.router.providers,
+            breakers=self.router.breakers,
+            primary=["smtp", "mailchimp"],
+        )
+        router.breakers["smtp"].record_success(1.0)
+        router.breakers["mailchimp"].record_success(0.01)
+
+        firsts = [router.order()[0] for _ in range(200)]
+
+        self.assertGreater(firsts.count("mailchimp"), 150)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from app.services.mail import SendGridEmailService
+from app.services.mail.sendgrid_email_service import SENDGRID_MAX_PERSONALIZATIONS
+
+
+class SendGridEmailServiceTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.service = SendGridEmailService()
+        self.email = dict(
+            sender={"email": "johndoe@example.com", "name": "John Doe"},
+            subject="Hello!",
+            message="Testing 1 2 3",
+            attachments=None,
+        )
+
+    def test_fans_out_with_one_personalization_per_recipient(self):
+        """SendGrid should address each recipient in its own personalization, chunked to the per call limit"""
+        recipients = [
+            dict(email=f"user{index}@example.com", name=f"User {index}")
+            for index in range(SENDGRID_MAX_PERSONALIZATIONS + 1)
+        ]
+        client = MagicMock()
+        client.client.mail.send.post.return_value = MagicMock(status_code=202)
+
+        with patch.object(self.service, "mail_client", client):
+            response = self.service.send_fanout(recipients=recipients, **self.email)
+
+        self.assertTrue(response.get("success"))
+        calls = client.client.mail.send.post.call_args_list
+        self.assertEqual(2, len(calls))
+        personalizations = [call.kwargs["request_body"]["personalizations"] for call in calls]
+        self.assertEqual([SENDGRID_MAX_PERSONALIZATIONS, 1], [len(chunk) for chunk in personalizations])
+        self.assertTrue(all(len(personalization["to"]) == 1 for personalization in personalizations[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+from app.services.mail.smtp_pool import SmtpConnectionPool
+from app.services.mail.exceptions import ServiceIntegrationException
+
+
+def smtp_client_factory():
+    client = MagicMock()
+    client.noop.return_value = (250, b"OK")
+    return client
+
+
+class SmtpConnectionPoolTestCases(unittest.TestCase):
+
+    def test_warm_opens_min_size_connections(self):
+        """Pool should open min_size connections when warmed up"""
+        factory = MagicMock(side_effect=smtp_client_factory)
+        pool = SmtpConnectionPool(factory=factory, min_size=2, max_size=4)
+
+        pool.warm()
+
+        self.assertEqual(2, factory.call_count)
+        self.assertEqual(2, pool.size)
+        self.assertEqual(2, pool.idle)
+
+    def test_reuses_released_connections(self):
+        """Pool should hand out the same connection again once it has been released"""
+        factory = MagicMock(side_effect=smtp_client_factory)
+        pool = SmtpConnectionPool(factory=factory, min_size=0, max_size=2)
+
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(1, factory.call_count)
+
+    def test_concurrent_checkouts_get_separate_connections(self):
+        """Pool should hand out a separate connection to each concurrent borrower up to max_size"""
+        pool = SmtpConnectionPool(factory=smtp_client_factory, min_size=0, max_size=3)
+
+        connections = [pool.acquire() for _ in range(3)]
+
+        self.assertEqual(3, len({id(connection) for connection in connections}))
+        self.assertEqual(3, pool.size)
+
+    def test_times_out_when_exhausted(self):
+        """Pool should raise when no connection becomes available within the checkout timeout"""
+        pool = SmtpConnectionPool(factory=smtp_client_factory, min_size=0, max_size=1, checkout_timeout=0.05)
+        pool.acquire()
+
+        with self.assertRaises(ServiceIntegrationException):
+            pool.acquire()
+
+    def test_waiting_borrower_gets_released_connection(self):
+        """A borrower blocked on an exhausted pool should get the connection released by another thread"""
+        pool = SmtpConnectionPool(factory=smtp_client_factory, min_size=0, max_size=1, checkout_timeout=5)
+        connection = pool.acquire()
+        borrowed = []
+
+        waiter = threading.Thread(target=lambda: borrowed.append(pool.acquire()))
+        waiter.start()
+        pool.release(connection)
+        waiter.join(timeout=5)
+
+        self.assertEqual([connection], borrowed)
+
+    def test_skips_noop_for_recently_used_connections(self):
+        """Pool should not probe a connection the relay answered on within the probe interval"""
+        pool = SmtpConnectionPool(factory=smtp_client_factory, min_size=0, max_size=1, probe_interval=60)
+
+        with pool.connection() as connection:
+            connection.sendmail(from_addr="a@example.com", to_addrs=["b@example.com"], msg="hi")
+        with pool.connection():
+            pass
+
+        connection.client.noop.assert_not_called()
+
+    def test_probes_connections_after_probe_interval(self):
+        """Pool should probe a connection with a NOOP once it has been quiet for longer than the probe interval"""
+        pool = SmtpConnectionPool(factory=smtp_client_factory, min_size=0, max_size=1, probe_interval=0)
+
+        with pool.connection() as connection:
+            pass
+        with pool.connection():
+            pass
+
+        connection.client.noop.assert_called_once()
+
+    def test_discards_closed_connections_without_probing(self):
+        """Pool should replace a connection whose socket smtplib has already dropped without issuing a NOOP"""
+        pool = SmtpConnectionPool(factory=smtp_client_factory, min_size=0, max_size=1)
+        with pool.connection() as stale:
+            pass
+        stale.client.sock = None
+
+        with pool.connection() as fresh:
+            pass
+
+        self.assertIsNot(stale, fresh)
+        stale.client.noop.assert_not_called()
+
+    def test_discards_unhealthy_connections_on_checkout(self):
+        """Pool should replace a connection that fails its health check"""
+        pool = SmtpConnectionPool(factory=smtp_client_factory, min_size=0, max_size=1, probe_interval=0)
+        with pool.connection() as stale:
+            pass
+        stale.client.noop.side_effect = OSError("connection reset")
+
+        with pool.connection() as fresh:
+            pass
+
+        self.assertIsNot(stale, fresh)
+        self.assertEqual(1, pool.size)
+
+    def test_recycles_connection_after_max_messages(self):
+        """Pool should close a connection that has sent max_messages messages"""
+        pool = SmtpConnectionPool(factory=smtp_client_factory, min_size=0, max_size=1, max_messages=2)
+
+        with pool.connection() as connection:
+            connection.sendmail(from_addr="a@example.com", to_addrs=["b@example.com"], msg="hi")
+            connection.sendmail(from_addr="a@example.com", to_addrs=["b@example.com"], msg="hi")
+
+        connection.client.quit.assert_called_once()
+        self.assertEqual(0, pool.size)
+
+    def test_discards_connection_that_raised_while_in_use(self):
+        """Pool should not reuse a connection that raised an error while checked out"""
+        pool = SmtpConnectionPool(factory=smtp_client_factory, min_size=0, max_size=1)
+
+        with self.assertRaises(RuntimeError):
+            with pool.connection():
+                raise RuntimeError("Boom!")
+
+        self.assertEqual(0, pool.size)
+        self.assertEqual(0, pool.idle)
+
+    def test_reaps_idle_connections_above_min_size(self):
+        """Pool should close connections idle for longer than idle_timeout while keeping min_size open"""
+        pool = SmtpConnectionPool(factory=smtp_client_factory, min_size=1, max_size=3, idle_timeout=0)
+        connections = [pool.acquire() for _ in range(3)]
+
+        for connection in connections:
+            pool.release(connection)
+
+        self.assertEqual(1, pool.size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import itertools
+import smtplib
+import unittest
+from unittest.mock import patch, MagicMock
+from app.services.mail import SmtpServer
+from app.services.mail.exceptions import FanoutPartiallySentException, ServiceIntegrationException
+
+
+def smtp_client():
+    client = MagicMock()
+    client.noop.return_value = (250, b"OK")
+    client.mail.return_value = (250, b"OK")
+    client.rcpt.return_value = (250, b"OK")
+    client.getreply.side_effect = itertools.cycle([(354, b"Go ahead"), (250, b"OK")])
+    return client
+
+
+class SmtpServerTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.server = SmtpServer()
+        self.server.pool.close()
+        self.email = dict(
+            sender={"email": "johndoe@example.com", "name": "John Doe"},
+            recipients=[dict(email="janedoe@example.com", name="Jane Doe")],
+            ccs=None,
+            bcc=None,
+            subject="Hello Jane!",
+            message="Testing 1 2 3",
+            attachments=None,
+        )
+        self.fanout = {key: value for key, value in self.email.items() if key not in ("ccs", "bcc")}
+
+    def test_retries_once_on_dropped_connection(self):
+        """SMTP server should transparently resend a message on a fresh connection when the relay dropped the old one"""
+        dropped, fresh = smtp_client(), smtp_client()
+        dropped.mail.side_effect = smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+
+        with patch.object(self.server.pool, "factory", side_effect=[dropped, fresh]):
+            self.server.pool.warm()
+            response = self.server.send_email(**self.email)
+
+        self.assertTrue(response.get("success"))
+        fresh.mail.assert_called_once()
+
+    def test_does_not_retry_rejected_messages(self):
+        """SMTP server should not resend a message the relay rejected"""
+        client = smtp_client()
+        client.rcpt.return_value = (550, b"User unknown")
+
+        with patch.object(self.server.pool, "factory", return_value=client) as factory:
+            self.server.pool.warm()
+            with self.assertRaises(ServiceIntegrationException):
+                self.server.send_email(**self.email)
+
+        self.assertEqual(1, factory.call_count)
+        client.mail.assert_called_once()
+
+    def test_fans_out_one_transaction_per_recipient(self):
+        """SMTP server should send a separate copy to each recipient over the same pooled connection"""
+        client = smtp_client()
+        recipients = [dict(email=f"user{index}@example.com", name=f"User {index}") for index in range(3)]
+        email = dict(self.fanout, recipients=recipients)
+
+        with patch.object(self.server.pool, "factory", return_value=client) as factory:
+            self.server.pool.warm()
+            response = self.server.send_fanout(**email)
+
+        self.assertTrue(response.get("success"))
+        self.assertEqual(1, factory.call_count)
+        self.assertEqual(
+            [((recipient["email"],), {}) for recipient in recipients],
+            [(call.args, call.kwargs) for call in client.rcpt.call_args_list],
+        )
+
+    def test_reports_recipients_sent_to_when_fan_out_fails_partway(self):
+        """SMTP server should report the recipients that got their copy when a later copy is rejected"""
+        client = smtp_client()
+        client.rset.return_value = (250, b"OK")
+        client.rcpt.side_effect = [(250, b"OK"), (550, b"User unknown")]
+        recipients = [dict(email=f"user{index}@example.com", name=f"User {index}") for index in range(3)]
+
+        with patch.object(self.server.pool, "factory", return_value=client):
+            self.server.pool.warm()
+            with self.assertRaises(FanoutPartiallySentException) as context:
+                self.server.send_fanout(**dict(self.fanout, recipients=recipients))
+
+        self.assertEqual(recipients[:1], context.exception.sent)
+
+    def test_sends_batch_over_a_single_connection(self):
+        """SMTP server should send a batch over one connection, resetting it after a rejected message"""
+        client = smtp_client()
+        client.rset.return_value = (250, b"OK")
+        client.rcpt.side_effect = [(250, b"OK"), (550, b"User unknown"), (250, b"OK")]
+
+        with patch.object(self.server.pool, "factory", return_value=client) as factory:
+            self.server.pool.warm()
+            errors = self.server.send_batch([self.email, self.email, self.email])
+
+        self.assertIsNone(errors[0])
+        self.assertIsInstance(errors[1], smtplib.SMTPRecipientsRefused)
+        self.assertIsNone(errors[2])
+        self.assertEqual(1, factory.call_count)
+        self.assertEqual(3, client.mail.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import multiprocessing
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock
+from app.services.ratelimit import (
+    LocalRateLimitBackend,
+    RateLimiter,
+    RateLimitTimeoutException,
+)
+
+
+def hold_slot(path, name, held, done):
+    backend = LocalRateLimitBackend(path)
+    backend.lease(name, 1, 60)
+    held.set()
+    done.wait(5)
+
+
+class RateLimiterTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.backend_dir = tempfile.TemporaryDirectory()
+        self.backend = LocalRateLimitBackend(self.backend_dir.name)
+
+    def tearDown(self):
+        self.backend_dir.cleanup()
+
+    def test_allows_bursts_then_paces_sends(self):
+        """Rate limiter should let a burst through at once, then space sends out at the configured rate"""
+        limiter = RateLimiter("smtp", self.backend, rate=20, burst=3, timeout=5)
+
+        started = time.monotonic()
+        for _ in range(3):
+            with limiter.limit():
+                pass
+        burst = time.monotonic() - started
+        for _ in range(2):
+            with limiter.limit():
+                pass
+        paced = time.monotonic() - started - burst
+
+        self.assertLess(burst, 0.05)
+        self.assertGreaterEqual(paced, 0.08)
+
+    def test_times_out_when_rate_is_exhausted(self):
+        """Rate limiter should give up rather than wait past its timeout"""
+        limiter = RateLimiter("smtp", self.backend, rate=0.1, burst=1, timeout=1)
+
+        with limiter.limit():
+            pass
+        with self.assertRaises(RateLimitTimeoutException):
+            with limiter.limit():
+                pass
+
+    def test_caps_concurrency_across_processes(self):
+        """Concurrency slots held by another process should count against the limit"""
+        held, done = multiprocessing.Event(), multiprocessing.Event()
+        holder = multiprocessing.Process(
+            target=hold_slot, args=(self.backend_dir.name, "sendgrid", held, done)
+        )
+        holder.start()
+        try:
+            held.wait(5)
+            limiter = RateLimiter("sendgrid", self.backend, max_concurrency=2, timeout=0.2)
+            with limiter.limit():
+                with self.assertRaises(RateLimitTimeoutException):
+                    with limiter.limit():
+                        pass
+        finally:
+            done.set()
+            holder.join()
+
+        with limiter.limit():
+            with limiter.limit():
+                pass
+
+    def test_lets_sends_through_when_backend_is_unavailable(self):
+        """Rate limiter should not stop all mail when its backend cannot be reached"""
+        backend = MagicMock()
+        backend.take.side_effect = ConnectionError("Redis is down")
+        backend.lease.side_effect = ConnectionError("Redis is down")
+        limiter = RateLimiter("mailchimp", backend, rate=1, max_concurrency=1)
+
+        with limiter.limit():
+            pass
+
+        backend.release.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
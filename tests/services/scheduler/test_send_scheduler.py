@@ -0,0 +1,96 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+from app.domain.entities import EmailRequest
+from app.services.scheduler import LocalScheduleBackend, SendScheduler
+
+
+def email_request(send_at, subject="Hello!"):
+    return EmailRequest(
+        sender=dict(email="johndoe@example.com", name="John Doe"),
+        recipients=[dict(email="janedoe@example.com", name="Jane Doe")],
+        subject=subject,
+        message="Testing 1 2 3",
+        send_at=send_at,
+    )
+
+
+class SendSchedulerTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.backend_dir = tempfile.TemporaryDirectory()
+        self.backend = LocalScheduleBackend(os.path.join(self.backend_dir.name, "schedule.db"))
+        self.scheduler = SendScheduler(self.backend, batch_size=2)
+        self.now = datetime.now(timezone.utc)
+
+    def tearDown(self):
+        self.backend_dir.cleanup()
+
+    def test_releases_due_sends_in_batches(self):
+        """Send scheduler should release only the sends that are due, earliest first & a batch at a time"""
+        self.scheduler.schedule([
+            email_request(self.now + timedelta(minutes=2), subject="Second"),
+            email_request(self.now + timedelta(minutes=1), subject="First"),
+            email_request(self.now + timedelta(minutes=3), subject="Third"),
+            email_request(self.now + timedelta(hours=1), subject="Later"),
+        ])
+        publish = MagicMock()
+
+        released = self.scheduler.release_due(publish, now=(self.now + timedelta(minutes=5)).timestamp())
+
+        self.assertEqual(3, released)
+        self.assertEqual(2, publish.call_count)
+        subjects = [data["subject"] for batch in publish.call_args_list for data in batch.args[0]]
+        self.assertEqual(["First", "Second", "Third"], subjects)
+        self.assertEqual(1, self.backend.size())
+
+    def test_released_sends_are_email_requests(self):
+        """Released sends should carry the scheduled email as the mail sending task expects it"""
+        scheduled = email_request(self.now + timedelta(minutes=1))
+        self.scheduler.schedule([scheduled])
+        publish = MagicMock()
+
+        self.scheduler.release_due(publish, now=time.time() + 120)
+
+        released = EmailRequest(**publish.call_args.args[0][0])
+        self.assertEqual(scheduled, released)
+
+    def test_reschedules_batches_that_fail_to_publish(self):
+        """Send scheduler should keep a batch on the schedule when publishing it fails & release it after the lease"""
+        self.scheduler.schedule([email_request(self.now + timedelta(minutes=1))])
+        publish = MagicMock(side_effect=ConnectionError("Broker is down"))
+        now = time.time() + 120
+
+        with self.assertRaises(ConnectionError):
+            self.scheduler.release_due(publish, now=now)
+
+        self.assertEqual(1, self.backend.size())
+        publish = MagicMock()
+        self.assertEqual(0, self.scheduler.release_due(publish, now=now + 1))
+        self.assertEqual(1, self.scheduler.release_due(publish, now=now + self.scheduler.lease))
+        self.assertEqual(0, self.backend.size())
+
+    def test_keeps_sends_on_the_schedule_until_published(self):
+        """Send scheduler should only take a send off the schedule once it was published"""
+        self.scheduler.schedule([email_request(self.now + timedelta(minutes=1))])
+        sizes = []
+
+        self.scheduler.release_due(lambda batch: sizes.append(self.backend.size()), now=time.time() + 120)
+
+        self.assertEqual([1], sizes)
+        self.assertEqual(0, self.backend.size())
+
+    def test_treats_times_without_timezone_as_utc(self):
+        """Email requests should assume UTC for send times without a timezone"""
+        scheduled = email_request(datetime(2030, 1, 1, 12, 0))
+
+        self.assertEqual(timezone.utc, scheduled.send_at.tzinfo)
+        self.assertTrue(scheduled.is_scheduled)
+        self.assertFalse(email_request(self.now - timedelta(minutes=1)).is_scheduled)
+
+
+if __name__ == "__main__":
+    unittest.main()
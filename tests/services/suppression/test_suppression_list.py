@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from app.services.suppression import (
+    BloomFilter,
+    SuppressionList,
+    SuppressionNotFoundException,
+    SuppressionStore,
+)
+
+
+class BloomFilterTestCases(unittest.TestCase):
+
+    def test_never_misses_added_items(self):
+        """Every item added to the filter should be reported as present"""
+        bloom_filter = BloomFilter(1000, 0.01)
+        items = [f"user{index}@example.com" for index in range(1000)]
+        for item in items:
+            bloom_filter.add(item)
+
+        self.assertTrue(all(item in bloom_filter for item in items))
+
+    def test_keeps_to_false_positive_rate(self):
+        """Items that were never added should only rarely be reported as present"""
+        bloom_filter = BloomFilter(1000, 0.01)
+        for index in range(1000):
+            bloom_filter.add(f"user{index}@example.com")
+
+        false_positives = sum(f"other{index}@example.com" in bloom_filter for index in range(10000))
+
+        self.assertLess(false_positives, 300)
+
+
+class SuppressionListTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "suppressions.db")
+
+    def suppression_list(self, **kwargs):
+        return SuppressionList(SuppressionStore(self.path), **dict(dict(refresh_interval=0), **kwargs))
+
+    def test_reports_suppressed_addresses_regardless_of_case(self):
+        """Only suppressed addresses should be reported, normalized"""
+        suppression_list = self.suppression_list()
+        suppression_list.add([("Jane@Example.com", "bounce")])
+
+        suppressed = suppression_list.suppressed(["jane@example.com ", "john@example.com"])
+
+        self.assertEqual({"jane@example.com"}, suppressed)
+
+    def test_picks_up_changes_made_by_other_processes(self):
+        """Additions & removals made through another list on the same store should be seen after a refresh"""
+        suppression_list = self.suppression_list()
+        other = self.suppression_list()
+        self.assertEqual(set(), suppression_list.suppressed(["jane@example.com"]))
+
+        other.add([("jane@example.com", "complaint")])
+        self.assertEqual({"jane@example.com"}, suppression_list.suppressed(["jane@example.com"]))
+
+        other.remove("jane@example.com")
+        self.assertEqual(set(), suppression_list.suppressed(["jane@example.com"]))
+
+    def test_waits_for_refresh_interval(self):
+        """Changes made elsewhere should only be picked up once the refresh interval passed"""
+        suppression_list = self.suppression_list(refresh_interval=3600)
+        suppression_list.suppressed(["jane@example.com"])
+
+        self.suppression_list().add([("jane@example.com", "bounce")])
+
+        self.assertEqual(set(), suppression_list.suppressed(["jane@example.com"]))
+
+    def test_grows_past_capacity(self):
+        """The filter should be rebuilt larger once more addresses are suppressed than it was sized for"""
+        suppression_list = self.suppression_list(capacity=10)
+        emails = [f"user{index}@example.com" for index in range(50)]
+
+        suppression_list.add([(email, "manual") for email in emails])
+
+        self.assertEqual(set(emails), suppression_list.suppressed(emails))
+        self.assertGreaterEqual(suppression_list._capacity, 50)
+
+    def test_keeps_reason_and_time_of_first_suppression(self):
+        """Suppressing an address again should update its reason but not when it was suppressed"""
+        suppression_list = self.suppression_list()
+        suppression_list.add([("jane@example.com", "bounce")])
+        created = suppression_list.get("jane@example.com")["created"]
+
+        suppression_list.add([("jane@example.com", "complaint")])
+
+        self.assertEqual(
+            dict(email="jane@example.com", reason="complaint", created=created),
+            suppression_list.get("jane@example.com"),
+        )
+
+    def test_throws_when_address_is_not_suppressed(self):
+        """Getting or removing an address that is not suppressed should raise"""
+        suppression_list = self.suppression_list()
+
+        with self.assertRaises(SuppressionNotFoundException):
+            suppression_list.get("jane@example.com")
+        with self.assertRaises(SuppressionNotFoundException):
+            suppression_list.remove("jane@example.com")
+
+    def test_lets_addresses_through_when_store_fails(self):
+        """Sending should not be stopped by a store that can not be read"""
+        suppression_list = self.suppression_list()
+        suppression_list.add([("jane@example.com", "bounce")])
+        suppression_list.store.path = self.directory.name
+        suppression_list.store._local.connection.close()
+        del suppression_list.store._local.connection
+
+        self.assertEqual(set(), suppression_list.suppressed(["jane@example.com"]))
@@ -0,0 +1,99 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+from app.services.templates import (
+    TemplateEngine,
+    TemplateInvalidException,
+    TemplateNotFoundException,
+    TemplateRenderingException,
+    TemplateStore,
+    render_request,
+)
+
+
+class TemplateEngineTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.store_dir = tempfile.TemporaryDirectory()
+        self.store = TemplateStore(self.store_dir.name)
+        self.engine = TemplateEngine(self.store, cache_size=2)
+        self.template_id = self.store.put("Hello {{ name }}", "Your code is {{ code }}")
+
+    def tearDown(self):
+        self.store_dir.cleanup()
+
+    def test_stores_templates_by_content(self):
+        """Template store should give the same template the same id"""
+        self.assertEqual(self.template_id, self.store.put("Hello {{ name }}", "Your code is {{ code }}"))
+        self.assertNotEqual(self.template_id, self.store.put("Hi {{ name }}", "Your code is {{ code }}"))
+
+    def test_renders_subject_and_message(self):
+        """Template engine should render the subject & message of a stored template"""
+        rendered = self.engine.render(self.template_id, dict(name="Jane", code=1234))
+
+        self.assertEqual(("Hello Jane", "Your code is 1234"), rendered)
+
+    def test_compiles_templates_once(self):
+        """Template engine should keep compiled templates rather than reading & compiling them for every email"""
+        with patch.object(self.store, "get", wraps=self.store.get) as get:
+            for code in range(3):
+                self.engine.render(self.template_id, dict(name="Jane", code=code))
+
+        get.assert_called_once()
+
+    def test_escapes_variables_in_html_messages(self):
+        """Template engine should escape variables rendered into HTML documents"""
+        template_id = self.store.put("Hello {{ name }}", "<html><body>Hello {{ name }}</body></html>")
+
+        subject, message = self.engine.render(template_id, dict(name="<b>Jane</b>"))
+
+        self.assertEqual("Hello <b>Jane</b>", subject)
+        self.assertIn("&lt;b&gt;Jane&lt;/b&gt;", message)
+
+    def test_recognises_html_messages_whatever_the_case(self):
+        """Template engine should escape variables of HTML documents whose html tag is not in lower case"""
+        for document in ("<HTML><body>{{ name }}</body></HTML>", '<!DOCTYPE html>\n<Html lang="en">{{ name }}</Html>'):
+            template_id = self.store.put("Hello", document)
+
+            _, message = self.engine.render(template_id, dict(name="<b>Jane</b>"))
+
+            self.assertIn("&lt;b&gt;Jane&lt;/b&gt;", message)
+
+    def test_refuses_missing_variables(self):
+        """Template engine should fail rather than render an email with blanks in it"""
+        with self.assertRaises(TemplateRenderingException):
+            self.engine.render(self.template_id, dict(name="Jane"))
+
+    def test_refuses_invalid_and_unknown_templates(self):
+        """Template engine should refuse templates that do not compile or are not stored"""
+        with self.assertRaises(TemplateInvalidException):
+            self.engine.check("Hello {{ name", "Hi")
+        with self.assertRaises(TemplateNotFoundException):
+            self.engine.render("0" * 64, {})
+        with self.assertRaises(TemplateNotFoundException):
+            self.engine.render("../../etc/passwd", {})
+
+    def test_renders_recipients_with_their_own_variables(self):
+        """Rendering a request should group recipients whose emails render the same"""
+        request = dict(
+            template_id=self.template_id,
+            variables=dict(name="friend", code=1),
+            fanout=True,
+            recipients=[
+                dict(email="jane@example.com", variables=dict(name="Jane")),
+                dict(email="john@example.com"),
+                dict(email="jim@example.com"),
+            ],
+        )
+
+        rendered = render_request(request, self.engine)
+
+        self.assertEqual(2, len(rendered))
+        self.assertEqual("Hello Jane", rendered[0]["subject"])
+        self.assertEqual(["john@example.com", "jim@example.com"],
+                         [recipient["email"] for recipient in rendered[1]["recipients"]])
+        self.assertEqual("Your code is 1", rendered[1]["message"])
+
+
+if __name__ == "__main__":
+    unittest.main()
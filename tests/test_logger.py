@@ -0,0 +1,29 @@
+import unittest
+from app.domain.entities import EmailRequest
+from app.logger import redact, LOG_MAX_FIELD_ITEMS, LOG_MAX_FIELD_LENGTH
+
+
+class LoggerTestCases(unittest.TestCase):
+
+    def test_redacts_email_requests(self):
+        """Logged email requests should not carry message bodies, attachment contents or long recipient lists"""
+        email_request = EmailRequest(
+            sender=dict(email="johndoe@example.com", name="John Doe"),
+            recipients=[dict(email=f"user{index}@example.com", name="User") for index in range(50)],
+            subject="S" * 1000,
+            message="Top secret rocket schematics",
+            attachments=[dict(content="QUJD" * 1000, filename="rocket.png", type="image/png")],
+        )
+
+        rendered = redact(dict(email=email_request))["email"]
+
+        self.assertEqual("<elided 28 chars>", rendered["message"])
+        self.assertEqual("<elided 4000 chars>", rendered["attachments"][0]["content"])
+        self.assertEqual("rocket.png", rendered["attachments"][0]["filename"])
+        self.assertEqual(LOG_MAX_FIELD_ITEMS + 1, len(rendered["recipients"]))
+        self.assertEqual("...<50 items>", rendered["recipients"][-1])
+        self.assertLess(len(rendered["subject"]), LOG_MAX_FIELD_LENGTH + 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from celery.concurrency.prefork import TaskPool as PreforkPool
+from celery.concurrency.solo import TaskPool as SoloPool
+from app.services.analytics import MinuteSeries
+from app.tasks.mail_analytics_task import mail_analytics_task
+from app.worker.analytics import AnalyticsFlusher, _on_worker_ready
+
+
+class AnalyticsFlusherTestCases(unittest.TestCase):
+
+    def test_publishes_drained_counts_in_one_message(self):
+        """The counts recorded since the last flush should be published as a single analytics task message"""
+        series = MinuteSeries(slots=5)
+        publisher = MagicMock()
+        flusher = AnalyticsFlusher(series, publisher, interval=60)
+        series.record("sender", "jane@example.com", "sent", timestamp=600)
+        series.record("provider", "smtp", "sent", timestamp=600)
+
+        flusher.flush()
+        flusher.flush()
+
+        publisher.publish.assert_called_once()
+        task, kwargs = publisher.publish.call_args.args
+        self.assertIs(mail_analytics_task, task)
+        self.assertEqual(2, len(kwargs["counts"]))
+
+    def test_publishes_remaining_counts_when_stopped(self):
+        """Stopping the flusher should publish the counts recorded since the last flush"""
+        series = MinuteSeries(slots=5)
+        publisher = MagicMock()
+        flusher = AnalyticsFlusher(series, publisher, interval=60)
+        flusher.start()
+        series.record("sender", "jane@example.com", "failed")
+
+        flusher.stop(timeout=1)
+
+        publisher.publish.assert_called_once()
+
+    @patch("app.worker.analytics.get_analytics_flusher")
+    def test_starts_in_the_worker_process_unless_it_forks(self, mock_get_analytics_flusher):
+        """The main worker process should only run a flusher when it sends the emails itself"""
+        _on_worker_ready(sender=MagicMock(pool=MagicMock(spec=PreforkPool)))
+        mock_get_analytics_flusher.return_value.start.assert_not_called()
+
+        _on_worker_ready(sender=MagicMock(pool=MagicMock(spec=SoloPool)))
+        mock_get_analytics_flusher.return_value.start.assert_called_once()
@@ -0,0 +1,130 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from celery import Celery
+from app.exceptions import AppException
+from app.services.mail.exceptions import EmailSendingException
+from app.worker.batch_consumer import BatchConsumer
+from app.worker.celery_app import celery_app
+from app.tasks.mail_sending_task import mail_sending_task
+
+
+def mail_messages(count, retries=0):
+    messages = [MagicMock(headers={"task": "mail_sending_task", "retries": retries}) for _ in range(count)]
+    for index, message in enumerate(messages):
+        message.decode.return_value = ([], dict(data=dict(index=index)), {})
+    return messages
+
+
+class BatchConsumerTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Celery("test", broker="memory://", backend="cache+memory://")
+        self.app.conf.task_queues = celery_app.conf.task_queues
+        self.app.conf.task_routes = celery_app.conf.task_routes
+
+    def consume(self, consumer: BatchConsumer, seconds: float = 1.0):
+        stop = threading.Timer(seconds, consumer.stop)
+        stop.start()
+        consumer.run()
+        stop.join()
+
+    def test_opens_connection_with_heartbeat(self):
+        """Batch consumer should open its broker connection with the configured heartbeat"""
+        self.app.conf.broker_heartbeat = 30
+        consumer = BatchConsumer(app=self.app, batch_timeout=0.1)
+
+        self.consume(consumer, seconds=0.2)
+
+        self.assertEqual(30, consumer.connection.heartbeat)
+
+    @patch("app.worker.batch_consumer.send_plain_mails")
+    def test_sends_queued_messages_in_batches(self, mock_send_plain_mails):
+        """Batch consumer should hand queued emails over in batches of at most batch_size"""
+        mock_send_plain_mails.side_effect = lambda requests: [None] * len(requests)
+        for index in range(5):
+            self.app.send_task("mail_sending_task", kwargs=dict(data=dict(subject=f"Hello {index}")))
+
+        self.consume(BatchConsumer(app=self.app, batch_size=2, batch_timeout=0.1))
+
+        batches = [call.args[0] for call in mock_send_plain_mails.call_args_list]
+        self.assertEqual([2, 2, 1], [len(batch) for batch in batches])
+        self.assertEqual("Hello 0", batches[0][0]["subject"])
+
+    @patch.object(mail_sending_task, "apply_async")
+    @patch("app.worker.batch_consumer.mail_error_task")
+    @patch("app.worker.batch_consumer.send_plain_mails")
+    def test_acknowledges_messages_individually(self, mock_send_plain_mails, mock_mail_error_task, mock_apply_async):
+        """Batch consumer should ack sent emails, hold provider failures for a retry & push failed emails to the dlt"""
+        messages = mail_messages(3)
+        mock_send_plain_mails.return_value = [
+            None,
+            EmailSendingException("All email providers failed"),
+            AppException("Template not found"),
+        ]
+        consumer = BatchConsumer(app=self.app, retry_delay=0)
+        consumer._pending = messages  # pylint: disable=protected-access
+
+        consumer.flush()
+
+        messages[0].ack.assert_called_once()
+        messages[1].ack.assert_not_called()
+        messages[2].ack.assert_called_once()
+        mock_mail_error_task.apply_async.assert_called_once_with(kwargs=dict(data=dict(index=2)))
+        mock_apply_async.assert_not_called()
+
+    @patch.object(mail_sending_task, "apply_async")
+    @patch("app.worker.batch_consumer.send_plain_mails")
+    def test_publishes_provider_failures_again_once_due(self, mock_send_plain_mails, mock_apply_async):
+        """Batch consumer should publish emails the providers failed to send again after the retry delay, then ack"""
+        [message] = mail_messages(1, retries=1)
+        mock_send_plain_mails.return_value = [EmailSendingException("All email providers failed")]
+        consumer = BatchConsumer(app=self.app, retry_delay=0.1)
+        consumer._pending = [message]  # pylint: disable=protected-access
+
+        consumer.flush()
+        consumer.on_iteration()
+        mock_apply_async.assert_not_called()
+        time.sleep(0.2)
+        consumer.on_iteration()
+
+        mock_apply_async.assert_called_once_with(kwargs=dict(data=dict(index=0)), retries=2)
+        message.ack.assert_called_once()
+
+    @patch.object(mail_sending_task, "apply_async")
+    @patch("app.worker.batch_consumer.mail_error_task")
+    @patch("app.worker.batch_consumer.send_plain_mails")
+    def test_dead_letters_emails_out_of_retries(self, mock_send_plain_mails, mock_mail_error_task, mock_apply_async):
+        """Batch consumer should push emails to the dlt queue once the retries of the mail sending task are used up"""
+        [message] = mail_messages(1, retries=mail_sending_task.max_retries)
+        mock_send_plain_mails.return_value = [EmailSendingException("All email providers failed")]
+        consumer = BatchConsumer(app=self.app, retry_delay=0)
+        consumer._pending = [message]  # pylint: disable=protected-access
+
+        consumer.flush()
+        consumer.on_iteration()
+
+        mock_mail_error_task.apply_async.assert_called_once_with(kwargs=dict(data=dict(index=0)))
+        mock_apply_async.assert_not_called()
+        message.ack.assert_called_once()
+
+    @patch.object(mail_sending_task, "apply_async")
+    @patch("app.worker.batch_consumer.send_plain_mails")
+    def test_retries_fanout_emails_to_recipients_not_sent_to(self, mock_send_plain_mails, mock_apply_async):
+        """Batch consumer should leave the recipients a fan-out email was sent to out of its retry"""
+        recipients = [dict(email=f"user{index}@example.com") for index in range(2)]
+        [message] = mail_messages(1)
+        message.decode.return_value = ([], dict(data=dict(fanout=True, recipients=recipients)), {})
+        mock_send_plain_mails.return_value = [EmailSendingException("Partly sent", sent=recipients[:1])]
+        consumer = BatchConsumer(app=self.app, retry_delay=0)
+        consumer._pending = [message]  # pylint: disable=protected-access
+
+        consumer.flush()
+        consumer.on_iteration()
+
+        self.assertEqual(recipients[1:], mock_apply_async.call_args.kwargs["kwargs"]["data"]["recipients"])
+
+
+if __name__ == "__main__":
+    unittest.main()
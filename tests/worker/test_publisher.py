@@ -0,0 +1,99 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+from kombu.exceptions import EncodeError, OperationalError
+from app.worker.publisher import TaskPublisher
+from app.worker.exceptions import PublisherBusyException
+
+
+class TaskPublisherTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.app = MagicMock()
+        self.producer = self.app.producer_pool.acquire.return_value.__enter__.return_value
+        self.task = MagicMock()
+
+    def test_publishes_messages_with_pooled_producer(self):
+        """Task publisher should publish queued messages over a producer from the pool"""
+        publisher = TaskPublisher(app=self.app, max_pending=10, batch_size=10)
+
+        publisher.publish_many([(self.task, dict(data=1)), (self.task, dict(data=2))])
+        publisher.stop(timeout=5)
+
+        self.task.apply_async.assert_any_call(kwargs=dict(data=1), producer=self.producer)
+        self.task.apply_async.assert_any_call(kwargs=dict(data=2), producer=self.producer)
+        self.assertEqual(0, publisher.pending)
+
+    def test_refuses_messages_when_full(self):
+        """Task publisher should refuse a batch that does not fit in the buffer without accepting any of it"""
+        publisher = TaskPublisher(app=self.app, max_pending=2, batch_size=10)
+        publisher._ensure_started = MagicMock()  # pylint: disable=protected-access
+
+        publisher.publish(self.task, dict(data=1))
+
+        with self.assertRaises(PublisherBusyException):
+            publisher.publish_many([(self.task, dict(data=2)), (self.task, dict(data=3))])
+        self.assertEqual(1, publisher.pending)
+
+    def test_keeps_publishing_after_a_failed_message(self):
+        """Task publisher should carry on publishing the rest of a batch when one message fails & publish it again"""
+        publisher = TaskPublisher(app=self.app, max_pending=10, batch_size=10, retry_delay=0.01)
+        self.task.apply_async.side_effect = [OperationalError("Connection reset"), None, None]
+
+        publisher.publish_many([(self.task, dict(data=1)), (self.task, dict(data=2))])
+        publisher.stop(timeout=5)
+
+        self.assertEqual(
+            [dict(data=1), dict(data=2), dict(data=1)],
+            [call.kwargs["kwargs"] for call in self.task.apply_async.call_args_list],
+        )
+        self.assertEqual(0, publisher.pending)
+
+    def test_drops_messages_that_cannot_be_published(self):
+        """Messages that cannot be encoded should be dropped straight away without holding up the rest of the batch"""
+        publisher = TaskPublisher(app=self.app, max_pending=10, batch_size=10, retry_delay=0.01)
+        self.task.apply_async.side_effect = [EncodeError("Cannot encode"), None]
+
+        publisher.publish_many([(self.task, dict(data=1)), (self.task, dict(data=2))])
+        publisher.stop(timeout=5)
+
+        self.assertEqual(
+            [dict(data=1), dict(data=2)],
+            [call.kwargs["kwargs"] for call in self.task.apply_async.call_args_list],
+        )
+        self.assertEqual(0, publisher.pending)
+
+    def test_drops_messages_after_max_attempts(self):
+        """A message that always fails to publish should be dropped after max_attempts attempts"""
+        publisher = TaskPublisher(app=self.app, max_pending=10, batch_size=10, retry_delay=0.01, max_attempts=3)
+        self.task.apply_async.side_effect = OperationalError("Connection reset")
+
+        publisher.publish(self.task, dict(data=1))
+        publisher.stop(timeout=5)
+
+        self.assertEqual(3, self.task.apply_async.call_count)
+        self.assertEqual(0, publisher.pending)
+
+    def test_keeps_unpublished_messages_pending(self):
+        """Messages the broker did not accept should stay in the buffer & count towards max_pending"""
+        publisher = TaskPublisher(app=self.app, max_pending=2, batch_size=10, retry_delay=60)
+        self.app.producer_pool.acquire.side_effect = ConnectionError("Broker is down")
+        publisher.publish_many([(self.task, dict(data=1)), (self.task, dict(data=2))])
+
+        for _ in range(100):
+            if self.app.producer_pool.acquire.called and publisher.pending == 2:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(2, publisher.pending)
+        with self.assertRaises(PublisherBusyException):
+            publisher.publish(self.task, dict(data=3))
+
+        self.app.producer_pool.acquire.side_effect = None
+        publisher.stop(timeout=5)
+        self.assertEqual(0, publisher.pending)
+        self.assertEqual(2, self.task.apply_async.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+from app.domain.entities import EmailPriority
+from app.worker.routers import route_by_priority
+from app.worker.queues import BARUA_QUEUE_NAME, BARUA_BULK_QUEUE_NAME, barua_bulk_queue
+
+
+class RouteByPriorityTestCases(unittest.TestCase):
+
+    def test_routes_bulk_emails_to_bulk_queue(self):
+        """Bulk emails should be sent through the bulk queue"""
+        for priority in (EmailPriority.BULK, "bulk"):
+            route = route_by_priority("mail_sending_task", (), dict(data=dict(priority=priority)), {})
+
+            self.assertEqual(BARUA_BULK_QUEUE_NAME, route["queue"])
+
+    def test_routes_transactional_emails_to_default_queue(self):
+        """Transactional emails & emails without a priority should be sent through the default queue"""
+        for data in (dict(priority=EmailPriority.TRANSACTIONAL), dict()):
+            route = route_by_priority("mail_sending_task", (), dict(data=data), {})
+
+            self.assertEqual(BARUA_QUEUE_NAME, route["queue"])
+
+    def test_leaves_other_tasks_to_task_routes(self):
+        """Other tasks should be routed by name"""
+        self.assertIsNone(route_by_priority("mail_error_task", (), dict(data=dict(priority="bulk")), {}))
+
+    def test_bulk_queue_does_not_expire_messages(self):
+        """Bulk emails should wait in the bulk queue however long it takes workers to get to them"""
+        self.assertNotIn("x-message-ttl", barua_bulk_queue.queue_arguments or {})
+
+
+if __name__ == "__main__":
+    unittest.main()
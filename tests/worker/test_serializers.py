@@ -0,0 +1,74 @@
+import json
+import unittest
+from datetime import datetime, timezone
+from kombu.serialization import dumps as kombu_dumps, loads as kombu_loads, prepare_accept_content
+from app.worker.serializers import (
+    CONTENT_TYPE,
+    FLAG_ZSTD,
+    SERIALIZER_NAME,
+    WIRE_FORMAT_VERSION,
+    dumps,
+    loads,
+)
+from app.worker.celery_app import celery_app
+
+
+class SerializerTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.data = dict(
+            sender=dict(email="johndoe@example.com", name="John Doe"),
+            recipients=[dict(email=f"user{index}@example.com") for index in range(50)],
+            subject="Rocket Schematics",
+            message="Let us build a rocket to the Moon",
+            priority="transactional",
+            fanout=False,
+        )
+
+    def test_round_trips_payloads(self):
+        """Serializer should hand back the payload it was given, with tuples as lists"""
+        body = ((), dict(data=self.data), dict(callbacks=None))
+
+        self.assertEqual([[], dict(data=self.data), dict(callbacks=None)], loads(dumps(body, 0)))
+
+    def test_is_smaller_than_json(self):
+        """Serialized payloads should be smaller than their JSON encoding"""
+        self.assertLess(len(dumps(self.data, 0)), len(json.dumps(self.data)))
+
+    def test_compresses_payloads_above_threshold(self):
+        """Payloads of at least the threshold should be compressed & flagged as such"""
+        attachment = dict(content="QUJD" * 4096, filename="schematics.bin")
+        data = dict(self.data, attachments=[attachment])
+
+        compressed, plain = dumps(data, 1024), dumps(data, 0)
+
+        self.assertEqual(bytes((WIRE_FORMAT_VERSION, FLAG_ZSTD)), compressed[:2])
+        self.assertEqual(bytes((WIRE_FORMAT_VERSION, 0)), plain[:2])
+        self.assertLess(len(compressed), len(plain))
+        self.assertEqual(loads(plain), loads(compressed))
+
+    def test_serializes_dates_as_iso_strings(self):
+        """Dates should be carried as ISO 8601 strings"""
+        send_at = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+        self.assertEqual(dict(send_at=send_at.isoformat()), loads(dumps(dict(send_at=send_at))))
+
+    def test_refuses_unknown_versions(self):
+        """Payloads of a wire format version the worker does not know should be refused"""
+        with self.assertRaises(ValueError):
+            loads(bytes((WIRE_FORMAT_VERSION + 1, 0)) + dumps(self.data, 0)[2:])
+
+    def test_is_registered_with_celery(self):
+        """Celery should publish task messages with the serializer & still accept JSON"""
+        content_type, encoding, body = kombu_dumps(self.data, serializer=SERIALIZER_NAME)
+
+        self.assertEqual(CONTENT_TYPE, content_type)
+        self.assertEqual(self.data, kombu_loads(body, content_type, encoding,
+                                                accept=prepare_accept_content(celery_app.conf.accept_content)))
+        self.assertEqual(SERIALIZER_NAME, celery_app.conf.task_serializer)
+        self.assertIn("json", celery_app.conf.accept_content)
+        self.assertEqual(2, celery_app.conf.task_protocol)
+
+
+if __name__ == "__main__":
+    unittest.main()